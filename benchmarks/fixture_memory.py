@@ -0,0 +1,65 @@
+"""Measure the memory used by the fixture definitions of a large load.
+
+Usage::
+
+    $ python benchmarks/fixture_memory.py [number_of_fixtures] [lazy]
+
+The script builds a synthetic file collection holding ``number_of_fixtures``
+model fixtures (half of them in a list collection, half of them in a dict
+collection) and reports the memory allocated while loading it. Pass ``lazy``
+to load the fixtures with ``lazy_definitions``.
+"""
+from __future__ import print_function
+import gc
+import sys
+import time
+import tracemalloc
+
+from charlatan import FixturesManager
+from charlatan.file_format import RelationshipToken
+
+
+def make_definitions(count):
+    """Return a synthetic, already-parsed fixtures definition."""
+    half = count // 2
+    return {
+        "toasters": {
+            "model": "charlatan.tests.fixtures.simple_models:Toaster",
+            "fields": {"slots": 5},
+            "objects": [{"color": "color%d" % i} for i in range(half)],
+        },
+        "users": {
+            "model": "charlatan.tests.fixtures.simple_models:User",
+            "objects": dict(
+                ("user%d" % i, {"toasters": [RelationshipToken("toasters")]})
+                for i in range(count - half)
+            ),
+        },
+    }
+
+
+def main(count=100000, lazy=False):
+    definitions = make_definitions(count)
+    manager = FixturesManager(lazy_definitions=lazy)
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    collections = [
+        manager._handle_collection(namespace=k, definition=v,
+                                   objects=v["objects"])
+        for k, v in sorted(definitions.items())
+    ]
+    elapsed = time.time() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("fixtures: %d" % sum(len(c.fixtures) for c in collections))
+    print("memory:   %.1f MB" % (current / 1024.0 / 1024.0))
+    print("time:     %.2f s" % elapsed)
+
+
+if __name__ == "__main__":
+    main(*[int(sys.argv[1])] if sys.argv[1:] else [],
+         lazy="lazy" in sys.argv[2:])
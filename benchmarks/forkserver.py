@@ -0,0 +1,112 @@
+"""Compare forked workers with independent processes loading the fixtures.
+
+Usage::
+
+    $ python benchmarks/forkserver.py [number_of_fixtures] [workers]
+
+The script writes a synthetic fixtures file, then starts ``workers``
+processes that each load it (independent processes), and ``workers``
+processes forked from a parent that loaded it once
+(:func:`charlatan.forkserver.fork_workers`). For each worker, it reports the
+startup time (until the fixtures are ready), the resident memory (RSS) and
+the proportional memory (PSS, shared pages divided among the processes
+sharing them, Linux only).
+"""
+from __future__ import print_function
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from charlatan import FixturesManager
+from charlatan import forkserver
+
+WORKER = """
+import sys
+from charlatan import FixturesManager, forkserver
+sys.path.insert(0, %(benchmarks)r)
+from forkserver import report
+manager = FixturesManager()
+manager.load(%(filename)r)
+forkserver.warm_up(manager)
+report("independent", %(index)d, %(start)r)
+"""
+
+
+def write_fixtures(count):
+    """Write a synthetic fixtures file, return its name."""
+    fd, filename = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(fd, "w") as f:
+        f.write("toasters:\n")
+        f.write("  model: charlatan.tests.fixtures.simple_models:Toaster\n")
+        f.write("  fields:\n    slots: 5\n")
+        f.write("  objects:\n")
+        for i in range(count):
+            f.write("    toaster%d:\n      color: color%d\n" % (i, i))
+    return filename
+
+
+def get_memory():
+    """Return (RSS, PSS) of the current process, in MB."""
+    values = {}
+    for path in ("/proc/self/smaps_rollup", "/proc/self/status"):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    values.setdefault(name, value)
+        except IOError:
+            continue
+
+    def to_mb(name):
+        if name not in values:
+            return float("nan")
+        return int(values[name].split()[0]) / 1024.0
+
+    return to_mb("VmRSS"), to_mb("Pss")
+
+
+def report(mode, index, start):
+    rss, pss = get_memory()
+    print("%-12s worker %d: startup %.3f s, rss %.1f MB, pss %.1f MB"
+          % (mode, index, time.time() - start, rss, pss))
+    sys.stdout.flush()
+
+
+def run_independent(filename, workers):
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    for index in range(workers):
+        code = WORKER % {"benchmarks": benchmarks, "filename": filename,
+                         "index": index, "start": time.time()}
+        processes.append(subprocess.Popen([sys.executable, "-c", code]))
+    for process in processes:
+        process.wait()
+
+
+def run_forked(filename, workers):
+    start = time.time()
+    manager = FixturesManager()
+    manager.load(filename)
+    forkserver.warm_up(manager)
+    print("parent: loaded in %.3f s" % (time.time() - start))
+
+    def target(manager, index):
+        report("forked", index, fork_time)
+
+    fork_time = time.time()
+    forkserver.fork_workers(manager, target, workers)
+
+
+def main(count=20000, workers=4):
+    filename = write_fixtures(count)
+    try:
+        run_independent(filename, workers)
+        run_forked(filename, workers)
+    finally:
+        os.remove(filename)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
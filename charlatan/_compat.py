@@ -29,9 +29,13 @@ PY3 = sys.version_info[0] == 3
 
 if PY3:
     string_types = str,
+    integer_types = int,
+    intern = sys.intern
 
 else:
     string_types = basestring,  # noqa
+    integer_types = (int, long)  # noqa
+    intern = intern  # noqa
 
 
 if PY3:
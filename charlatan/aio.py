@@ -0,0 +1,293 @@
+"""Install fixtures with SQLAlchemy's asyncio extension (Python 3 only).
+
+.. versionadded:: 0.4.8
+"""
+import asyncio
+
+from charlatan import builder
+from charlatan import database
+from charlatan.fixture import Fixture
+from charlatan.fixture_collection import FixtureCollection
+from charlatan.fixtures_manager import FixturesManager, make_list
+from charlatan.utils import is_sqlalchemy_model
+
+
+class AsyncInstantiateAndSave(builder.InstantiateAndSave):
+
+    """Instantiate fixtures, then save them asynchronously.
+
+    Calling the builder only instantiates the fixture, :meth:`save_async`
+    saves it.
+    """
+
+    def __call__(self, fixtures, klass, params, **kwargs):
+        return self.instantiate(klass, params)
+
+    async def save_async(self, instance, fixtures, session_factory):
+        """Save an instance in a session of its own, return it.
+
+        SQLAlchemy instances are merged in the session: the returned
+        instance is the merged one. Other instances' :meth:`save` method is
+        called if they have one.
+
+        Before and after the process, the :func:`before_save` and
+        :func:`after_save` hook are run.
+        """
+        fixtures.get_hook("before_save")(instance)
+
+        if session_factory is not None and is_sqlalchemy_model(instance):
+            async with session_factory() as session:
+                # Merging (instead of adding) keeps the instance, and the
+                # parents it shares with other fixtures, out of the session:
+                # fixtures can be saved concurrently in different sessions.
+                instance = await session.merge(instance)
+                await session.commit()
+
+        else:
+            getattr(instance, "save", lambda: None)()
+
+        fixtures.get_hook("after_save")(instance)
+        return instance
+
+
+class AsyncDeleteAndCommit(builder.DeleteAndCommit):
+
+    """Delete fixtures asynchronously."""
+
+    async def __call__(self, fixtures, instance, session_factory=None):
+        fixtures.get_hook("before_uninstall")()
+        try:
+            if session_factory is not None and is_sqlalchemy_model(instance):
+                async with session_factory() as session:
+                    await session.delete(await session.merge(instance))
+                    await session.commit()
+            else:
+                try:
+                    getattr(instance, "delete_instance")()
+                except AttributeError:
+                    getattr(instance, "delete", lambda: None)()
+
+        except Exception as exc:
+            fixtures.get_hook("after_uninstall")(exc)
+            raise
+
+        else:
+            fixtures.get_hook("after_uninstall")(None)
+
+
+class AsyncFixturesManager(FixturesManager):
+
+    """Manage fixtures saved with SQLAlchemy's asyncio extension.
+
+    :param session_factory: returns an ``AsyncSession``, e.g.
+        ``async_sessionmaker(engine, expire_on_commit=False)``. Sessions must
+        not expire instances on commit: their attributes could not be loaded
+        outside of the session anymore.
+
+    Other keyword arguments are passed to :class:`charlatan.FixturesManager`.
+
+    :meth:`install_fixture`, :meth:`install_fixtures`,
+    :meth:`uninstall_fixture` and :meth:`uninstall_fixtures` are
+    coroutines::
+
+        manager = AsyncFixturesManager(session_factory=session_factory)
+        manager.load("tests/fixtures/*.yaml")
+        toaster, toast = await manager.install_fixtures(["toaster", "toast"])
+
+    Each fixture is saved in its own session, as soon as its ancestors are
+    saved: independent fixtures are saved concurrently.
+
+    Methods using ``db_session`` (e.g. :meth:`install_collection`,
+    :meth:`bulk_install_fixtures`) are not supported.
+
+    Listeners are notified like with :class:`charlatan.FixturesManager`.
+    The actions of fixtures installed concurrently overlap: a listener's
+    ``fixture_finished`` may not be called for the last started action.
+    """
+
+    default_get_builder = AsyncInstantiateAndSave()
+    default_delete_builder = AsyncDeleteAndCommit()
+
+    def __init__(self, session_factory=None, **kwargs):
+        super(AsyncFixturesManager, self).__init__(**kwargs)
+        self.session_factory = session_factory
+        # Fixture key: task installing it
+        self._tasks = {}
+
+    def clean_cache(self):
+        super(AsyncFixturesManager, self).clean_cache()
+        self._tasks = {}
+
+    async def notify_listeners_async(self, fixture_key, action, func,
+                                     *args, **kwargs):
+        """Await func, notifying the listeners before and after.
+
+        See :meth:`charlatan.FixturesManager.notify_listeners`.
+        """
+        listeners = self.default_listeners + self.listeners
+        if not listeners:
+            return await func(*args, **kwargs)
+
+        for listener in listeners:
+            listener.fixture_started(fixture_key, action)
+        instance = None
+        try:
+            instance = await func(*args, **kwargs)
+            return instance
+        finally:
+            model = self._get_listened_model(fixture_key)
+            for listener in reversed(listeners):
+                listener.fixture_finished(fixture_key, action, instance,
+                                          model)
+
+    async def install_fixture(self, fixture_key, overrides=None):
+        """Install a fixture and its ancestors.
+
+        :param str fixture_key:
+        :param dict overrides: override fields
+        """
+        return await self.notify_listeners_async(
+            fixture_key, "install", self._install_fixture, fixture_key,
+            overrides=overrides)
+
+    async def _install_fixture(self, fixture_key, overrides=None):
+        """Install a fixture, see :meth:`install_fixture`."""
+        self.get_hook("before_install")()
+        try:
+            if overrides:
+                instance = await self._install(fixture_key, overrides)
+            else:
+                instance = await self._get_task(fixture_key)
+        except Exception as exc:
+            self.get_hook("after_install")(exc)
+            raise
+
+        self.get_hook("after_install")(None)
+        return instance
+
+    async def install_fixtures(self, fixture_keys):
+        """Install fixtures concurrently.
+
+        :param fixture_keys: fixtures to be installed
+        :type fixture_keys: str or list of strs
+        :rtype: list of instances
+        """
+        return list(await asyncio.gather(
+            *[self.install_fixture(k) for k in make_list(fixture_keys)]))
+
+    async def install_all_fixtures(self):
+        """Install all fixtures."""
+        return await self.install_fixtures(list(self.keys()))
+
+    def _get_task(self, fixture_key):
+        """Return the task installing a fixture, creating it if needed."""
+        if fixture_key not in self._tasks:
+            self._tasks[fixture_key] = asyncio.ensure_future(
+                self._install(fixture_key))
+        return self._tasks[fixture_key]
+
+    async def _install(self, fixture_key, overrides=None):
+        """Install a fixture, once its ancestors are installed."""
+        dependencies = self._get_dependencies(fixture_key)
+        if dependencies:
+            await asyncio.gather(*[self._get_task(k) for k in dependencies])
+
+        if not overrides and fixture_key in self.cache:
+            return self.cache[fixture_key]
+
+        instance = await self.notify_listeners_async(
+            fixture_key, "get", self._build, fixture_key, overrides)
+        if not overrides:
+            self.cache[fixture_key] = instance
+            self.installed_keys.append(fixture_key)
+        return instance
+
+    async def _build(self, fixture_key, overrides=None):
+        """Build and save a fixture, its ancestors being installed."""
+        fixture = self._get_definition(fixture_key)
+        if isinstance(fixture, Fixture) and fixture.database_id:
+            async with self.session_factory() as session:
+                return await session.get(fixture.get_class(),
+                                         fixture.database_id)
+
+        await self._load_database_ids(fixture)
+        instance = self.collection.get_instance(
+            fixture_key, overrides=overrides, builder=self.get_builder,
+            fixture_manager=self)
+        return await self._save(fixture, instance)
+
+    async def _load_database_ids(self, fixture):
+        """Load the entries of a collection defined with an ``id``.
+
+        They are then returned by :meth:`get_database_instance` when the
+        collection is built, without querying the database synchronously.
+        """
+        if not self._has_database_ids:
+            return
+
+        ids_by_model = {}
+        self._add_database_ids(fixture, ids_by_model)
+        if not ids_by_model:
+            return
+
+        async with self.session_factory() as session:
+            for model, primary_keys in ids_by_model.items():
+                instances = await session.run_sync(
+                    database.query_by_primary_keys, model, primary_keys)
+                for primary_key in primary_keys:
+                    # Like session.get, missing instances are None.
+                    self._prefetched[(model, primary_key)] = instances.get(
+                        primary_key)
+
+    async def _save(self, fixture, instance):
+        """Save the instance(s) of a fixture or a collection."""
+        if isinstance(fixture, FixtureCollection):
+            if isinstance(instance, dict):
+                names = list(instance)
+                saved = await asyncio.gather(
+                    *[self._save(fixture.get(n), instance[n]) for n in names])
+                return dict(zip(names, saved))
+            return list(await asyncio.gather(
+                *[self._save(fixture.get(i), entry)
+                  for i, entry in enumerate(instance)]))
+
+        if fixture.database_id or not fixture.get_class():
+            return instance
+
+        return await self.get_builder.save_async(instance, self,
+                                                 self.session_factory)
+
+    async def uninstall_fixture(self, fixture_key):
+        """Uninstall a fixture.
+
+        :param str fixture_key:
+        """
+        await self.notify_listeners_async(fixture_key, "uninstall",
+                                          self._uninstall_fixture,
+                                          fixture_key)
+
+    async def _uninstall_fixture(self, fixture_key):
+        """Uninstall a fixture, see :meth:`uninstall_fixture`."""
+        self.get_hook("before_delete")(fixture_key)
+
+        instance = self.cache.pop(fixture_key, None)
+        if instance:
+            self._tasks.pop(fixture_key, None)
+            self.installed_keys.remove(fixture_key)
+            await self.delete_builder(self, instance,
+                                      session_factory=self.session_factory)
+
+        self.get_hook("after_delete")(fixture_key)
+
+    async def uninstall_fixtures(self, fixture_keys):
+        """Uninstall fixtures, in order.
+
+        :param fixture_keys: fixtures to be uninstalled
+        :type fixture_keys: str or list of strs
+        """
+        for fixture_key in make_list(fixture_keys):
+            await self.uninstall_fixture(fixture_key)
+
+    async def uninstall_all_fixtures(self):
+        """Uninstall all installed fixtures, in reverse install order."""
+        await self.uninstall_fixtures(list(reversed(self.installed_keys)))
@@ -0,0 +1,309 @@
+"""Prebuilt SQLite databases of installed fixtures.
+
+Installing the same fixtures in a fresh database for every test process (or
+CI job) is wasteful. :func:`build_database` installs them once in a SQLite
+file and writes a manifest next to it, holding a digest of the fixtures files
+and the primary key of each installed fixture. :func:`attach_database` then
+fills a manager's cache from the manifest: instances are loaded from the
+database by primary key the first time they are used, instead of being
+installed again.
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import absolute_import
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from charlatan import definition_store
+from charlatan.database import PrimaryKeyStub, get_primary_key
+from charlatan.fixture import get_class
+from charlatan.utils import is_sqlalchemy_model
+
+MANIFEST_VERSION = 1
+
+
+def get_manifest_filename(filename):
+    """Return the manifest's filename of a database file."""
+    return filename + ".json"
+
+
+def get_schema_digest(metadata):
+    """Return a digest of the tables of a SQLAlchemy ``MetaData``."""
+    from sqlalchemy.schema import CreateTable
+
+    digest = hashlib.sha1()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_definitions_digest(fixtures_manager):
+    """Return a digest of the files loaded by a manager."""
+    return definition_store.get_digest(
+        fixtures_manager, fixtures_manager._loaded, include_options=False)
+
+
+def build_database(fixtures_manager, metadata, filename, fixture_keys=None):
+    """Install fixtures in a new SQLite database and write its manifest.
+
+    :param FixturesManager fixtures_manager: manager with the fixtures
+        loaded. Its cache is cleaned.
+    :param metadata: SQLAlchemy ``MetaData`` (or declarative base) of the
+        models, used to create the tables
+    :param str filename: path of the SQLite database
+    :param list fixture_keys: fixtures to be installed, defaults to all
+    :rtype: dict, the manifest
+
+    The database and the manifest are written to temporary files, then moved
+    in place, so that concurrent processes never see a partial database.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    metadata = getattr(metadata, "metadata", metadata)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix=".db")
+    os.close(fd)
+
+    engine = create_engine("sqlite:///%s" % tmp_filename)
+    session = sessionmaker(bind=engine)()
+    previous_session = fixtures_manager.session
+    try:
+        metadata.create_all(engine)
+        fixtures_manager.session = session
+        fixtures_manager.clean_cache()
+        if fixture_keys is None:
+            fixture_keys = list(fixtures_manager.keys())
+        fixtures_manager.install_fixtures(fixture_keys)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "definitions": get_definitions_digest(fixtures_manager),
+            "schema": get_schema_digest(metadata),
+            "keys": sorted(fixture_keys),
+            "fixtures": get_primary_keys(fixtures_manager, entries=True),
+        }
+    except Exception:
+        os.remove(tmp_filename)
+        raise
+    finally:
+        session.close()
+        engine.dispose()
+        fixtures_manager.session = previous_session
+        fixtures_manager.clean_cache()
+
+    manifest_filename = get_manifest_filename(filename)
+    with open(manifest_filename + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.rename(tmp_filename, filename)
+    os.rename(manifest_filename + ".tmp", manifest_filename)
+    return manifest
+
+
+def get_primary_keys(fixtures_manager, entries=False):
+    """Return the model and primary key of each installed fixture.
+
+    :param FixturesManager fixtures_manager:
+    :param bool entries: if True, the entries of installed collections are
+        returned too, with keys such as ``"toasters.green"``
+    :rtype: list of ``[fixture key, "module:Class", primary key]``, in
+        install order
+
+    Only SQLAlchemy instances with a single-column primary key are returned
+    (e.g. not collections).
+    """
+    returned = []
+    for fixture_key in fixtures_manager.installed_keys:
+        _add_primary_keys(returned, fixture_key,
+                          fixtures_manager.cache.get(fixture_key), entries)
+    return returned
+
+
+def _add_primary_keys(returned, fixture_key, instance, entries):
+    if type(instance) is PrimaryKeyStub:
+        model, primary_key = instance.model, instance.primary_key
+    elif instance is not None and is_sqlalchemy_model(instance):
+        model, primary_key = instance.__class__, get_primary_key(instance)
+    else:
+        if entries and isinstance(instance, (dict, list)):
+            items = (sorted(instance.items(), key=lambda i: i[0])
+                     if isinstance(instance, dict) else enumerate(instance))
+            for name, entry in items:
+                _add_primary_keys(returned, "%s.%s" % (fixture_key, name),
+                                  entry, entries)
+        return
+
+    if primary_key is None or isinstance(primary_key, tuple):
+        return
+
+    returned.append([fixture_key,
+                     "%s:%s" % (model.__module__, model.__name__),
+                     primary_key])
+
+
+def read_manifest(filename):
+    """Return the manifest of a database file, or ``None`` if missing."""
+    try:
+        with open(get_manifest_filename(filename)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def is_up_to_date(fixtures_manager, filename, metadata=None,
+                  fixture_keys=None):
+    """Return True if a database was built from the manager's files.
+
+    :param FixturesManager fixtures_manager:
+    :param str filename: path of the SQLite database
+    :param metadata: if provided, the schema must be the same too
+    :param list fixture_keys: if provided, the same fixtures must have been
+        installed
+    """
+    manifest = read_manifest(filename)
+    if (manifest is None
+            or not os.path.exists(filename)
+            or manifest.get("version") != MANIFEST_VERSION):
+        return False
+
+    if manifest["definitions"] != get_definitions_digest(fixtures_manager):
+        return False
+
+    if (fixture_keys is not None
+            and manifest["keys"] != sorted(fixture_keys)):
+        return False
+
+    if metadata is not None:
+        metadata = getattr(metadata, "metadata", metadata)
+        return manifest["schema"] == get_schema_digest(metadata)
+
+    return True
+
+
+def copy_database(filename, destination):
+    """Copy a database file (and its manifest), e.g. one per test process."""
+    shutil.copyfile(filename, destination)
+    shutil.copyfile(get_manifest_filename(filename),
+                    get_manifest_filename(destination))
+
+
+def clone_database(filename, destination):
+    """Clone a database file (and its manifest) with SQLite's backup API.
+
+    Unlike a file copy, the backup is consistent even if the database is
+    being used. Cloning again resets the destination to the template.
+    """
+    import sqlite3
+
+    source = sqlite3.connect(filename)
+    if not hasattr(source, "backup"):
+        # Python < 3.7
+        source.close()
+        return copy_database(filename, destination)
+
+    target = sqlite3.connect(destination)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    shutil.copyfile(get_manifest_filename(filename),
+                    get_manifest_filename(destination))
+
+
+@contextlib.contextmanager
+def locked(filename):
+    """Hold an exclusive lock on ``filename + ".lock"`` (POSIX only)."""
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+
+    with open(filename + ".lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get_worker_filename(template, worker_id):
+    """Return the filename of a worker's clone of a template database."""
+    root, ext = os.path.splitext(template)
+    return "%s.%s%s" % (root, worker_id, ext)
+
+
+def prepare_worker_database(fixtures_manager, metadata, template, worker_id,
+                            fixture_keys=None):
+    """Return the path of a worker's clone of a template database.
+
+    :param FixturesManager fixtures_manager: manager with the fixtures
+        loaded
+    :param metadata: SQLAlchemy ``MetaData`` (or declarative base)
+    :param str template: path of the template database
+    :param str worker_id: e.g. the pytest-xdist worker id
+    :param list fixture_keys: fixtures installed in the template, defaults
+        to all
+
+    The template is built (by the first worker, while holding a file lock)
+    if it is missing or out of date, then cloned for the worker. Bind a
+    session to the clone and call :func:`attach_database` to use the
+    fixtures.
+    """
+    if fixture_keys is None:
+        fixture_keys = list(fixtures_manager.keys())
+
+    with locked(template):
+        if not is_up_to_date(fixtures_manager, template, metadata=metadata,
+                             fixture_keys=fixture_keys):
+            build_database(fixtures_manager, metadata, template,
+                           fixture_keys=fixture_keys)
+
+    filename = get_worker_filename(template, worker_id)
+    clone_database(template, filename)
+    return filename
+
+
+def attach_database(fixtures_manager, filename, metadata=None):
+    """Fill a manager's cache with the fixtures of a database file.
+
+    :param FixturesManager fixtures_manager: manager whose session is bound
+        to the database (or to a copy of it)
+    :param str filename: path of the database, whose manifest is read
+    :param metadata: if provided, the database's schema is checked too
+    :rtype: bool, False if the database is missing or out of date (nothing
+        is attached then)
+
+    The fixtures are marked as installed and cached as
+    :class:`charlatan.database.PrimaryKeyStub`: instances are only loaded
+    from the database when they are used.
+    """
+    if not is_up_to_date(fixtures_manager, filename, metadata=metadata):
+        return False
+
+    manifest = read_manifest(filename)
+    attach_primary_keys(fixtures_manager, manifest["fixtures"])
+    return True
+
+
+def attach_primary_keys(fixtures_manager, fixtures):
+    """Cache fixtures as stubs and mark them as installed.
+
+    :param FixturesManager fixtures_manager:
+    :param list fixtures: as returned by :func:`get_primary_keys`
+    """
+    models = {}
+    for fixture_key, model_path, primary_key in fixtures:
+        if model_path not in models:
+            models[model_path] = get_class(*model_path.split(":"))
+
+        fixtures_manager.cache[fixture_key] = PrimaryKeyStub(
+            models[model_path], primary_key)
+        if fixture_key not in fixtures_manager.installed_keys:
+            fixtures_manager.installed_keys.append(fixture_key)
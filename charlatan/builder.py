@@ -32,13 +32,19 @@ class InstantiateAndSave(Builder):
         Before and after the process, the :func:`before_save` and
         :func:`after_save` hook are run.
 
+        If ``commit`` is False, the SQLAlchemy instance is only added to the
+        session.
+
+        .. versionadded:: 0.4.8
+            ``commit`` argument added.
         """
         session = kwargs.get('session')
         save = kwargs.get('save')
+        commit = kwargs.get('commit', True)
 
         instance = self.instantiate(klass, params)
         if save:
-            self.save(instance, fixtures, session)
+            self.save(instance, fixtures, session, commit=commit)
         return instance
 
     def instantiate(self, klass, params):
@@ -49,13 +55,20 @@ class InstantiateAndSave(Builder):
             raise TypeError("Error while trying to build %r "
                             "with %r: %s" % (klass, params, exc))
 
-    def save(self, instance, fixtures, session):
-        """Save instance."""
+    def save(self, instance, fixtures, session, commit=True):
+        """Save instance.
+
+        .. versionchanged:: 0.4.8
+            The instance is saved with the session of its model (see
+            :meth:`charlatan.FixturesManager.session_for`), if any.
+        """
+        session = fixtures.session_for(type(instance), session)
         fixtures.get_hook("before_save")(instance)
 
         if session and is_sqlalchemy_model(instance):
             session.add(instance)
-            session.commit()
+            if commit:
+                session.commit()
 
         else:
             getattr(instance, "save", lambda: None)()
@@ -72,7 +85,9 @@ class DeleteAndCommit(Builder):
         fixtures.get_hook("before_uninstall")()
         try:
             if commit:
-                self.delete(instance, session)
+                # The session of the instance's model, if any.
+                self.delete(instance,
+                            fixtures.session_for(type(instance), session))
             else:
                 try:
                     getattr(instance, "delete_instance")()
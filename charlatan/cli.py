@@ -0,0 +1,76 @@
+"""Command line interface, installed as ``charlatan``."""
+from __future__ import print_function
+import argparse
+import sys
+
+from charlatan import FixturesManager
+from charlatan import artifact
+from charlatan import server
+from charlatan.fixture import get_class
+
+
+def build_db(args):
+    manager = FixturesManager()
+    manager.load(args.fixtures, models_package=args.models_package)
+
+    if ":" not in args.metadata:
+        raise SystemExit("--metadata must be e.g. 'yourlib.models:Base'.")
+    metadata = get_class(*args.metadata.split(":", 1))
+
+    fixture_keys = args.keys or list(manager.keys())
+    if not args.force and artifact.is_up_to_date(
+            manager, args.output, metadata=metadata,
+            fixture_keys=fixture_keys):
+        print("%s is up to date." % args.output)
+        return
+
+    manifest = artifact.build_database(manager, metadata, args.output,
+                                       fixture_keys=fixture_keys)
+    print("Installed %d fixtures in %s." % (len(manifest["fixtures"]),
+                                            args.output))
+
+
+def serve(args):
+    print("Serving fixtures definitions on %s." % args.socket)
+    server.serve(args.socket)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="charlatan")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    build = subparsers.add_parser(
+        "build-db",
+        help="install fixtures in a SQLite database, to be reused by tests")
+    build.add_argument("fixtures", nargs="+",
+                       help="fixtures files (or globs)")
+    build.add_argument("--metadata", required=True,
+                       help="SQLAlchemy metadata or declarative base of the "
+                            "models, e.g. 'yourlib.models:Base'")
+    build.add_argument("--output", "-o", required=True,
+                       help="path of the SQLite database")
+    build.add_argument("--models-package", default="",
+                       help="default models package of the fixtures")
+    build.add_argument("--key", "-k", dest="keys", action="append",
+                       help="fixture to be installed (repeatable), "
+                            "defaults to all the fixtures")
+    build.add_argument("--force", action="store_true",
+                       help="build the database even if it is up to date")
+    build.set_defaults(func=build_db)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="serve parsed fixtures files over a Unix socket")
+    serve_parser.add_argument("--socket", "-s", required=True,
+                              help="path of the Unix socket")
+    serve_parser.set_defaults(func=serve)
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
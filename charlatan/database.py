@@ -0,0 +1,305 @@
+"""Helpers for fixtures saved in a database with SQLAlchemy."""
+import itertools
+
+from charlatan import _compat
+
+
+def get_primary_key(instance):
+    """Return the primary key of a persisted SQLAlchemy instance.
+
+    :rtype: scalar value, tuple for composite primary keys, or ``None`` if
+        the instance was not persisted.
+    """
+    from sqlalchemy import inspect
+
+    identity = inspect(instance).identity
+    if identity is None:
+        return None
+
+    if len(identity) == 1:
+        return identity[0]
+
+    return identity
+
+
+def query_by_primary_keys(session, model, primary_keys, batch_size=500):
+    """Return a dict of instances by primary key, with a single query.
+
+    :param Session session:
+    :param model: SQLAlchemy model, with a single-column primary key
+    :param list primary_keys:
+    :param int batch_size: maximum number of primary keys per query, to stay
+        below the database's limit of parameters per statement.
+
+    Primary keys that are not in the database are not in the returned dict.
+    """
+    from sqlalchemy import inspect
+
+    column = inspect(model).primary_key[0]
+    primary_keys = list(primary_keys)
+    returned = {}
+    for i in range(0, len(primary_keys), batch_size):
+        batch = primary_keys[i:i + batch_size]
+        for instance in session.query(model).filter(column.in_(batch)):
+            returned[get_primary_key(instance)] = instance
+    return returned
+
+
+def get_existing_primary_keys(session, model, primary_keys,
+                              batch_size=500):
+    """Return the primary keys that are in the database.
+
+    :param Session session:
+    :param model: SQLAlchemy model, with a single-column primary key
+    :param list primary_keys:
+    :param int batch_size: maximum number of primary keys per query
+    :rtype: set
+
+    .. versionadded:: 0.4.8
+    """
+    from sqlalchemy import inspect
+
+    column = inspect(model).primary_key[0]
+    primary_keys = list(primary_keys)
+    returned = set()
+    for i in range(0, len(primary_keys), batch_size):
+        batch = primary_keys[i:i + batch_size]
+        returned.update(row[0] for row in
+                        session.query(column).filter(column.in_(batch)))
+    return returned
+
+
+def delete_instances(session, instances, batch_size=500):
+    """Delete instances with one ``DELETE ... WHERE pk IN`` per table.
+
+    :param Session session:
+    :param list instances: SQLAlchemy instances or :class:`PrimaryKeyStub`
+    :param int batch_size: maximum number of primary keys per statement
+    :rtype: int, number of deleted rows
+
+    Tables are deleted in reverse dependency order (see SQLAlchemy's
+    ``sort_tables``): rows are deleted before the rows they reference.
+    Instances mapped to several tables (joined inheritance) or with a
+    composite primary key are deleted with the session. Deleted instances
+    are expunged from the session, which is not committed.
+
+    .. versionadded:: 0.4.8
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import sort_tables
+
+    # Table: (primary key column, set of primary keys)
+    by_table = {}
+    for instance in instances:
+        if isinstance(instance, PrimaryKeyStub):
+            model, primary_key = instance.model, instance.primary_key
+        else:
+            model, primary_key = type(instance), get_primary_key(instance)
+            if instance in session:
+                session.expunge(instance)
+        if primary_key is None:
+            continue
+
+        mapper = inspect(model)
+        if len(mapper.tables) > 1 or len(mapper.primary_key) > 1:
+            if isinstance(instance, PrimaryKeyStub):
+                session.delete(instance.load(session))
+            else:
+                session.delete(session.merge(instance))
+            continue
+
+        column = mapper.primary_key[0]
+        by_table.setdefault(column.table, (column, set()))[1].add(primary_key)
+
+    count = 0
+    for table in reversed(sort_tables(list(by_table))):
+        column, primary_keys = by_table[table]
+        primary_keys = list(primary_keys)
+        for i in range(0, len(primary_keys), batch_size):
+            batch = primary_keys[i:i + batch_size]
+            result = session.execute(table.delete().where(column.in_(batch)))
+            count += result.rowcount
+
+    session.flush()
+    return count
+
+
+def get_tables(model):
+    """Return the tables a SQLAlchemy model is mapped to.
+
+    .. versionadded:: 0.4.8
+    """
+    from sqlalchemy import inspect
+
+    return list(inspect(model).tables)
+
+
+def clear_tables(session, tables):
+    """Delete all the rows of tables, in foreign key order.
+
+    :param Session session:
+    :param tables: SQLAlchemy ``Table`` objects
+
+    Tables are emptied with one ``DELETE`` per table, referencing tables
+    first, or a single ``TRUNCATE`` with PostgreSQL. With SQLite, foreign
+    keys are only checked when committing (``PRAGMA defer_foreign_keys``):
+    tables referencing each other can be emptied in any order. The session
+    is not committed.
+
+    .. versionadded:: 0.4.8
+    """
+    from sqlalchemy import text
+    from sqlalchemy.schema import sort_tables
+
+    tables = list(reversed(sort_tables(list(tables))))
+    if not tables:
+        return
+
+    dialect = session.connection().dialect
+    if dialect.name == "postgresql":
+        session.execute(text("TRUNCATE TABLE %s" % ", ".join(
+            dialect.identifier_preparer.format_table(t) for t in tables)))
+        return
+
+    if dialect.name == "sqlite":
+        # Reset when the transaction ends.
+        session.execute(text("PRAGMA defer_foreign_keys = ON"))
+    for table in tables:
+        session.execute(table.delete())
+
+
+def has_single_primary_key(model):
+    """Return True if model is mapped with a single-column primary key."""
+    from sqlalchemy import inspect
+
+    return len(inspect(model).primary_key) == 1
+
+
+class PrimaryKeyStub(object):
+
+    """Reference to an instance saved in the database.
+
+    :param model: the instance's class
+    :param primary_key: the instance's primary key
+
+    Stubs are stored in the manager's cache instead of the instance itself to
+    save memory. They are replaced by the instance, loaded from the database,
+    the first time they are accessed.
+
+    .. versionadded:: 0.4.8
+    """
+
+    __slots__ = ("model", "primary_key")
+
+    def __init__(self, model, primary_key):
+        self.model = model
+        self.primary_key = primary_key
+
+    def __repr__(self):
+        return "<PrimaryKeyStub %s %r>" % (self.model.__name__,
+                                           self.primary_key)
+
+    @classmethod
+    def from_instance(cls, instance):
+        """Return a stub for a persisted instance."""
+        return cls(instance.__class__, get_primary_key(instance))
+
+    def load(self, session):
+        """Return the instance from the database."""
+        return session.query(self.model).get(self.primary_key)
+
+
+class PrimaryKeyAllocator(object):
+
+    """Assign primary keys to instances before they are saved.
+
+    :param dict keys: primary keys to use, by model or table name. Values
+        are either the first primary key (an int), or an iterable of primary
+        keys (e.g. a ``range``). By default, keys start after the table's
+        current maximum primary key.
+    :param dict sequences: name of the sequence used by each table, which
+        is advanced after the instances are saved (PostgreSQL only).
+
+    Since primary keys are known before saving, foreign keys can be set
+    right away, and whole tables can be inserted in a single batch without
+    having to wait for the database to return the generated keys.
+
+    Only models with a single-column primary key are supported.
+
+    .. versionadded:: 0.4.8
+    """
+
+    def __init__(self, keys=None, sequences=None):
+        self.keys = keys or {}
+        self.sequences = sequences or {}
+        # Table name: (primary key column name, last allocated primary key)
+        self.last_keys = {}
+        self._iterators = {}
+
+    def allocate(self, session, instance):
+        """Assign a primary key to an instance that doesn't have one.
+
+        :rtype: the instance's primary key
+        """
+        from sqlalchemy import inspect
+
+        mapper = inspect(instance).mapper
+        if len(mapper.primary_key) != 1:
+            return None
+
+        column = mapper.primary_key[0]
+        attribute = mapper.get_property_by_column(column).key
+        primary_key = getattr(instance, attribute)
+        if primary_key is not None:
+            return primary_key
+
+        table = column.table.name
+        if table not in self._iterators:
+            self._iterators[table] = self._get_keys(session, mapper.class_,
+                                                    column)
+
+        try:
+            primary_key = next(self._iterators[table])
+        except StopIteration:
+            raise ValueError("No primary key left for '%s'." % table)
+
+        setattr(instance, attribute, primary_key)
+        self.last_keys[table] = (column.name, primary_key)
+        return primary_key
+
+    def _get_keys(self, session, model, column):
+        """Return an iterator over the primary keys of a table."""
+        for name in (model, column.table.name):
+            if name in self.keys:
+                keys = self.keys[name]
+                if isinstance(keys, _compat.integer_types):
+                    return itertools.count(keys)
+                return iter(keys)
+
+        from sqlalchemy import func
+
+        current = session.query(func.max(column)).scalar()
+        return itertools.count((current or 0) + 1)
+
+    def advance_sequences(self, session):
+        """Advance the sequences past the allocated primary keys."""
+        if session.get_bind().dialect.name != "postgresql":
+            # e.g. SQLite and MySQL use the maximum primary key.
+            return
+
+        from sqlalchemy import text
+
+        for table, (column, last_key) in _compat.iteritems(self.last_keys):
+            sequence = self.sequences.get(table)
+            if sequence is None:
+                sequence = session.execute(
+                    text("SELECT pg_get_serial_sequence(:table, :column)"),
+                    {"table": table, "column": column}).scalar()
+            if sequence is None:
+                continue
+
+            # Never move a sequence backward.
+            session.execute(
+                text("SELECT setval(:sequence, GREATEST(:last_key, "
+                     "COALESCE(pg_sequence_last_value(:sequence), 0)))"),
+                {"sequence": sequence, "last_key": last_key})
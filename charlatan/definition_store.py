@@ -0,0 +1,82 @@
+"""Share the loaded fixtures between the managers of a process.
+
+Managers created with ``share_definitions=True`` that load the same files
+(with the same content) share the same fixtures and dependency graph, which
+are only parsed and built once per process. Each manager keeps its own
+cache, installed fixtures, session, builders and hooks.
+
+The shared fixtures must be considered read-only.
+
+.. versionadded:: 0.4.8
+"""
+import hashlib
+import threading
+
+_lock = threading.Lock()
+# Digest of the loaded files: (root collection, dependency graph, whether
+# fixtures are loaded from the database)
+_definitions = {}
+
+
+def get_digest(fixtures_manager, loaded, include_options=True):
+    """Return a digest of the loaded files and of the loading options.
+
+    :param FixturesManager fixtures_manager:
+    :param list loaded: ``(filenames, models_package)`` of each call to
+        :meth:`charlatan.FixturesManager.load`
+    :param bool include_options: if False, only the files are taken into
+        account, not the manager's class and loading options
+    """
+    digest = hashlib.sha1()
+    if include_options:
+        options = (fixtures_manager.__class__.__module__,
+                   fixtures_manager.__class__.__name__,
+                   fixtures_manager.use_unicode,
+                   fixtures_manager.lazy_definitions)
+        digest.update(repr(options).encode("utf-8"))
+
+    for filenames, models_package in loaded:
+        digest.update(repr(models_package).encode("utf-8"))
+        for filename in fixtures_manager._glob_filenames(filenames):
+            digest.update(repr(filename).encode("utf-8"))
+            with open(filename, "rb") as f:
+                digest.update(f.read())
+
+    return digest.hexdigest()
+
+
+def get_definitions(fixtures_manager, loaded):
+    """Return the fixtures loaded from files, loading them if necessary.
+
+    :param FixturesManager fixtures_manager: the manager loading the files
+    :param list loaded: ``(filenames, models_package)`` of each call to
+        :meth:`charlatan.FixturesManager.load`
+    :rtype: tuple of (root collection, :class:`charlatan.depgraph.DepGraph`,
+        bool: True if fixtures are defined with an ``id``)
+    """
+    digest = get_digest(fixtures_manager, loaded)
+    with _lock:
+        if digest not in _definitions:
+            # The files are loaded by a manager of their own, so that the
+            # shared fixtures don't hold a reference to any user's manager.
+            loader = fixtures_manager.__class__(
+                use_unicode=fixtures_manager.use_unicode,
+                lazy_definitions=fixtures_manager.lazy_definitions,
+                share_definitions=False)
+            for filenames, models_package in loaded:
+                loader.load(filenames, models_package=models_package)
+            _definitions[digest] = (loader.collection, loader.depgraph,
+                                    loader._has_database_ids)
+
+        return _definitions[digest]
+
+
+def clear():
+    """Forget all the shared fixtures."""
+    with _lock:
+        _definitions.clear()
+
+
+def count():
+    """Return the number of shared sets of fixtures."""
+    return len(_definitions)
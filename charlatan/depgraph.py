@@ -20,6 +20,8 @@ class DepGraph(object):
         self.rtl_edges = collections.defaultdict(list)
         self.ltr_edges = collections.defaultdict(list)
         self._topo_sort_cache = None
+        self._topo_positions = {}
+        self._ancestors_cache = {}
         self.dirty = True
 
     def has_edge_between(self, lhs, rhs):
@@ -67,17 +69,43 @@ class DepGraph(object):
     def topo_sort(self):
         if not self._topo_sort_cache or self.dirty:
             self._topo_sort_cache = self._topo_sort()
+            self._topo_positions = dict(
+                (n, i) for i, n in enumerate(self._topo_sort_cache))
+            self._ancestors_cache = {}
             self.dirty = False
         return self._topo_sort_cache
 
     def ancestors_of(self, node):
         """Return a list of ancestors of given node, in topological order."""
+        self.topo_sort()
+        if node in self._ancestors_cache:
+            return list(self._ancestors_cache[node])
+
         parents = []
         work_queue = [node]
         while work_queue:
-            node = work_queue.pop(0)
-            for parent in self.rtl_edges[node]:
+            current = work_queue.pop(0)
+            for parent in self.rtl_edges.get(current, ()):
                 parents.append(parent)
                 work_queue.append(parent)
-        topo_order = self.topo_sort()
-        return sorted(parents, key=lambda i: topo_order.index(i))
+
+        ancestors = sorted(parents, key=self._topo_positions.__getitem__)
+        self._ancestors_cache[node] = ancestors
+        return list(ancestors)
+
+    def descendants_of(self, node):
+        """Return a list of descendants of given node, in topological order.
+
+        .. versionadded:: 0.4.8
+        """
+        self.topo_sort()
+        children = set()
+        work_queue = [node]
+        while work_queue:
+            current = work_queue.pop(0)
+            for child in self.ltr_edges.get(current, ()):
+                if child not in children:
+                    children.add(child)
+                    work_queue.append(child)
+
+        return sorted(children, key=self._topo_positions.__getitem__)
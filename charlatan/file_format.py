@@ -5,6 +5,7 @@ import pytz
 import yaml
 from yaml.constructor import Constructor
 
+from charlatan import generators
 from charlatan.utils import datetime_to_epoch_in_ms
 from charlatan.utils import datetime_to_epoch_timestamp
 from charlatan.utils import get_timedelta
@@ -35,64 +36,129 @@ class UnnamedRelationshipToken(dict):
     pass
 
 
-def configure_yaml():
-    """Add some custom tags to the YAML constructor."""
-    def now_constructor(loader, node):
-        """Return a function that returns the current datetime."""
-        delta = get_timedelta(loader.construct_scalar(node))
+class Now(object):
 
-        def get_now():
-            returned = datetime.datetime.utcnow()
-            if TIMEZONE_AWARE:
-                returned = returned.replace(tzinfo=pytz.utc)
-            return returned + delta
+    """Return the current datetime (shifted by delta) when called.
 
-        return get_now
+    The datetime is timezone aware (UTC) unless ``TIMEZONE_AWARE`` is False.
 
-    def now_naive_constructor(loader, node):
-        """Return a function that returns the current datetime.
+    The ``!now`` family of tags returns instances of module-level classes
+    (instead of closures) so that loaded definitions can be pickled.
 
-        The returned datetime is always a naive datetime (i.e. without
-        timezone information).
+    .. versionadded:: 0.4.8
+    """
 
-        See the introduction in `datetime
-        <https://docs.python.org/2/library/datetime.html>`_ for more
-        information.
-        """
-        delta = get_timedelta(loader.construct_scalar(node))
+    def __init__(self, delta):
+        self.delta = delta
 
-        def get_now():
-            return datetime.datetime.utcnow() + delta
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.delta)
 
-        return get_now
+    def __call__(self):
+        returned = datetime.datetime.utcnow()
+        if TIMEZONE_AWARE:
+            returned = returned.replace(tzinfo=pytz.utc)
+        return returned + self.delta
 
-    def epoch_now_constructor(loader, node):
-        """Return a function that returns the current epoch."""
-        delta = get_timedelta(loader.construct_scalar(node))
 
-        def get_now():
-            return datetime_to_epoch_timestamp(
-                datetime.datetime.utcnow() + delta)
+class NowNaive(Now):
 
-        return get_now
+    """Return the current naive datetime (shifted by delta) when called.
 
-    def epoch_now_in_ms_constructor(loader, node):
-        """Return a function that returns the current epoch in milliseconds.
+    The returned datetime is always a naive datetime (i.e. without
+    timezone information).
+
+    See the introduction in `datetime
+    <https://docs.python.org/2/library/datetime.html>`_ for more
+    information.
+    """
+
+    def __call__(self):
+        return datetime.datetime.utcnow() + self.delta
+
+
+class EpochNow(Now):
+
+    """Return the current epoch (shifted by delta) when called."""
+
+    def __call__(self):
+        return datetime_to_epoch_timestamp(
+            datetime.datetime.utcnow() + self.delta)
+
+
+class EpochNowInMs(Now):
+
+    """Return the current epoch in milliseconds when called.
+
+    :rtype: int
+    """
+
+    def __call__(self):
+        return datetime_to_epoch_in_ms(datetime.datetime.utcnow() + self.delta)
+
+
+def configure_yaml():
+    """Add some custom tags to the YAML constructor."""
+    def now_constructor(loader, node):
+        """Return a function that returns the current datetime."""
+        return Now(get_timedelta(loader.construct_scalar(node)))
 
-        :rtype: int
-        """
-        delta = get_timedelta(loader.construct_scalar(node))
+    def now_naive_constructor(loader, node):
+        """Return a function that returns the current naive datetime."""
+        return NowNaive(get_timedelta(loader.construct_scalar(node)))
 
-        def get_now():
-            return datetime_to_epoch_in_ms(datetime.datetime.utcnow() + delta)
+    def epoch_now_constructor(loader, node):
+        """Return a function that returns the current epoch."""
+        return EpochNow(get_timedelta(loader.construct_scalar(node)))
 
-        return get_now
+    def epoch_now_in_ms_constructor(loader, node):
+        """Return a function that returns the current epoch in ms."""
+        return EpochNowInMs(get_timedelta(loader.construct_scalar(node)))
 
     def relationship_constructor(loader, node):
         """Create _RelationshipToken for `!rel` tags."""
         name = loader.construct_scalar(node)
         return RelationshipToken(name)
 
+    def seq_constructor(loader, node):
+        """Return a sequence generator, e.g. `!seq 1` or `!seq [1, 2]`."""
+        if isinstance(node, yaml.SequenceNode):
+            args = loader.construct_sequence(node)
+        else:
+            value = loader.construct_scalar(node)
+            args = [value] if value else []
+        return generators.Sequence(*[int(arg) for arg in args])
+
+    def choice_constructor(loader, node):
+        """Return a generator cycling through a list of values."""
+        return generators.Choice(loader.construct_sequence(node, deep=True))
+
+    def format_constructor(loader, node):
+        """Return a generator formatting a string for each row."""
+        return generators.Format(loader.construct_scalar(node))
+
+    def rand_int_constructor(loader, node):
+        """Return a generator of random integers, e.g. `!rand_int [1, 6]`."""
+        return generators.RandomInt(*loader.construct_sequence(node))
+
+    def rand_float_constructor(loader, node):
+        """Return a generator of random floats, e.g. `!rand_float [0, 1]`."""
+        return generators.RandomFloat(*loader.construct_sequence(node))
+
+    def rand_choice_constructor(loader, node):
+        """Return a generator picking values at random in a list."""
+        return generators.RandomChoice(
+            loader.construct_sequence(node, deep=True))
+
+    def rand_datetime_constructor(loader, node):
+        """Return a generator of random datetimes, e.g. `!rand_datetime -1d`
+        or `!rand_datetime [-30d, +1d]`."""
+        if isinstance(node, yaml.SequenceNode):
+            args = loader.construct_sequence(node)
+        else:
+            args = [loader.construct_scalar(node)]
+        return generators.get_random_datetime(*args)
+
     yaml.add_constructor(
         u'!now', now_constructor, yaml.UnsafeLoader)
     yaml.add_constructor(
@@ -103,6 +169,20 @@ def configure_yaml():
         u'!epoch_now_in_ms', epoch_now_in_ms_constructor, yaml.UnsafeLoader)
     yaml.add_constructor(
         u'!rel', relationship_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!seq', seq_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!choice', choice_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!format', format_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!rand_int', rand_int_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!rand_float', rand_float_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!rand_choice', rand_choice_constructor, yaml.UnsafeLoader)
+    yaml.add_constructor(
+        u'!rand_datetime', rand_datetime_constructor, yaml.UnsafeLoader)
 
 
 def configure_output(use_unicode=False):
@@ -3,12 +3,51 @@ import importlib
 
 from charlatan import _compat
 from charlatan.file_format import RelationshipToken
+from charlatan.proxy import FixtureProxy, resolve
 from charlatan.utils import safe_iteritems, richgetter, deep_update
 
 CAN_BE_INHERITED = frozenset(
     ["model_name", "models_package", "fields", "post_creation", "depend_on"])
 
 
+class FrozenDict(dict):
+
+    """A read-only dict.
+
+    Copying it returns a regular (mutable) dict, so that it can be used as a
+    default value for fields that are copied before being modified.
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("'%s' object is read-only" % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+
+# Shared by all the fixtures that do not define fields or post_creation.
+EMPTY_DICT = FrozenDict()
+
+
+def intern_string(value):
+    """Return the interned version of a string, when it can be interned.
+
+    Fixture keys and model names are repeated across a lot of fixtures and
+    cache lookups, interning them saves memory and speeds up comparisons.
+    """
+    if type(value) is str:
+        return _compat.intern(value)
+    return value
+
+
 def get_class(module, klass):
     """Return a class object.
 
@@ -24,8 +63,109 @@ def get_class(module, klass):
     return cls
 
 
+def extract_rel_name(name):
+    """Return the relationship and attr from an argument to !rel."""
+    rel_name = name  # e.g. toaster.color
+    attr = None
+
+    # TODO: we support only one level for now
+    if "." in name:
+        path = name.split(".")
+        rel_name, attr = path[0], path[1]
+    return rel_name, attr
+
+
+def extract_relationships(fields, depend_on=()):
+    """Return all dependencies found in fields and ``depend_on``.
+
+    :param dict fields:
+    :param list depend_on:
+    :rtype generator:
+
+    Yields ``(depends_on, attr_name)``.
+    """
+    # TODO: make this DRYer since it's mostly copied from
+    # Fixture._process_relationships
+
+    for dep in depend_on or ():
+        yield dep, None
+
+    for name, value in safe_iteritems(fields):
+        # One to one relationship
+        if isinstance(value, RelationshipToken):
+            yield extract_rel_name(value)
+
+        # One to many relationship
+        elif isinstance(value, (tuple, list)):
+            for i, nested_value in enumerate(value):
+                if isinstance(nested_value, RelationshipToken):
+                    yield extract_rel_name(nested_value)
+
+
+class FixtureDefinition(object):
+
+    """Hold the raw definition of a fixture until it is accessed.
+
+    :param str key: the fixture's key (``None`` for entries of a
+        collection, their key is computed from their name)
+    :param dict definition: the definition, as parsed from the file
+    :param str models_package: default models package for relative imports
+    :param bool nested: True if the definition is an entry of a collection
+
+    Used when the fixtures are loaded with ``lazy_definitions``: the
+    :class:`Fixture` (or collection) is created by the collection holding the
+    definition the first time it is accessed.
+
+    .. versionadded:: 0.4.8
+    """
+
+    __slots__ = ("key", "definition", "models_package", "nested")
+
+    def __init__(self, key, definition, models_package='', nested=False):
+        self.key = intern_string(key)
+        self.definition = definition
+        self.models_package = models_package
+        self.nested = nested
+
+    def __repr__(self):
+        return "<FixtureDefinition '%s'>" % self.key
+
+    def extract_relationships(self):
+        """Return all dependencies, without creating the fixture.
+
+        Yields ``(depends_on, attr_name)``.
+        """
+        return _extract_definition_relationships(self.definition,
+                                                 self.nested)
+
+
+def _extract_definition_relationships(definition, nested):
+    """Return all dependencies of a raw definition."""
+    if "objects" in definition:
+        for _, entry in safe_iteritems(definition["objects"]):
+            for r in _extract_definition_relationships(entry, nested=True):
+                yield r
+        return
+
+    if nested:
+        # Entries of a collection don't have depend_on, and their fields may
+        # be defined at the first level.
+        fields = definition.get("fields", definition)
+        depend_on = ()
+    else:
+        fields = definition.get("fields") or EMPTY_DICT
+        depend_on = definition.get("depend_on")
+
+    for r in extract_relationships(fields, depend_on):
+        yield r
+
+
 class Inheritable(object):
 
+    __slots__ = ("_has_inherited_from_parent", "inherit_from", "deep_inherit",
+                 "fixture_manager", "key", "model_name", "models_package",
+                 "fields", "post_creation", "depend_on")
+
     def __init__(self, *args, **kwargs):
         # This is to make sure we don't redo the inheritance twice, for
         # performance reason.
@@ -42,6 +182,7 @@ class Inheritable(object):
 
         for name, value in self.get_parent_values():
             setattr(self, name, value)
+        self._has_inherited_from_parent = True
 
     def get_parent_values(self):
         """Return parent values."""
@@ -80,6 +221,8 @@ class Fixture(Inheritable):
 
     """Represent a fixture that can be installed."""
 
+    __slots__ = ("database_id", )
+
     def __init__(self, key, fixture_manager,
                  model=None, fields=None,
                  inherit_from=None,
@@ -99,6 +242,10 @@ class Fixture(Inheritable):
         :param bool deep_inherit: if True, fields will support nested updates
         :param list depend_on: A list of relationships to depend on
 
+        .. versionchanged:: 0.4.8
+            Fixtures use ``__slots__``, empty ``fields`` and ``post_creation``
+            are shared read-only dicts.
+
         .. versionadded:: 0.4.5
             ``deep_inherit`` argument added.
 
@@ -112,29 +259,35 @@ class Fixture(Inheritable):
             raise ValueError(
                 "Cannot provide both id and fields to create fixture.")
 
-        self.key = key
+        self.key = intern_string(key)
         self.fixture_manager = fixture_manager
 
         self.database_id = id_
-        self.inherit_from = inherit_from
+        self.inherit_from = intern_string(inherit_from)
         self.deep_inherit = deep_inherit
 
         # Stuff that can be inherited.
-        self.model_name = model
-        self.models_package = models_package
-        self.fields = fields or {}
-        self.post_creation = post_creation or {}
+        self.model_name = intern_string(model)
+        self.models_package = intern_string(models_package)
+        self.fields = fields or EMPTY_DICT
+        self.post_creation = post_creation or EMPTY_DICT
         self.depend_on = depend_on
 
     def __repr__(self):
         return "<Fixture '%s'>" % self.key
 
-    def get_instance(self, path=None, overrides=None, builder=None):
+    def get_instance(self, path=None, overrides=None, builder=None,
+                     fixture_manager=None):
         """Instantiate the fixture using the model and return the instance.
 
         :param str path: remaining path to return
         :param dict overrides: overriding fields
         :param func builder: function that is used to get the fixture
+        :param FixturesManager fixture_manager: manager getting the
+            fixture, defaults to the manager that created it
+
+        .. versionadded:: 0.4.8
+            ``fixture_manager`` argument added.
 
         .. deprecated:: 0.4.0
             ``fields`` argument renamed ``overrides``.
@@ -146,19 +299,21 @@ class Fixture(Inheritable):
             ``include_relationships`` argument removed.
 
         """
+        fixture_manager = fixture_manager or self.fixture_manager
         self.inherit_from_parent()  # Does the modification in place.
 
-        if self.database_id:
-            object_class = self.get_class()
+        object_class = self.get_class()
+        if self.database_id and object_class:
             # No need to create a new object, just get it from the db
-            instance = (
-                self.fixture_manager.session.query(object_class)
-                .get(self.database_id)
-            )
+            instance = fixture_manager.get_database_instance(
+                object_class, self.database_id)
 
         else:
             # We need to do a copy since we're modifying them.
             params = copy.deepcopy(self.fields)
+            if self.database_id:
+                # A collection entry without model, e.g. a dict.
+                params["id"] = self.database_id
             if overrides:
                 params.update(overrides)
 
@@ -166,15 +321,12 @@ class Fixture(Inheritable):
                 if callable(value):
                     params[key] = value()
 
-            # Get the class
-            object_class = self.get_class()
-
             # Does not return anything, does the modification in place (in
             # fields).
-            self._process_relationships(params)
+            self._process_relationships(params, fixture_manager)
 
             if object_class:
-                instance = builder(self.fixture_manager, object_class, params)
+                instance = builder(fixture_manager, object_class, params)
             else:
                 # Return the fields as is. This allows to enter dicts
                 # and lists directly.
@@ -183,7 +335,7 @@ class Fixture(Inheritable):
         # Do any extra assignment
         for attr, value in self.post_creation.items():
             if isinstance(value, RelationshipToken):
-                value = self.get_relationship(value)
+                value = self.get_relationship(value, fixture_manager)
 
             setattr(instance, attr, value)
 
@@ -221,17 +373,7 @@ class Fixture(Inheritable):
             # Then try to import from yourlib:Toaster
             return get_class(self.models_package, klass)
 
-    @staticmethod
-    def extract_rel_name(name):
-        """Return the relationship and attr from an argument to !rel."""
-        rel_name = name  # e.g. toaster.color
-        attr = None
-
-        # TODO: we support only one level for now
-        if "." in name:
-            path = name.split(".")
-            rel_name, attr = path[0], path[1]
-        return rel_name, attr
+    extract_rel_name = staticmethod(extract_rel_name)
 
     def extract_relationships(self):
         """Return all dependencies.
@@ -241,27 +383,14 @@ class Fixture(Inheritable):
         Yields ``(depends_on, attr_name)``.
 
         """
-        # TODO: make this DRYer since it's mostly copied from
-        # _process_relationships
+        return extract_relationships(self.fields, self.depend_on)
 
-        for dep in self.depend_on:
-            yield dep, None
-
-        for name, value in safe_iteritems(self.fields):
-            # One to one relationship
-            if isinstance(value, RelationshipToken):
-                yield self.extract_rel_name(value)
-
-            # One to many relationship
-            elif isinstance(value, (tuple, list)):
-                for i, nested_value in enumerate(value):
-                    if isinstance(nested_value, RelationshipToken):
-                        yield self.extract_rel_name(nested_value)
-
-    def _process_field_relationships(self, field_value):
+    def _process_field_relationships(self, field_value, fixture_manager=None):
         """Create any relationship for a field if needed.
 
         :param mixed field_value: field value to be processed
+        :param FixturesManager fixture_manager: manager getting the
+            relationships
 
         For each field that is a relationship or a list of relationships,
         instantiate those relationships and update the fields.
@@ -270,20 +399,26 @@ class Fixture(Inheritable):
         """
         # One to one relationship
         if isinstance(field_value, RelationshipToken):
-            return self.get_relationship(field_value)
+            return self.get_relationship(field_value, fixture_manager)
+
+        # Lazy instance, e.g. provided as an override
+        elif type(field_value) is FixtureProxy:
+            return resolve(field_value)
 
         # One to many relationship
         elif isinstance(field_value, (tuple, list)):
             for i, nested_value in enumerate(field_value):
                 field_value[i] = self._process_field_relationships(
-                    nested_value)
+                    nested_value, fixture_manager)
 
         return field_value
 
-    def _process_relationships(self, fields):
+    def _process_relationships(self, fields, fixture_manager=None):
         """Create any relationship if needed.
 
         :param dict fields: fields to be processed
+        :param FixturesManager fixture_manager: manager getting the
+            relationships
 
         For each field that is a relationship or a list of relationships,
         instantiate those relationships and update the fields.
@@ -298,12 +433,14 @@ class Fixture(Inheritable):
             field_iterator = enumerate(fields)
 
         for name, value in field_iterator:
-            fields[name] = self._process_field_relationships(value)
+            fields[name] = self._process_field_relationships(
+                value, fixture_manager)
 
-    def get_relationship(self, name):
+    def get_relationship(self, name, fixture_manager=None):
         """Get a relationship and its attribute if necessary."""
         # This function is needed so that this fixture can require other
         # fixtures. If a fixture requires another fixture, it
         # necessarily means that it needs to include other relationships
         # as well.
-        return self.fixture_manager.get_fixture(name)
+        fixture_manager = fixture_manager or self.fixture_manager
+        return resolve(fixture_manager.get_fixture(name))
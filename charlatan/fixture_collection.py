@@ -1,5 +1,7 @@
-from charlatan import _compat, utils
-from charlatan.fixture import Inheritable
+from charlatan import _compat, generators, utils
+from charlatan.fixture import EMPTY_DICT, Fixture, FixtureDefinition
+from charlatan.fixture import Inheritable, extract_relationships
+from charlatan.fixture import intern_string
 
 
 def _sorted_iteritems(dct):
@@ -12,6 +14,8 @@ class FixtureCollection(Inheritable):
 
     """A FixtureCollection holds Fixture objects."""
 
+    __slots__ = ("fixtures", )
+
     def __init__(self, key, fixture_manager,
                  model=None,
                  models_package=None,
@@ -21,37 +25,63 @@ class FixtureCollection(Inheritable):
                  depend_on=None,
                  fixtures=None):
         super(FixtureCollection, self).__init__()
-        self.key = key
+        self.key = intern_string(key)
         self.fixture_manager = fixture_manager
         self.fixtures = fixtures or self.container()
 
-        self.key = key
-
-        self.inherit_from = inherit_from
-        self._has_updated_from_parent = False
+        self.inherit_from = intern_string(inherit_from)
 
         # Stuff that can be inherited.
-        self.fields = fields or {}
-        self.model_name = model
-        self.models_package = models_package
-        self.post_creation = post_creation or {}
+        self.fields = fields or EMPTY_DICT
+        self.model_name = intern_string(model)
+        self.models_package = intern_string(models_package)
+        self.post_creation = post_creation or EMPTY_DICT
         self.depend_on = depend_on
 
     def __repr__(self):
         return "<%s '%s'>" % (self.__class__.__name__, self.key)
 
     def __iter__(self):
-        return self.iterator(self.fixtures)
+        for name, fixture in self.iterator(self.fixtures):
+            yield name, self._resolve(name, fixture)
+
+    def _resolve(self, name, fixture, store=True):
+        """Return the fixture, creating it if it's still a raw definition.
 
-    def get_instance(self, path=None, overrides=None, builder=None):
+        :param name: name of the fixture in the collection
+        :param fixture: :class:`Fixture`, collection or
+            :class:`charlatan.fixture.FixtureDefinition`
+        :param bool store: if False, the created fixture is not kept in the
+            collection
+        """
+        if not isinstance(fixture, FixtureDefinition):
+            return fixture
+
+        fixture = self.fixture_manager.make_fixture(fixture,
+                                                    namespace=self.key,
+                                                    name=name)
+        if store:
+            self.fixtures[name] = fixture
+        fixture.inherit_from_parent()
+        return fixture
+
+    def get_instance(self, path=None, overrides=None, builder=None,
+                     fixture_manager=None):
         """Get an instance.
 
         :param str path:
         :param dict overrides:
         :param func builder:
+        :param FixturesManager fixture_manager: manager getting the
+            instance, defaults to the manager that created the collection
+
+        .. versionadded:: 0.4.8
+            ``fixture_manager`` argument added.
         """
+        fixture_manager = fixture_manager or self.fixture_manager
         if not path:
-            return self.get_all_instances(overrides=overrides, builder=builder)
+            return self.get_all_instances(overrides=overrides, builder=builder,
+                                          fixture_manager=fixture_manager)
 
         remaining_path = ''
         if isinstance(path, _compat.string_types):
@@ -60,7 +90,11 @@ class FixtureCollection(Inheritable):
             remaining_path = ".".join(path[1:])
 
         # First try to get the fixture from the cache
-        instance = self.fixture_manager.cache.get(first_level)
+        if self is fixture_manager.collection:
+            cache_key = first_level
+        else:
+            cache_key = "%s.%s" % (self.key, first_level)
+        instance = fixture_manager.get_cached(cache_key)
         if (not overrides
                 and instance
                 and not isinstance(instance, FixtureCollection)):
@@ -69,27 +103,33 @@ class FixtureCollection(Inheritable):
             return utils.richgetter(instance, remaining_path)
 
         # Or just get it
-        fixture = self.get(first_level)
+        fixture = self._get_entry(first_level, fixture_manager)
         # Then we ask it to return an instance.
         return fixture.get_instance(path=remaining_path,
                                     overrides=overrides,
                                     builder=builder,
+                                    fixture_manager=fixture_manager,
                                     )
 
-    def get_all_instances(self, overrides=None, builder=None):
+    def _get_entry(self, name, fixture_manager):
+        """Return a fixture of the collection, for the manager getting its
+        instance."""
+        return self.get(name)
+
+    def get_all_instances(self, overrides=None, builder=None,
+                          fixture_manager=None):
         """Get all instances.
 
         :param dict overrides:
         :param func builder:
+        :param FixturesManager fixture_manager:
 
         .. deprecated:: 0.4.0
             Removed format argument.
         """
-        returned = []
-        for name, fixture in self:
-            instance = fixture.get_instance(overrides=overrides,
-                                            builder=builder)
-            returned.append((name, instance))
+        returned = list(self.iter_instances(overrides=overrides,
+                                            builder=builder,
+                                            fixture_manager=fixture_manager))
 
         if self.container is dict:
             return dict(returned)
@@ -98,14 +138,48 @@ class FixtureCollection(Inheritable):
         else:
             raise ValueError('Unknown container')
 
+    def iter_instances(self, overrides=None, builder=None,
+                       fixture_manager=None):
+        """Iterate over all instances, one at a time.
+
+        :param dict overrides:
+        :param func builder: defaults to the manager's ``get_builder``
+        :param FixturesManager fixture_manager: manager getting the
+            instances, defaults to the manager that created the collection
+
+        Yields ``(name, instance)``. No reference to the instances is kept,
+        and fixtures that were not created yet (see ``lazy_definitions``) are
+        not kept in the collection either. Without overrides, entries that
+        are cached by the manager (e.g. ``"toasters.green"``) are returned
+        from the cache.
+
+        .. versionadded:: 0.4.8
+        """
+        fixture_manager = fixture_manager or self.fixture_manager
+        builder = builder or fixture_manager.get_builder
+        for name, fixture in self.iterator(self.fixtures):
+            if not overrides and self is not fixture_manager.collection:
+                instance = fixture_manager.get_cached(
+                    "%s.%s" % (self.key, name))
+                if instance is not None:
+                    yield name, instance
+                    continue
+
+            fixture = self._resolve(name, fixture, store=False)
+            yield name, fixture.get_instance(overrides=overrides,
+                                             builder=builder,
+                                             fixture_manager=fixture_manager)
+
     def extract_relationships(self):
-        # Just proxy to fixtures in this collection.
-        for _, fixture in self:
+        # Just proxy to fixtures in this collection (without creating the
+        # ones that have not been accessed yet).
+        for _, fixture in self.iterator(self.fixtures):
             for r in fixture.extract_relationships():
                 yield r
 
 
 class DictFixtureCollection(FixtureCollection):
+    __slots__ = ()
     iterator = staticmethod(_sorted_iteritems)
     container = dict
 
@@ -120,10 +194,11 @@ class DictFixtureCollection(FixtureCollection):
         if path not in self.fixtures:
             raise KeyError("No such fixtures: '%s'" % path)
 
-        return self.fixtures[path]
+        return self._resolve(path, self.fixtures[path])
 
 
 class ListFixtureCollection(FixtureCollection):
+    __slots__ = ()
     iterator = enumerate
     container = list
 
@@ -135,4 +210,163 @@ class ListFixtureCollection(FixtureCollection):
 
         :param str path:
         """
-        return self.fixtures[int(path)]
+        index = int(path)
+        return self._resolve(index, self.fixtures[index])
+
+
+class GeneratedRows(object):
+
+    """Raw definitions of the rows of a generated collection.
+
+    Behaves as a read-only list whose items are created when they are
+    accessed, by batches when iterating. Their random values are seeded with
+    the ``random_seed`` of the collection's manager, :meth:`get` generates a
+    row with another seed (e.g. of another manager sharing the
+    definitions).
+    """
+
+    __slots__ = ("collection", )
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __len__(self):
+        return self.collection.count
+
+    def __getitem__(self, index):
+        return self.get(index, self.collection.fixture_manager.random_seed)
+
+    def get(self, index, random_seed=None):
+        """Return the raw definition of a row.
+
+        :param int index:
+        :param random_seed: seed of the random values, e.g. the manager's
+            ``random_seed``
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Row index out of range: %s" % index)
+        fields, = self.collection.generate_rows(index, index + 1,
+                                                random_seed=random_seed)
+        return self._make_definition(fields)
+
+    def __iter__(self):
+        random_seed = self.collection.fixture_manager.random_seed
+        for _, fields in self.collection.iter_rows(random_seed=random_seed):
+            yield self._make_definition(fields)
+
+    def _make_definition(self, fields):
+        # Generated fields are always the fields of a created instance,
+        # even when they include an id.
+        return FixtureDefinition(None, {"fields": fields},
+                                 self.collection.models_package,
+                                 nested=True)
+
+
+class GeneratedFixtureCollection(ListFixtureCollection):
+
+    """A list collection whose ``count`` entries are generated.
+
+    The fields of the entries are generated (see
+    :mod:`charlatan.generators`) when they are accessed, by batches of
+    :attr:`batch_size` rows. Entries are never kept in the collection.
+
+    .. versionadded:: 0.4.8
+    """
+
+    __slots__ = ("count", )
+    batch_size = 1000
+
+    def __init__(self, key, fixture_manager, count=0, **kwargs):
+        super(GeneratedFixtureCollection, self).__init__(
+            key, fixture_manager, **kwargs)
+        if not isinstance(count, int) or count < 0:
+            raise ValueError("Invalid count for '%s': %r" % (key, count))
+        self.count = count
+        self.fixtures = GeneratedRows(self)
+
+    def add(self, _, fixture):
+        raise TypeError("Cannot add fixtures to generated collection '%s'."
+                        % self.key)
+
+    def _resolve(self, name, fixture, store=True):
+        return super(GeneratedFixtureCollection, self)._resolve(
+            name, fixture, store=False)
+
+    def _get_entry(self, name, fixture_manager):
+        # The row is generated with the seed of the manager getting it,
+        # which may not be the collection's manager (share_definitions).
+        index = int(name)
+        return self._resolve(index, self.fixtures.get(
+            index, random_seed=fixture_manager.random_seed))
+
+    def generate_rows(self, start, stop, random_seed=None):
+        """Return the generated fields of rows ``start`` to ``stop``.
+
+        :param int start:
+        :param int stop:
+        :param random_seed: seed of the random values, e.g. the manager's
+            ``random_seed``
+        """
+        self.inherit_from_parent()
+        seed = None
+        if random_seed is not None:
+            seed = "%s:%s" % (random_seed, self.key)
+        return generators.generate_rows(self.fields, start, stop, seed=seed)
+
+    def iter_rows(self, random_seed=None):
+        """Iterate over the generated fields of all rows, by batches.
+
+        Yields ``(index, fields)``.
+        """
+        for start in range(0, self.count, self.batch_size):
+            stop = min(start + self.batch_size, self.count)
+            rows = self.generate_rows(start, stop, random_seed=random_seed)
+            for index, fields in enumerate(rows, start):
+                yield index, fields
+
+    def get_template(self):
+        """Return the fixture of the entries, without the generated fields.
+
+        Entries are instances of this fixture, with the generated fields of
+        their row as overrides.
+        """
+        self.inherit_from_parent()
+        fields = dict((k, v) for k, v in _compat.iteritems(self.fields)
+                      if not isinstance(v, generators.Generator))
+        return Fixture(key=self.key,
+                       fixture_manager=self.fixture_manager,
+                       model=self.model_name,
+                       models_package=self.models_package,
+                       fields=fields,
+                       post_creation=self.post_creation)
+
+    def iter_instances(self, overrides=None, builder=None,
+                       fixture_manager=None):
+        """Iterate over all instances, one at a time.
+
+        See :meth:`FixtureCollection.iter_instances`. A single fixture is
+        created, and instantiated with the generated fields of each row.
+        """
+        fixture_manager = fixture_manager or self.fixture_manager
+        builder = builder or fixture_manager.get_builder
+        template = self.get_template()
+
+        rows = self.iter_rows(random_seed=fixture_manager.random_seed)
+        for index, row in rows:
+            if not overrides:
+                instance = fixture_manager.get_cached(
+                    "%s.%s" % (self.key, index))
+                if instance is not None:
+                    yield index, instance
+                    continue
+            else:
+                row.update(overrides)
+
+            yield index, template.get_instance(overrides=row,
+                                               builder=builder,
+                                               fixture_manager=fixture_manager)
+
+    def extract_relationships(self):
+        return extract_relationships(self.fields, self.depend_on)
@@ -3,17 +3,29 @@ from glob import glob
 from itertools import chain
 import functools
 import os
+import threading
 
 from charlatan import _compat
 from charlatan import builder
+from charlatan import database
+from charlatan import definition_store
+from charlatan import generators
+from charlatan.database import PrimaryKeyStub
 from charlatan.depgraph import DepGraph
 from charlatan.file_format import load_file
-from charlatan.fixture import Fixture
+from charlatan.fixture import Fixture, FixtureDefinition
+from charlatan.fixture import extract_relationships
 from charlatan import fixture_collection
+from charlatan import plan
+from charlatan import server
+from charlatan.proxy import FixtureProxy
+from charlatan.query_budget import QueryBudget
+from charlatan.utils import is_sqlalchemy_model, iter_instances
 
 ALLOWED_HOOKS = ("before_save", "after_save", "before_install",
                  "after_install")
 ROOT_COLLECTION = "root"
+TEARDOWNS = ("uninstall", "truncate")
 
 
 def make_list(obj):
@@ -23,6 +35,42 @@ def make_list(obj):
     return obj
 
 
+def _get_group(groups, session):
+    """Return the values of a session in a list of ``(session, values)``.
+
+    Sessions are compared by identity (they may not be hashable).
+    """
+    for group_session, values in groups:
+        if group_session is session:
+            return values
+    groups.append((session, []))
+    return groups[-1][1]
+
+
+def _has_database_ids(definition, nested=False):
+    """Return True if a raw definition, or an entry of its collection, is
+    loaded from the database (defined with an ``id``).
+
+    :param dict definition:
+    :param bool nested: if True, it's the definition of a collection entry,
+        which is loaded from the database when written with ``fields``
+    """
+    if not isinstance(definition, dict):
+        return False
+
+    if "objects" in definition:
+        objects = definition["objects"]
+        if isinstance(objects, dict):
+            objects = objects.values()
+        return any(_has_database_ids(o, nested=True) for o in objects or ())
+
+    if "count" in definition:
+        return False
+    if nested:
+        return "fields" in definition and "id" in definition
+    return "id" in definition
+
+
 class FixturesManager(object):
 
     """
@@ -32,6 +80,38 @@ class FixturesManager(object):
     :param bool use_unicode:
     :param func get_builder:
     :param func delete_builder:
+    :param bool lazy_definitions: if True, only keep the parsed definitions
+        when loading the files. Fixture objects are created the first time
+        they are accessed.
+    :param bool lazy_instances: if True, :meth:`get_fixture`,
+        :meth:`install_fixture` (and the methods using them) return
+        :class:`charlatan.proxy.FixtureProxy` objects, which build the
+        instance the first time they are used.
+    :param list listeners: objects notified when a fixture is installed,
+        built or uninstalled, see :meth:`notify_listeners`.
+    :param bool share_definitions: if True, the fixtures loaded from the
+        same files (with the same content) are shared by all the managers of
+        the process, see :mod:`charlatan.definition_store`. Each manager
+        keeps its own cache and installed fixtures.
+    :param str definition_server: path of the Unix socket of a
+        :class:`charlatan.server.DefinitionServer`, which parses the files
+        instead of the manager (when it is running). Fixtures are still
+        built and explained by the manager.
+    :param dict sessions: sessions of the models that are not saved with
+        ``db_session`` (e.g. models of other databases), by model class
+        (or base class) or by module (or package) name, see
+        :meth:`session_for`.
+    :param str teardown: how :meth:`uninstall_all_fixtures` removes the
+        fixtures: ``"uninstall"`` (one by one, the default) or
+        ``"truncate"`` (see :meth:`truncate_fixtures`).
+    :param random_seed: seed of the random values of generated collections
+        (see :mod:`charlatan.generators`), which are the same for each run
+        with the same seed. Values are not reproducible if ``None``.
+
+    .. versionadded:: 0.4.8
+        ``lazy_definitions``, ``lazy_instances``, ``listeners``,
+        ``share_definitions``, ``definition_server``, ``sessions``,
+        ``teardown`` and ``random_seed`` arguments were added.
 
     .. versionadded:: 0.4.0
         ``get_builder`` and ``delete_builder`` arguments were added.
@@ -46,20 +126,49 @@ class FixturesManager(object):
 
     DictFixtureCollection = fixture_collection.DictFixtureCollection
     ListFixtureCollection = fixture_collection.ListFixtureCollection
+    GeneratedFixtureCollection = fixture_collection.GeneratedFixtureCollection
 
     default_get_builder = builder.InstantiateAndSave()
     default_delete_builder = builder.DeleteAndCommit()
 
+    # Listeners of all the managers (e.g. set by the pytest plugin).
+    default_listeners = []
+
     def __init__(self, db_session=None, use_unicode=False,
                  get_builder=None, delete_builder=None,
+                 lazy_definitions=False, lazy_instances=False,
+                 listeners=None, share_definitions=False,
+                 definition_server=None, sessions=None,
+                 teardown="uninstall", random_seed=None,
                  ):
+        if teardown not in TEARDOWNS:
+            raise ValueError("Unknown teardown: '%s' (expected one of %s)"
+                             % (teardown, ", ".join(TEARDOWNS)))
+
         self.hooks = {}
         self.session = db_session
         self.installed_keys = []
+        # True if fixtures are defined with an id, see prefetch_fixtures.
+        self._has_database_ids = False
         self.use_unicode = use_unicode
         self.get_builder = get_builder or self.default_get_builder
         self.delete_builder = delete_builder or self.default_delete_builder
+        self.lazy_definitions = lazy_definitions
+        self.lazy_instances = lazy_instances
+        self.listeners = list(listeners or [])
+        self.share_definitions = share_definitions
+        self.sessions = dict(sessions or {})
+        self.teardown = teardown
+        self.random_seed = random_seed
+        # Model: routed session (or None)
+        self._routes = {}
+        self.definition_client = None
+        if definition_server:
+            self.definition_client = server.DefinitionClient(
+                definition_server)
         self.filenames = []
+        # (filenames, models_package) of each call to load.
+        self._loaded = []
         self.collection = self.DictFixtureCollection(
             ROOT_COLLECTION,
             fixture_manager=self,
@@ -82,9 +191,15 @@ class FixturesManager(object):
 
         """
         self.filenames.append(filenames)
+        self._loaded.append((filenames, models_package))
 
-        self.depgraph = self._load_fixtures(filenames,
-                                            models_package=models_package)
+        if self.share_definitions:
+            (self.collection, self.depgraph,
+             self._has_database_ids) = definition_store.get_definitions(
+                self, self._loaded)
+        else:
+            self.depgraph = self._load_fixtures(filenames,
+                                                models_package=models_package)
         self.clean_cache()
 
     def _get_namespace_from_filename(self, filename):
@@ -98,11 +213,10 @@ class FixturesManager(object):
 
         return segments[0]
 
-    def _load_fixtures(self, filenames, models_package=''):
-        """Pre-load the fixtures.
+    def _glob_filenames(self, filenames):
+        """Return the files matching filenames.
 
-        :param list or str filenames: files that hold the fixture data
-        :param str models_package:
+        :param list or str filenames: files or globs
         """
         if isinstance(filenames, _compat.string_types):
             globbed_filenames = glob(filenames)
@@ -114,43 +228,56 @@ class FixturesManager(object):
         if not globbed_filenames:
             raise IOError('File "%s" not found' % filenames)
 
+        return globbed_filenames
+
+    def _load_file(self, filename):
+        """Return the content of a file, from the definition server if any.
+
+        :param str filename:
+        """
+        if self.definition_client is not None:
+            try:
+                return self.definition_client.load_file(filename,
+                                                        self.use_unicode)
+            except server.ServerUnavailable:
+                # Don't try again for the next files.
+                self.definition_client = None
+            except server.ServerError:
+                # The server could not parse it: parse it here, which
+                # raises the actual error, if any.
+                pass
+
+        return load_file(filename, self.use_unicode)
+
+    def _load_fixtures(self, filenames, models_package=''):
+        """Pre-load the fixtures.
+
+        :param list or str filenames: files that hold the fixture data
+        :param str models_package:
+        """
+        globbed_filenames = self._glob_filenames(filenames)
+
         if len(globbed_filenames) == 1:
-            content = load_file(globbed_filenames[0], self.use_unicode)
+            content = self._load_file(globbed_filenames[0])
         else:
             content = {}
 
             for filename in globbed_filenames:
                 namespace = self._get_namespace_from_filename(filename)
                 content[namespace] = {
-                    "objects": load_file(filename, self.use_unicode)
+                    "objects": self._load_file(filename)
                 }
 
         if content:
+            if not self._has_database_ids:
+                self._has_database_ids = any(
+                    _has_database_ids(v) for v in content.values())
             for k, v in _compat.iteritems(content):
-
-                if "objects" in v:
-                    # It's a collection of fictures.
-                    collection = self._handle_collection(
-                        namespace=k,
-                        definition=v,
-                        objects=v["objects"],
-                        models_package=models_package,
-                    )
-                    self.collection.add(k, collection)
-
-                # Named fixtures
+                if self.lazy_definitions:
+                    fixture = FixtureDefinition(k, v, models_package)
                 else:
-                    if "id" in v:
-                        # Renaming id because it's a Python builtin function
-                        v["id_"] = v["id"]
-                        del v["id"]
-
-                    fixture = Fixture(
-                        key=k,
-                        fixture_manager=self,
-                        models_package=models_package,
-                        **v)
-                    self.collection.add(k, fixture)
+                    fixture = self._make_fixture(k, v, models_package)
+                self.collection.add(k, fixture)
 
         graph = self._check_cycle(self.collection)
         return graph
@@ -158,7 +285,9 @@ class FixturesManager(object):
     def _check_cycle(self, collection):
         """Raise an exception if there's a relationship cycle."""
         d = DepGraph()
-        for _, fixture in collection:
+        # Don't iterate over the collection itself, so that definitions that
+        # have not been accessed yet are not created.
+        for _, fixture in collection.iterator(collection.fixtures):
             for dependency, _ in fixture.extract_relationships():
                 d.add_edge(dependency, fixture.key)
 
@@ -166,6 +295,75 @@ class FixturesManager(object):
         d.topo_sort()
         return d
 
+    def make_fixture(self, definition, namespace=None, name=None):
+        """Create a fixture or a collection from its raw definition.
+
+        :param FixtureDefinition definition:
+        :param str namespace: key of the collection holding the definition
+        :param name: name of the definition in this collection
+
+        .. versionadded:: 0.4.8
+        """
+        if definition.nested:
+            return self._make_collection_entry(
+                namespace, name, definition.definition,
+                models_package=definition.models_package)
+
+        return self._make_fixture(definition.key, definition.definition,
+                                  models_package=definition.models_package)
+
+    def _make_fixture(self, key, definition, models_package=''):
+        """Create a named fixture or a collection of fixtures.
+
+        :param str key:
+        :param dict definition:
+        :param str models_package:
+        """
+        if "objects" in definition:
+            # It's a collection of fictures.
+            return self._handle_collection(
+                namespace=key,
+                definition=definition,
+                objects=definition["objects"],
+                models_package=models_package,
+            )
+
+        if "count" in definition:
+            # A collection of generated fixtures.
+            return self._make_generated_collection(key, definition,
+                                                   models_package)
+
+        # Named fixtures
+        if "id" in definition:
+            # Renaming id because it's a Python builtin function
+            definition["id_"] = definition["id"]
+            del definition["id"]
+
+        return Fixture(
+            key=key,
+            fixture_manager=self,
+            models_package=models_package,
+            **definition)
+
+    def _make_generated_collection(self, key, definition, models_package=''):
+        """Create a collection of generated fixtures.
+
+        :param str key:
+        :param dict definition:
+        :param str models_package:
+        """
+        return self.GeneratedFixtureCollection(
+            key=key,
+            fixture_manager=self,
+            count=definition["count"],
+            model=definition.get("model"),
+            models_package=definition.get("models_package", models_package),
+            fields=definition.get("fields"),
+            post_creation=definition.get("post_creation"),
+            inherit_from=definition.get("inherit_from"),
+            depend_on=definition.get("depend_on"),
+        )
+
     def _handle_collection(self, namespace, definition, objects,
                            models_package=''):
         """Handle a collection of fixtures.
@@ -192,43 +390,102 @@ class FixturesManager(object):
         )
 
         for name, new_fields in collection.iterator(objects):
-            qualified_name = "%s.%s" % (namespace, name)
-
-            if "objects" in new_fields:
-                # A nested collection, either because we're dealing with a file
-                # collection or a sub-collection.
-                fixture = self._handle_collection(
-                    namespace=qualified_name,
-                    definition=new_fields,
-                    objects=new_fields["objects"]
-                )
+            if self.lazy_definitions:
+                # The key is computed when the fixture is created, there's
+                # no need to keep it around.
+                fixture = FixtureDefinition(None, new_fields, models_package,
+                                            nested=True)
             else:
-                model = new_fields.pop("model", None)
-                # In the case of a file collection we'll be dealing with
-                # PyYAML's output from that file, which means that individual
-                # fixtures in this collection have the "fields" field.
-                fields = new_fields.pop("fields", new_fields)
-                inherit_from = namespace if model is None else None
-
-                fixture = Fixture(
-                    key=qualified_name,
-                    fixture_manager=self,
-                    # Automatically inherit from the collection
-                    inherit_from=inherit_from,
-                    fields=fields,
-                    model=model,
-                    models_package=models_package,
-                    # The rest (default fields, etc.) is
-                    # automatically inherited from the collection.
-                )
+                fixture = self._make_collection_entry(
+                    namespace, name, new_fields,
+                    models_package=models_package)
             collection.add(name, fixture)
 
         return collection
 
+    def _make_collection_entry(self, namespace, name, new_fields,
+                               models_package=''):
+        """Create a fixture (or a nested collection) of a collection.
+
+        :param str namespace: key of the collection
+        :param name: name of the fixture in the collection
+        :param dict new_fields: definition of the fixture
+        :param str models_package:
+        """
+        qualified_name = "%s.%s" % (namespace, name)
+
+        if "objects" in new_fields:
+            # A nested collection, either because we're dealing with a file
+            # collection or a sub-collection.
+            return self._handle_collection(
+                namespace=qualified_name,
+                definition=new_fields,
+                objects=new_fields["objects"]
+            )
+
+        if "count" in new_fields and "fields" in new_fields:
+            # A collection of generated fixtures in a file collection.
+            # Entries of other collections may have a count field.
+            return self._make_generated_collection(
+                qualified_name, new_fields, models_package)
+
+        # The definition is not modified, since lazily loaded definitions
+        # may be used more than once.
+        model = new_fields.get("model")
+        # In the case of a file collection we'll be dealing with
+        # PyYAML's output from that file, which means that individual
+        # fixtures in this collection have the "fields" field.
+        if "fields" in new_fields:
+            fields = new_fields["fields"]
+        elif "model" in new_fields:
+            fields = dict((k, v) for k, v in _compat.iteritems(new_fields)
+                          if k != "model")
+        else:
+            fields = new_fields
+        inherit_from = namespace if model is None else None
+
+        # Entries written like named fixtures (with "fields") are loaded
+        # from the database when they have an id, like named fixtures.
+        # Otherwise, an id is a field of the created instance.
+        database_id = None
+        if "fields" in new_fields and "id" in new_fields:
+            database_id = new_fields["id"]
+
+        return Fixture(
+            key=qualified_name,
+            fixture_manager=self,
+            # Automatically inherit from the collection
+            inherit_from=inherit_from,
+            fields=fields,
+            model=model,
+            models_package=models_package,
+            id_=database_id,
+            # The rest (default fields, etc.) is
+            # automatically inherited from the collection.
+        )
+
     def clean_cache(self):
         """Clean the cache."""
         self.cache = {}
         self.installed_keys = []
+        self._prefetched = {}
+
+    def get_cached(self, fixture_key):
+        """Return a fixture instance from the cache, or ``None``.
+
+        :param str fixture_key:
+
+        Instances that are cached as a
+        :class:`charlatan.database.PrimaryKeyStub` are loaded from the
+        database.
+
+        .. versionadded:: 0.4.8
+        """
+        instance = self.cache.get(fixture_key)
+        if type(instance) is PrimaryKeyStub:
+            instance = instance.load(self.session_for(instance.model))
+            self.cache[fixture_key] = instance
+        return instance
 
     def delete_fixture(self, fixture_key, builder=None):
         """Delete a fixture instance.
@@ -246,10 +503,16 @@ class FixturesManager(object):
             ``delete_instance`` method renamed to ``delete_fixture`` for
             consistency reason.
         """
+        return self.notify_listeners(fixture_key, "uninstall",
+                                     self._delete_fixture, fixture_key,
+                                     builder)
+
+    def _delete_fixture(self, fixture_key, builder=None):
+        """Delete a fixture instance, see :meth:`delete_fixture`."""
         builder = builder or self.delete_builder
         self.get_hook("before_delete")(fixture_key)
 
-        instance = self.cache.get(fixture_key)
+        instance = self.get_cached(fixture_key)
         if instance:
             self.cache.pop(fixture_key, None)
             self.installed_keys.remove(fixture_key)
@@ -273,6 +536,17 @@ class FixturesManager(object):
             ``include_relationships`` argument was removed.
 
         """
+        if self.lazy_instances:
+            return FixtureProxy(functools.partial(
+                self.notify_listeners, fixture_key, "install",
+                self._install_fixture, fixture_key, overrides=overrides))
+
+        return self.notify_listeners(fixture_key, "install",
+                                     self._install_fixture, fixture_key,
+                                     overrides=overrides)
+
+    def _install_fixture(self, fixture_key, overrides=None):
+        """Install a fixture, see :meth:`install_fixture`."""
         builder = functools.partial(self.get_builder,
                                     save=True,
                                     session=self.session)
@@ -289,6 +563,79 @@ class FixturesManager(object):
             self.get_hook("after_install")(None)
             return instance
 
+    def install_collection(self, fixture_key, chunk_size=1000, commit=True):
+        """Install a large collection of SQLAlchemy fixtures by chunks.
+
+        :param str fixture_key: key of a collection
+        :param int chunk_size: number of instances per chunk
+        :param bool commit: if False, the session is only flushed after each
+            chunk.
+        :rtype: int, number of installed instances
+
+        Instances are saved without committing. After each chunk, the session
+        is committed (or flushed) and the instances are expunged from it.
+        Only a :class:`charlatan.database.PrimaryKeyStub` is kept in the
+        cache for each instance, which is enough for relationships and
+        uninstalling. Memory usage thus does not depend on the collection's
+        size.
+
+        .. versionadded:: 0.4.8
+        """
+        if not self.session:
+            raise ValueError("Installing by chunks requires a db_session.")
+
+        builder = functools.partial(self.get_builder,
+                                    save=True,
+                                    session=self.session,
+                                    commit=False)
+        self.get_hook("before_install")()
+
+        try:
+            count = 0
+            chunk = []
+            instances = self.iter_fixture(fixture_key, builder=builder,
+                                          cache=False)
+            for name, instance in instances:
+                chunk.append(("%s.%s" % (fixture_key, name), instance))
+                if len(chunk) >= chunk_size:
+                    count += self._save_chunk(chunk, commit)
+                    chunk = []
+
+            if chunk:
+                count += self._save_chunk(chunk, commit)
+
+        except Exception as exc:
+            self.get_hook("after_install")(exc)
+            raise
+
+        else:
+            self.get_hook("after_install")(None)
+            return count
+
+    def _save_chunk(self, chunk, commit):
+        """Save a chunk of instances and only cache their primary key.
+
+        :param list chunk: list of ``(fixture_key, instance)``
+        :param bool commit:
+        """
+        if commit:
+            self.session.commit()
+        else:
+            self.session.flush()
+
+        for fixture_key, instance in chunk:
+            if fixture_key not in self.cache:
+                self.installed_keys.append(fixture_key)
+
+            if is_sqlalchemy_model(instance):
+                self.cache[fixture_key] = PrimaryKeyStub.from_instance(
+                    instance)
+                self.session.expunge(instance)
+            else:
+                self.cache[fixture_key] = instance
+
+        return len(chunk)
+
     def install_fixtures(self, fixture_keys):
         """Install a list of fixtures.
 
@@ -303,11 +650,452 @@ class FixturesManager(object):
             ``include_relationships`` argument was removed.
 
         """
+        fixture_keys = make_list(fixture_keys)
+        if (self.session or self.sessions) and not self.lazy_instances:
+            self.prefetch_fixtures(fixture_keys)
+
         instances = []
-        for f in make_list(fixture_keys):
+        for f in fixture_keys:
             instances.append(self.install_fixture(f))
         return instances
 
+    def install_fixtures_by_session(self, fixture_keys):
+        """Install fixtures, flushing each session in its own thread.
+
+        :param fixture_keys: fixtures to be installed
+        :type fixture_keys: str or list of strs
+        :rtype: list of :data:`fixture_instance`
+
+        The fixtures and their dependencies are installed level by level:
+        the fixtures of a level only depend on the fixtures of the previous
+        levels. The fixtures of each level are built and added to the
+        session of their model (see :meth:`session_for`), then the sessions
+        are flushed concurrently, one thread per session: primary keys are
+        known by the next levels (e.g. ``!rel color.id`` in another
+        database). Fixtures are built by the calling thread, since the
+        manager is not thread-safe.
+
+        Each session is committed once, after all the levels are installed.
+        If a fixture fails, all the sessions are rolled back.
+
+        .. versionadded:: 0.4.8
+        """
+        fixture_keys = make_list(fixture_keys)
+        sessions = []
+        self.get_hook("before_install")()
+
+        try:
+            for level in self._get_levels(fixture_keys):
+                groups = []
+                for fixture_key in level:
+                    session = self.session_for(self._get_model(fixture_key))
+                    _get_group(groups, session).append(fixture_key)
+                    if session is not None and session not in sessions:
+                        sessions.append(session)
+
+                self._install_groups(groups)
+
+            for session in sessions:
+                session.commit()
+
+        except Exception as exc:
+            for session in sessions:
+                session.rollback()
+            self.get_hook("after_install")(exc)
+            raise
+
+        else:
+            self.get_hook("after_install")(None)
+            return [self.get_cached(k) for k in fixture_keys]
+
+    def _install_groups(self, groups):
+        """Install groups of ``(session, fixture_keys)``, then flush their
+        sessions concurrently."""
+        for session, fixture_keys in groups:
+            builder = functools.partial(self.get_builder, save=True,
+                                        session=session, commit=False)
+            for fixture_key in fixture_keys:
+                self.notify_listeners(fixture_key, "install",
+                                      self._get_fixture, fixture_key,
+                                      builder=builder)
+
+        sessions = [session for session, _ in groups if session is not None]
+        if len(sessions) <= 1:
+            for session in sessions:
+                session.flush()
+            return
+
+        errors = []
+
+        def flush(session):
+            try:
+                session.flush()
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=flush, args=(session, ))
+                   for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def bulk_install_fixtures(self, fixture_keys, allocator=None):
+        """Install a list of SQLAlchemy fixtures with a single commit.
+
+        :param fixture_keys: fixtures to be installed
+        :type fixture_keys: str or list of strs
+        :param allocator: defaults to a new
+            :class:`charlatan.database.PrimaryKeyAllocator`
+        :rtype: list of :data:`fixture_instance`
+
+        Instead of saving fixtures one by one, in dependency order, all the
+        fixtures (and their ancestors) are instantiated first. Their primary
+        keys are assigned by the allocator as soon as they are instantiated,
+        so that foreign keys (e.g. ``!rel color.id``) are known without saving
+        anything. All the instances are then added to the session and
+        committed at once, which lets SQLAlchemy insert each table in a
+        single batch. If anything fails, the session is rolled back and the
+        fixtures built by the call are removed from the cache.
+
+        .. versionadded:: 0.4.8
+        """
+        if not self.session:
+            raise ValueError("Installing in bulk requires a db_session.")
+
+        allocator = allocator or database.PrimaryKeyAllocator()
+        fixture_keys = make_list(fixture_keys)
+        pending = []
+
+        def builder(fixtures, klass, params, **kwargs):
+            instance = self.get_builder(fixtures, klass, params)
+            if is_sqlalchemy_model(instance):
+                allocator.allocate(self.session, instance)
+                pending.append(instance)
+            return instance
+
+        self.get_hook("before_install")()
+        cached_keys = set(self.cache)
+
+        try:
+            self.prefetch_fixtures(fixture_keys)
+            instances = [self._get_fixture(f, builder=builder)
+                         for f in fixture_keys]
+
+            for instance in pending:
+                self.get_hook("before_save")(instance)
+            self.session.add_all(pending)
+            allocator.advance_sequences(self.session)
+            self.session.commit()
+            for instance in pending:
+                self.get_hook("after_save")(instance)
+
+        except Exception as exc:
+            # Nothing was saved: forget the instances built by this call.
+            self.session.rollback()
+            added = set(self.cache) - cached_keys
+            for fixture_key in added:
+                del self.cache[fixture_key]
+            self.installed_keys = [k for k in self.installed_keys
+                                   if k not in added]
+            self.get_hook("after_install")(exc)
+            raise
+
+        else:
+            self.get_hook("after_install")(None)
+            return instances
+
+    def prefetch_fixtures(self, fixture_keys):
+        """Load the fixtures defined with an ``id`` from the database.
+
+        :param fixture_keys: fixtures that are going to be installed
+        :type fixture_keys: str or list of strs
+        :rtype: int, number of loaded instances
+
+        The fixtures (and their ancestors) that are defined with an ``id`` are
+        loaded with a single query per model, instead of one query per
+        fixture. They're then returned by the database without any query
+        when installing or getting the fixtures.
+
+        This is done automatically by :meth:`install_fixtures`. Nothing is
+        done if no loaded fixture is defined with an ``id``.
+
+        .. versionadded:: 0.4.8
+        """
+        if not self._has_database_ids:
+            return 0
+
+        ids_by_model = {}
+        for fixture_key in self._with_ancestors(make_list(fixture_keys)):
+            if fixture_key in self.cache:
+                continue
+
+            try:
+                fixture = self._get_definition(fixture_key)
+                self._add_database_ids(fixture, ids_by_model)
+            except (AttributeError, IndexError, KeyError, ValueError):
+                # Errors are raised when actually installing the fixture.
+                continue
+
+        count = 0
+        for model, primary_keys in _compat.iteritems(ids_by_model):
+            instances = database.query_by_primary_keys(
+                self.session_for(model), model, primary_keys)
+            for primary_key, instance in _compat.iteritems(instances):
+                self._prefetched[(model, primary_key)] = instance
+            count += len(instances)
+
+        return count
+
+    def _add_database_ids(self, fixture, ids_by_model):
+        """Group the ids of a fixture (or of a collection's entries) by
+        model."""
+        if isinstance(fixture, fixture_collection.GeneratedFixtureCollection):
+            # Generated entries are never loaded from the database.
+            return
+
+        if isinstance(fixture, fixture_collection.FixtureCollection):
+            for name, entry in fixture.iterator(fixture.fixtures):
+                if "%s.%s" % (fixture.key, name) in self.cache:
+                    continue
+                entry = fixture._resolve(name, entry, store=False)
+                self._add_database_ids(entry, ids_by_model)
+            return
+
+        fixture.inherit_from_parent()
+        if not fixture.database_id:
+            return
+
+        model = fixture.get_class()
+        if model is not None and database.has_single_primary_key(model):
+            ids_by_model.setdefault(model, set()).add(fixture.database_id)
+
+    def explain(self, fixture_keys):
+        """Return what installing fixtures would do, without doing it.
+
+        :param fixture_keys: fixtures to be installed
+        :type fixture_keys: str or list of strs
+        :rtype: :class:`charlatan.plan.InstallPlan`
+
+        The plan lists the fixtures and their ancestors in install order,
+        with their model, whether they are already in the cache or would be
+        loaded from the database (fixtures defined with an ``id``), and the
+        number of rows that would be inserted per table. No builder is
+        called and the database is not queried::
+
+            print(manager.explain(["toaster", "toaster_green"]))
+
+        .. versionadded:: 0.4.8
+        """
+        fixture_keys = make_list(fixture_keys)
+        steps = []
+        for fixture_key in self._with_ancestors(fixture_keys):
+            if fixture_key in self.cache:
+                steps.append(plan.PlanStep(fixture_key, plan.CACHED))
+                continue
+
+            fixture = self._get_definition(fixture_key)
+            step = plan.PlanStep(fixture_key, plan.CREATE)
+            self._explain_fixture(fixture, step)
+            if isinstance(fixture, Fixture) and fixture.database_id:
+                step.action = plan.DATABASE
+            steps.append(step)
+
+        return plan.InstallPlan(fixture_keys, steps)
+
+    def _explain_fixture(self, fixture, step):
+        """Add the rows and lookups of a fixture (or collection) to step."""
+        fixture.inherit_from_parent()
+        if isinstance(fixture, fixture_collection.GeneratedFixtureCollection):
+            # Rows are not generated: the count is enough.
+            step.generators.update(generators.get_generators(fixture.fields))
+            self._add_explained_rows(fixture.get_template(), step,
+                                     fixture.count)
+            return
+
+        if not isinstance(fixture, Fixture):
+            for name, entry in fixture.iterator(fixture.fixtures):
+                self._explain_fixture(
+                    fixture._resolve(name, entry, store=False), step)
+            return
+
+        if fixture.database_id:
+            if step.model is None:
+                step.model = fixture.get_class()
+            step.lookups += 1
+        else:
+            self._add_explained_rows(fixture, step, 1)
+
+    def _add_explained_rows(self, fixture, step, count):
+        """Add the rows of count instances of fixture to step."""
+        model = fixture.get_class()
+        if step.model is None:
+            step.model = model
+        if model is not None:
+            table = plan.get_table_name(model)
+            step.rows[table] = step.rows.get(table, 0) + count
+
+    def get_database_instance(self, model, primary_key):
+        """Return an instance from the database.
+
+        :param model:
+        :param primary_key:
+
+        Used for fixtures defined with an ``id``. Instances loaded by
+        :meth:`prefetch_fixtures` are returned without querying the database.
+
+        .. versionadded:: 0.4.8
+        """
+        try:
+            return self._prefetched.pop((model, primary_key))
+        except (KeyError, TypeError):
+            # TypeError: composite primary keys may be lists.
+            return self.session_for(model).query(model).get(primary_key)
+
+    def session_for(self, model, default=None):
+        """Return the session a model is saved with.
+
+        :param model: a fixture's class
+        :param Session default: session of the models that are not in
+            ``sessions``, defaults to ``db_session``
+
+        The session of the model's class, or else of its closest base class,
+        or else of its longest matching module is returned::
+
+            manager = FixturesManager(db_session=session, sessions={
+                BillingBase: billing_session,
+                "myapp.analytics": analytics_session,
+            })
+
+        Builders save and delete instances with this session.
+
+        .. versionadded:: 0.4.8
+        """
+        if self.sessions and model is not None:
+            if model not in self._routes:
+                self._routes[model] = self._route(model)
+            session = self._routes[model]
+            if session is not None:
+                return session
+        return default if default is not None else self.session
+
+    def _route(self, model):
+        """Return the session of a model from ``sessions``, or None."""
+        for klass in getattr(model, "__mro__", (model, )):
+            if klass in self.sessions:
+                return self.sessions[klass]
+
+        module = getattr(model, "__module__", None) or ""
+        matches = [name for name in self.sessions
+                   if isinstance(name, _compat.string_types)
+                   and (module + ".").startswith(name + ".")]
+        if matches:
+            return self.sessions[max(matches, key=len)]
+
+    def _with_ancestors(self, fixture_keys):
+        """Return the fixture keys and their ancestors, in install order."""
+        returned = []
+        seen = set()
+        for fixture_key in fixture_keys:
+            for key in self.depgraph.ancestors_of(fixture_key) + [fixture_key]:
+                if key not in seen:
+                    seen.add(key)
+                    returned.append(key)
+        return returned
+
+    def _get_dependencies(self, fixture_key):
+        """Return the keys of the fixtures a fixture depends on.
+
+        Unlike the dependency graph, relationships inherited with
+        ``inherit_from`` are included: the relationships of a fixture must
+        be installed before it is instantiated.
+        """
+        # The entries of a collection depend on what the collection depends
+        # on: they are not built to find their relationships.
+        root = fixture_key.split(".")[0]
+        keys = list(self.depgraph.ancestors_of(root))
+        fixture = self._get_definition(root)
+        fixture.inherit_from_parent()
+        # The fields of a collection are inherited by its entries.
+        for dependency, _ in extract_relationships(fixture.fields,
+                                                   fixture.depend_on):
+            if dependency != root and dependency not in keys:
+                keys.append(dependency)
+        return keys
+
+    def _get_levels(self, fixture_keys):
+        """Group fixtures and their dependencies by level.
+
+        A fixture's level is higher than the level of all its dependencies.
+
+        :rtype: list of lists of fixture keys
+        """
+        levels = {}
+
+        def get_level(fixture_key):
+            if fixture_key not in levels:
+                dependencies = self._get_dependencies(fixture_key)
+                levels[fixture_key] = 1 + max(
+                    [get_level(k) for k in dependencies] or [-1])
+            return levels[fixture_key]
+
+        for fixture_key in fixture_keys:
+            get_level(fixture_key)
+
+        grouped = [[] for _ in range(max(levels.values()) + 1)]
+        for fixture_key in self._with_ancestors(list(levels)):
+            grouped[levels[fixture_key]].append(fixture_key)
+        return grouped
+
+    def _get_model(self, fixture_key):
+        """Return the model of a fixture (or of a collection's entries).
+
+        The entries of a collection are installed in the session of its
+        first entry: the other entries are not created, and the rows of a
+        generated collection are not generated.
+        """
+        fixture = self.collection
+        for name in fixture_key.split("."):
+            if isinstance(fixture,
+                          fixture_collection.GeneratedFixtureCollection):
+                # Entries have the model of the collection.
+                break
+            fixture = fixture.get(name)
+        fixture.inherit_from_parent()
+        while isinstance(fixture, fixture_collection.FixtureCollection):
+            if isinstance(fixture,
+                          fixture_collection.GeneratedFixtureCollection):
+                fixture = fixture.get_template()
+                break
+
+            first = next(iter(fixture.iterator(fixture.fixtures)), None)
+            if first is None:
+                return None
+            fixture = fixture.get(first[0])
+
+        return fixture.get_class()
+
+    def _get_listened_model(self, fixture_key):
+        """Return the model of a fixture for the listeners, or ``None``."""
+        try:
+            return self._get_model(fixture_key)
+        except (AttributeError, ImportError, IndexError, KeyError,
+                ValueError):
+            return None
+
+    def _get_definition(self, fixture_key):
+        """Return a fixture or a collection from its key.
+
+        :param str fixture_key: e.g. ``toasters`` or ``toasters.green``
+        """
+        fixture = self.collection
+        for name in fixture_key.split("."):
+            fixture = fixture.get(name)
+        return fixture
+
     def install_all_fixtures(self):
         """Install all fixtures.
 
@@ -322,48 +1110,244 @@ class FixturesManager(object):
         """
         return self.install_fixtures(self.keys())
 
-    def uninstall_fixture(self, fixture_key):
+    def uninstall_fixture(self, fixture_key, cascade=False):
         """Uninstall a fixture.
 
         :param str fixture_key:
+        :param bool cascade: also uninstall the installed fixtures depending
+            on it, see :meth:`uninstall_fixtures`.
         :rtype: ``None``
 
+        .. versionadded:: 0.4.8
+            ``cascade`` argument was added.
+
         .. deprecated:: 0.4.0
             ``do_not_delete`` argument was removed. This function does not
             return anything.
         """
+        if cascade:
+            return self.uninstall_fixtures([fixture_key], cascade=True)
+
         builder = functools.partial(self.delete_builder,
                                     commit=True,
                                     session=self.session)
         return self.delete_fixture(fixture_key, builder)
 
-    def uninstall_fixtures(self, fixture_keys):
+    def uninstall_fixtures(self, fixture_keys, cascade=False):
         """Uninstall a list of installed fixtures.
 
         :param fixture_keys: fixtures to be uninstalled
         :type fixture_keys: str or list of strs
+        :param bool cascade: if True, the installed fixtures depending on
+            them (see :meth:`get_installed_dependents`) are uninstalled too.
+            SQLAlchemy instances are deleted with one ``DELETE`` statement
+            per table (see :func:`charlatan.database.delete_instances`) and
+            a single commit per session.
         :rtype: ``None``
 
+        .. versionadded:: 0.4.8
+            ``cascade`` argument was added.
+
         .. deprecated:: 0.4.0
             ``do_not_delete`` argument was removed. This function does not
             return anything.
         """
+        if cascade:
+            return self._cascade_uninstall(make_list(fixture_keys))
+
         for fixture_key in make_list(fixture_keys):
             self.uninstall_fixture(fixture_key)
 
+    def get_installed_dependents(self, fixture_keys):
+        """Return installed fixtures and the installed fixtures depending on
+        them, in reverse install order.
+
+        :param fixture_keys:
+        :type fixture_keys: str or list of strs
+        :rtype: list of fixture keys
+
+        Dependents are found with the forward edges of the dependency graph,
+        and with the relationships the installed fixtures inherit. The
+        entries of a collection are uninstalled with it.
+
+        .. versionadded:: 0.4.8
+        """
+        fixture_keys = make_list(fixture_keys)
+        # Keys of the fixtures being uninstalled, without the collection
+        # entries (e.g. toasters for toasters.green).
+        depended = set(k.split(".")[0] for k in fixture_keys)
+        dependents = set()
+        for fixture_key in depended:
+            dependents.update(self.depgraph.descendants_of(fixture_key))
+
+        returned = []
+        # Installed fixtures are installed after their dependencies.
+        for key in self.installed_keys:
+            root = key.split(".")[0]
+            if (root in dependents
+                    or any(key == k or key.startswith(k + ".")
+                           for k in fixture_keys)
+                    or depended.intersection(self._get_dependencies(key))):
+                returned.append(key)
+                depended.add(root)
+
+        returned.reverse()
+        return returned
+
+    def _cascade_uninstall(self, fixture_keys):
+        """Uninstall fixtures and their dependents with batched deletes."""
+        fixture_keys = self.get_installed_dependents(fixture_keys)
+        for fixture_key in fixture_keys:
+            self.get_hook("before_delete")(fixture_key)
+
+        self.get_hook("before_uninstall")()
+        # (session, instances) for each session
+        groups = []
+        installed_keys = list(self.installed_keys)
+        cached = dict((k, self.cache[k]) for k in fixture_keys
+                      if k in self.cache)
+        try:
+            for fixture_key in fixture_keys:
+                self.notify_listeners(fixture_key, "uninstall",
+                                      self._forget_fixture, fixture_key,
+                                      groups)
+
+            for session, instances in groups:
+                database.delete_instances(session, instances)
+            for session, _ in groups:
+                session.commit()
+
+        except Exception as exc:
+            # Nothing was deleted: the fixtures are still installed.
+            for session, _ in groups:
+                session.rollback()
+            self.cache.update(cached)
+            self.installed_keys = installed_keys
+            self.get_hook("after_uninstall")(exc)
+            raise
+
+        self.get_hook("after_uninstall")(None)
+        for fixture_key in fixture_keys:
+            self.get_hook("after_delete")(fixture_key)
+
+    def _forget_fixture(self, fixture_key, groups):
+        """Remove a fixture from the cache, and add its instances to the
+        ``(session, instances)`` groups to be deleted."""
+        instance = self.cache.pop(fixture_key, None)
+        self.installed_keys.remove(fixture_key)
+        for instance in iter_instances(instance):
+            if type(instance) is PrimaryKeyStub:
+                session = self.session_for(instance.model)
+            elif is_sqlalchemy_model(instance):
+                session = self.session_for(type(instance))
+            else:
+                continue
+
+            _get_group(groups, session).append(instance)
+
     def uninstall_all_fixtures(self):
         """Uninstall all installed fixtures.
 
         :rtype: ``None``
 
+        With ``teardown="truncate"``, :meth:`truncate_fixtures` is used.
+
+        .. versionchanged:: 0.4.8
+            ``teardown`` argument of the manager is used.
+
         .. deprecated:: 0.4.0
             ``do_not_delete`` argument was removed. This function does not
             return anything.
         """
+        if self.teardown == "truncate":
+            return self.truncate_fixtures()
+
         installed_fixtures = list(self.installed_keys)
         installed_fixtures.reverse()
         self.uninstall_fixtures(installed_fixtures)
 
+    def truncate_fixtures(self):
+        """Empty the tables of the installed fixtures, then clean the cache.
+
+        :rtype: ``None``
+
+        Instead of deleting the fixtures one by one, all the rows of the
+        tables the installed SQLAlchemy fixtures were saved in are deleted,
+        with one statement per table in foreign key order (see
+        :func:`charlatan.database.clear_tables`), and a single commit per
+        session.
+
+        Rows that were not installed by the manager are deleted too: only
+        use it with test databases. The tables of the fixtures defined with
+        an ``id`` (loaded from the database) are not emptied, unless other
+        fixtures were installed in them.
+
+        .. versionadded:: 0.4.8
+        """
+        # (session, set of tables) for each session
+        groups = []
+        self.get_hook("before_uninstall")()
+        try:
+            created = []
+            for fixture_key, instance in list(self.cache.items()):
+                self._add_created_instances(created, fixture_key, instance)
+
+            for instance in created:
+                if type(instance) is PrimaryKeyStub:
+                    model, instance = instance.model, None
+                elif is_sqlalchemy_model(instance):
+                    model = type(instance)
+                else:
+                    continue
+
+                session = self.session_for(model)
+                if session is None:
+                    continue
+                if instance is not None and instance in session:
+                    session.expunge(instance)
+                _get_group(groups, session).extend(
+                    database.get_tables(model))
+
+            for session, tables in groups:
+                database.clear_tables(session, set(tables))
+            for session, _ in groups:
+                session.commit()
+
+        except Exception as exc:
+            for session, _ in groups:
+                session.rollback()
+            self.get_hook("after_uninstall")(exc)
+            raise
+
+        self.clean_cache()
+        self.get_hook("after_uninstall")(None)
+
+    def _add_created_instances(self, returned, fixture_key, instance):
+        """Add the instances of a cached fixture (or of a collection's
+        entries) that were not loaded from the database to returned."""
+        try:
+            fixture = self._get_definition(fixture_key)
+        except (AttributeError, IndexError, KeyError, ValueError):
+            fixture = None
+
+        if isinstance(fixture, Fixture):
+            fixture.inherit_from_parent()
+            if fixture.database_id:
+                return
+
+        elif (isinstance(fixture, fixture_collection.FixtureCollection)
+                and not isinstance(
+                    fixture, fixture_collection.GeneratedFixtureCollection)
+                and isinstance(instance, (dict, list))):
+            items = (_compat.iteritems(instance)
+                     if isinstance(instance, dict) else enumerate(instance))
+            for name, entry in items:
+                self._add_created_instances(
+                    returned, "%s.%s" % (fixture_key, name), entry)
+            return
+
+        returned.extend(iter_instances(instance))
+
     def keys(self):
         """Return all fixture keys."""
         return self.collection.fixtures.keys()
@@ -386,22 +1370,39 @@ class FixturesManager(object):
         .. deprecated:: 0.3.7
             ``include_relationships`` argument was removed.
         """
+        if self.lazy_instances:
+            return FixtureProxy(functools.partial(
+                self._get_fixture, fixture_key, overrides=overrides,
+                builder=builder))
+
+        return self._get_fixture(fixture_key, overrides=overrides,
+                                 builder=builder)
+
+    def _get_fixture(self, fixture_key, overrides=None, builder=None):
+        """Return a fixture instance, see :meth:`get_fixture`."""
+        return self.notify_listeners(fixture_key, "get",
+                                     self._build_fixture, fixture_key,
+                                     overrides=overrides, builder=builder)
+
+    def _build_fixture(self, fixture_key, overrides=None, builder=None):
+        """Return a fixture instance, building its ancestors first."""
         builder = builder or self.get_builder
         # initialize all parents in topological order
         parents = []
         for fixture in self.depgraph.ancestors_of(fixture_key):
-            parents.append(self.get_fixture(fixture, builder=builder))
+            parents.append(self._get_fixture(fixture, builder=builder))
 
         # Fixture are cached so that setting up relationships is not too
         # expensive. We don't get the cached version if overrides are
         # overriden.
         returned = None
         if not overrides:
-            returned = self.cache.get(fixture_key)
+            returned = self.get_cached(fixture_key)
 
         if not returned:
             returned = self.collection.get_instance(
-                fixture_key, overrides=overrides, builder=builder)
+                fixture_key, overrides=overrides, builder=builder,
+                fixture_manager=self)
 
             self.cache[fixture_key] = returned
             self.installed_keys.append(fixture_key)
@@ -441,6 +1442,122 @@ class FixturesManager(object):
         builder = builder or self.get_builder
         return self.get_fixtures(self.keys(), builder=builder)
 
+    def iter_fixture(self, fixture_key, overrides=None, builder=None,
+                     cache=True):
+        """Iterate over the instances of a collection, one at a time.
+
+        :param str fixture_key: key of a collection, e.g. ``toasters``
+        :param dict overrides: override fields
+        :param func builder: build builder.
+        :param bool cache: if False, the instances are not stored in the
+            cache (and thus can't be uninstalled by the manager).
+
+        Yields ``(name, instance)``. Unlike :meth:`get_fixture`, the
+        collection instances are not all kept in memory, which allows
+        streaming very large collections, e.g. to a database with
+        ``builder=functools.partial(manager.get_builder, save=True,
+        session=session)``.
+
+        Instances are cached under their full key (e.g. ``toasters.0``).
+
+        .. versionadded:: 0.4.8
+        """
+        builder = builder or self.get_builder
+        for parent in self.depgraph.ancestors_of(fixture_key):
+            self._get_fixture(parent, builder=builder)
+
+        collection = self._get_definition(fixture_key)
+        if not isinstance(collection, fixture_collection.FixtureCollection):
+            raise ValueError("'%s' is not a collection." % fixture_key)
+
+        # Cached entries are returned as is.
+        instances = collection.iter_instances(overrides=overrides,
+                                              builder=builder,
+                                              fixture_manager=self)
+        for name, instance in instances:
+            key = "%s.%s" % (fixture_key, name)
+            if cache and (overrides or key not in self.cache):
+                self.cache[key] = instance
+                self.installed_keys.append(key)
+
+            yield name, instance
+
+    def snapshot(self):
+        """Return a snapshot of the rows of the installed fixtures.
+
+        :rtype: :class:`charlatan.snapshot.FixturesSnapshot`
+
+        :meth:`charlatan.snapshot.FixturesSnapshot.restore` only restores
+        the rows modified since the snapshot, instead of uninstalling and
+        installing all the fixtures again::
+
+            snapshot = manager.snapshot()
+            run_test()
+            snapshot.restore()
+
+        .. versionadded:: 0.4.8
+        """
+        from charlatan.snapshot import FixturesSnapshot
+
+        return FixturesSnapshot(self)
+
+    def query_budget(self, max_statements=None, max_commits=None):
+        """Return a context manager (or decorator) limiting SQL statements.
+
+        :param int max_statements: maximum number of SQL statements
+        :param int max_commits: maximum number of commits
+        :rtype: :class:`charlatan.query_budget.QueryBudget`
+
+        :class:`charlatan.query_budget.QueryBudgetExceeded` is raised, with
+        the count of statements and commits per fixture, if the statements
+        issued on the session in the context exceeded the budget::
+
+            with manager.query_budget(max_statements=10):
+                manager.install_fixtures(["toaster", "toaster_green"])
+
+        .. versionadded:: 0.4.8
+        """
+        return QueryBudget(self, max_statements=max_statements,
+                           max_commits=max_commits)
+
+    def notify_listeners(self, fixture_key, action, func, *args, **kwargs):
+        """Call func, notifying the listeners before and after.
+
+        :param str fixture_key:
+        :param str action: ``install``, ``get`` or ``uninstall``
+        :param func func: function doing the action
+
+        Listeners (from the ``listeners`` argument, and the
+        ``default_listeners`` class attribute) are objects with two methods:
+
+        * ``fixture_started(fixture_key, action)``
+        * ``fixture_finished(fixture_key, action, instance, model)``, where
+          instance is ``None`` if the action failed or did not return an
+          instance (e.g. ``uninstall``), and model is the model of the
+          fixture's definition (of the entries for a collection), or
+          ``None``.
+
+        Actions are nested: installing a fixture gets it, which gets its
+        ancestors first.
+
+        .. versionadded:: 0.4.8
+        """
+        listeners = self.default_listeners + self.listeners
+        if not listeners:
+            return func(*args, **kwargs)
+
+        for listener in listeners:
+            listener.fixture_started(fixture_key, action)
+        instance = None
+        try:
+            instance = func(*args, **kwargs)
+            return instance
+        finally:
+            model = self._get_listened_model(fixture_key)
+            for listener in reversed(listeners):
+                listener.fixture_finished(fixture_key, action, instance,
+                                          model)
+
     def get_hook(self, hook_name):
         """Return a hook.
 
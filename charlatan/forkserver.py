@@ -0,0 +1,136 @@
+"""Fork workers sharing fixtures loaded once, copy-on-write (POSIX only).
+
+Each test process usually imports charlatan, parses the fixtures files and
+creates the fixtures. :func:`fork_workers` does it once in the parent
+process, then forks the workers, which inherit the loaded fixtures: memory
+pages are shared with the parent until they are modified.
+
+``gc.freeze()`` (Python 3.7+) moves the loaded objects to a permanent
+generation, so that the garbage collector of the workers does not touch
+(and thus copy) the pages holding them.
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import print_function
+import gc
+import os
+import sys
+import traceback
+
+from charlatan.fixture_collection import FixtureCollection
+from charlatan.fixture_collection import GeneratedFixtureCollection
+
+
+def warm_up(fixtures_manager):
+    """Create and resolve all the fixtures of a manager.
+
+    Fixtures loaded with ``lazy_definitions`` are created, inheritance is
+    resolved and the ancestors of each fixture are computed, so that workers
+    don't have to (and don't write to the shared pages).
+
+    :rtype: int, number of fixtures
+    """
+    count = 0
+    collections = [fixtures_manager.collection]
+    while collections:
+        collection = collections.pop()
+        for _, fixture in collection:
+            fixture.inherit_from_parent()
+            count += 1
+            # Generated entries are never kept, there's nothing to create.
+            if (isinstance(fixture, FixtureCollection)
+                    and not isinstance(fixture, GeneratedFixtureCollection)):
+                collections.append(fixture)
+
+    for fixture_key in fixtures_manager.keys():
+        fixtures_manager.depgraph.ancestors_of(fixture_key)
+
+    return count
+
+
+def freeze():
+    """Collect garbage, then exclude all objects from future collections.
+
+    Does nothing with Python < 3.7.
+    """
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+
+def unfreeze():
+    """Undo :func:`freeze`."""
+    if hasattr(gc, "unfreeze"):
+        gc.unfreeze()
+
+
+def fork_worker(fixtures_manager, target, index):
+    """Fork a worker calling ``target(fixtures_manager, index)``.
+
+    :rtype: int, the worker's pid
+
+    The worker exits with ``target``'s return value (0 if ``None``), or 1
+    if it raises an exception. ``sys.exit()`` is handled like in the main
+    process.
+    """
+    pid = os.fork()
+    if pid:
+        return pid
+
+    code = 1
+    try:
+        fixtures_manager.clean_cache()
+        code = target(fixtures_manager, index) or 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        else:
+            code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # Don't run the parent's exit handlers (e.g. pytest's) in the worker.
+        os._exit(code)
+
+
+def fork_workers(fixtures_manager, target, count):
+    """Fork workers sharing the manager's fixtures, and wait for them.
+
+    :param FixturesManager fixtures_manager: manager with the fixtures
+        loaded
+    :param func target: function called in each worker with the manager
+        and the worker's index
+    :param int count: number of workers
+    :rtype: list of the workers' exit codes
+
+    The manager's fixtures are resolved (see :func:`warm_up`) and frozen
+    (see :func:`freeze`) before forking. Workers start with an empty cache,
+    and must create their own database connections (connections must not be
+    shared between processes)::
+
+        manager = FixturesManager()
+        manager.load("tests/fixtures/*.yaml")
+
+        def run(manager, index):
+            manager.session = make_session(index)
+            return run_tests(manager, shard=index)
+
+        exit_codes = fork_workers(manager, run, 8)
+    """
+    warm_up(fixtures_manager)
+    freeze()
+    try:
+        pids = [fork_worker(fixtures_manager, target, index)
+                for index in range(count)]
+        codes = []
+        for pid in pids:
+            _, status = os.waitpid(pid, 0)
+            if os.WIFEXITED(status):
+                codes.append(os.WEXITSTATUS(status))
+            else:
+                codes.append(-os.WTERMSIG(status))
+        return codes
+    finally:
+        unfreeze()
@@ -0,0 +1,358 @@
+"""Values generated for the rows of a collection.
+
+A collection with a ``count`` has that many entries, whose fields are
+generated when they are installed, instead of being listed in the file::
+
+    users:
+      model: yourlib.models:User
+      count: 10000
+      fields:
+        id: !seq 1
+        role: !choice [admin, member, guest]
+        email: !format "user{id}@example.com"
+
+The values are generated by batches of rows, one field at a time.
+
+The ``!rand_*`` tags generate random values, with NumPy when it is
+installed (one call per batch), or with the :mod:`random` module otherwise::
+
+    logins:
+      model: yourlib.models:Login
+      count: 1000000
+      fields:
+        user_id: !rand_int [1, 10000]
+        score: !rand_float [0, 100]
+        country: !rand_choice [fr, us, jp]
+        created_at: !rand_datetime [-30d, 0d]
+
+Random values are reproducible when the manager has a ``random_seed``: the
+values of each field are generated by blocks of :data:`RANDOM_BLOCK_SIZE`
+rows, each with its own seed, so that they do not depend on the batches (or
+on the entries) being generated. The last block of each field is kept, so
+that getting the entries of a block one at a time generates it once.
+
+NumPy and :mod:`random` generate different values from the same seed: a
+seed gives the same values in every environment using the same backend.
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import absolute_import
+import datetime
+import hashlib
+import random
+
+import pytz
+
+from charlatan import _compat
+from charlatan.utils import get_timedelta
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RANDOM_BLOCK_SIZE = 1000
+
+
+class Generator(object):
+
+    """Base class of the values of a field, generated by row index.
+
+    Generators are evaluated in increasing ``order``, then by field name.
+    """
+
+    __slots__ = ()
+    order = 0
+
+    def values(self, start, stop, columns, seed=None):
+        """Return the values of rows ``start`` to ``stop`` (excluded).
+
+        :param int start:
+        :param int stop:
+        :param dict columns: values of the fields generated before this
+            one, by field name (lists of ``stop - start`` values)
+        :param str seed: seed of the field's random values, if any
+        :rtype: list
+        """
+        raise NotImplementedError
+
+
+class Sequence(Generator):
+
+    """``start``, ``start + step``, ``start + 2 * step``..."""
+
+    __slots__ = ("start", "step")
+
+    def __init__(self, start=0, step=1):
+        self.start = start
+        self.step = step
+
+    def __repr__(self):
+        return "<Sequence %r, %r>" % (self.start, self.step)
+
+    def values(self, start, stop, columns, seed=None):
+        return list(range(self.start + start * self.step,
+                          self.start + stop * self.step,
+                          self.step))
+
+
+class Choice(Generator):
+
+    """Cycle through a list of values."""
+
+    __slots__ = ("choices", )
+
+    def __init__(self, choices):
+        if not choices:
+            raise ValueError("!choice requires at least one value.")
+        self.choices = list(choices)
+
+    def __repr__(self):
+        return "<Choice %r>" % (self.choices, )
+
+    def values(self, start, stop, columns, seed=None):
+        choices = self.choices
+        length = len(choices)
+        return [choices[n % length] for n in range(start, stop)]
+
+
+class Format(Generator):
+
+    """Format a string with the row index (``n``) and the generated fields.
+
+    e.g. ``!format "user{n}@example.com"``. Evaluated after the other
+    generators.
+    """
+
+    __slots__ = ("template", )
+    order = 1
+
+    def __init__(self, template):
+        self.template = template
+
+    def __repr__(self):
+        return "<Format %r>" % self.template
+
+    def values(self, start, stop, columns, seed=None):
+        template = self.template
+        names = list(columns)
+        returned = []
+        for i, n in enumerate(range(start, stop)):
+            row = dict((name, columns[name][i]) for name in names)
+            returned.append(template.format(n=n, **row))
+        return returned
+
+
+class RandomGenerator(Generator):
+
+    """Base class of the generators of random values.
+
+    Subclasses implement :meth:`generate_numpy` and :meth:`generate_python`,
+    and :meth:`convert` if the generated numbers are not the values.
+    """
+
+    __slots__ = ("_block", )
+
+    def values(self, start, stop, columns, seed=None):
+        if seed is None:
+            return self.convert(self.generate(None, stop - start))
+
+        returned = []
+        first_block = start // RANDOM_BLOCK_SIZE
+        last_block = (stop - 1) // RANDOM_BLOCK_SIZE
+        for block in range(first_block, last_block + 1):
+            offset = block * RANDOM_BLOCK_SIZE
+            values = self.get_block("%s:%s" % (seed, block))
+            returned.extend(values[max(start - offset, 0):stop - offset])
+        return self.convert(returned)
+
+    def get_block(self, seed):
+        """Return the generated numbers of a block of rows.
+
+        The last block is kept, with the backend it was generated with.
+        """
+        key = (seed, numpy is not None)
+        block = getattr(self, "_block", None)
+        if block is None or block[0] != key:
+            block = (key, self.generate(seed, RANDOM_BLOCK_SIZE))
+            self._block = block
+        return block[1]
+
+    def generate(self, seed, size):
+        """Return ``size`` random numbers, generated from ``seed``."""
+        if seed is not None:
+            seed = int(hashlib.sha1(seed.encode("utf-8")).hexdigest()[:16],
+                       16)
+
+        if numpy is not None:
+            return self.generate_numpy(numpy.random.default_rng(seed), size)
+        return self.generate_python(random.Random(seed), size)
+
+    def generate_numpy(self, rng, size):
+        """Return a list of random numbers with a NumPy ``Generator``."""
+        raise NotImplementedError
+
+    def generate_python(self, rng, size):
+        """Return a list of random numbers with a ``random.Random``."""
+        raise NotImplementedError
+
+    def convert(self, values):
+        """Return the values of the fields from generated numbers."""
+        return values
+
+
+class RandomInt(RandomGenerator):
+
+    """Random integers between ``low`` and ``high`` (included)."""
+
+    __slots__ = ("low", "high")
+
+    def __init__(self, low, high):
+        self.low = int(low)
+        self.high = int(high)
+
+    def __repr__(self):
+        return "<RandomInt %r, %r>" % (self.low, self.high)
+
+    def generate_numpy(self, rng, size):
+        return rng.integers(self.low, self.high, size=size,
+                            endpoint=True).tolist()
+
+    def generate_python(self, rng, size):
+        return [rng.randint(self.low, self.high) for _ in range(size)]
+
+
+class RandomFloat(RandomGenerator):
+
+    """Random floats between ``low`` and ``high``."""
+
+    __slots__ = ("low", "high")
+
+    def __init__(self, low=0.0, high=1.0):
+        self.low = float(low)
+        self.high = float(high)
+
+    def __repr__(self):
+        return "<RandomFloat %r, %r>" % (self.low, self.high)
+
+    def generate_numpy(self, rng, size):
+        return rng.uniform(self.low, self.high, size=size).tolist()
+
+    def generate_python(self, rng, size):
+        return [rng.uniform(self.low, self.high) for _ in range(size)]
+
+
+class RandomChoice(RandomGenerator):
+
+    """Values picked at random in a list."""
+
+    __slots__ = ("choices", )
+
+    def __init__(self, choices):
+        if not choices:
+            raise ValueError("!rand_choice requires at least one value.")
+        self.choices = list(choices)
+
+    def __repr__(self):
+        return "<RandomChoice %r>" % (self.choices, )
+
+    def generate_numpy(self, rng, size):
+        return rng.integers(0, len(self.choices), size=size).tolist()
+
+    def generate_python(self, rng, size):
+        length = len(self.choices)
+        return [int(rng.random() * length) for _ in range(size)]
+
+    def convert(self, values):
+        choices = self.choices
+        return [choices[i] for i in values]
+
+
+class RandomDatetime(RandomGenerator):
+
+    """Random datetimes between two deltas from now (e.g. ``-30d`` and
+    ``0d``), with a microsecond precision.
+
+    Like ``!now``, the datetimes are timezone aware (UTC) unless
+    ``charlatan.file_format.TIMEZONE_AWARE`` is False. Now is the time at
+    which the values are generated: the generated numbers are offsets
+    from the lower bound, in microseconds.
+    """
+
+    __slots__ = ("low", "high")
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def __repr__(self):
+        return "<RandomDatetime %r, %r>" % (self.low, self.high)
+
+    def _get_span(self):
+        """Return the range in microseconds."""
+        span = self.high - self.low
+        microseconds = (span.days * 86400 + span.seconds) * 10 ** 6
+        return microseconds + span.microseconds
+
+    def generate_numpy(self, rng, size):
+        return rng.integers(0, self._get_span(), size=size,
+                            endpoint=True).tolist()
+
+    def generate_python(self, rng, size):
+        span = self._get_span()
+        return [rng.randint(0, span) for _ in range(size)]
+
+    def convert(self, values):
+        from charlatan import file_format
+
+        low = datetime.datetime.utcnow() + self.low
+        if file_format.TIMEZONE_AWARE:
+            low = low.replace(tzinfo=pytz.utc)
+        delta = datetime.timedelta
+        return [low + delta(microseconds=v) for v in values]
+
+
+def get_random_datetime(low, high=None):
+    """Return a :class:`RandomDatetime` from deltas, e.g. ``"-30d"``.
+
+    With a single delta, the datetimes are between now and now + delta.
+    Deltas without a sign are positive.
+    """
+    def parse(delta):
+        delta = str(delta or "")
+        if delta and delta[0] not in "+-":
+            delta = "+" + delta
+        return get_timedelta(delta)
+
+    low, high = parse(low), parse(high)
+    return RandomDatetime(min(low, high), max(low, high))
+
+
+def get_generators(fields):
+    """Return the ``(name, generator)`` of fields, in evaluation order."""
+    generators = [(k, v) for k, v in _compat.iteritems(fields)
+                  if isinstance(v, Generator)]
+    return sorted(generators, key=lambda item: (item[1].order, item[0]))
+
+
+def generate_rows(fields, start, stop, seed=None):
+    """Return the generated fields of rows ``start`` to ``stop`` (excluded).
+
+    :param dict fields: fields of the collection, only the generators are
+        evaluated
+    :param str seed: seed of the random values (e.g. the manager's
+        ``random_seed`` and the collection's key), random if ``None``
+    :rtype: list of dicts
+    """
+    columns = {}
+    for name, generator in get_generators(fields):
+        field_seed = None if seed is None else "%s:%s" % (seed, name)
+        columns[name] = generator.values(start, stop, columns,
+                                         seed=field_seed)
+
+    if not columns:
+        return [{} for _ in range(start, stop)]
+
+    names = list(columns)
+    return [dict(zip(names, row))
+            for row in zip(*[columns[name] for name in names])]
@@ -0,0 +1,129 @@
+"""Describe what installing fixtures would do, without doing it."""
+import json
+
+from charlatan import _compat
+
+CACHED = "cached"
+CREATE = "create"
+DATABASE = "database"
+
+
+def get_table_name(model):
+    """Return the table name of a model (or its name if it has no table)."""
+    table = getattr(model, "__table__", None)
+    if table is not None:
+        return table.name
+    return model.__name__
+
+
+class PlanStep(object):
+
+    """A fixture of an :class:`InstallPlan`.
+
+    :param str key: the fixture key
+    :param str action: ``cached`` (already installed), ``database``
+        (fixture defined with an ``id``, loaded from the database) or
+        ``create``
+    :param model: the fixture's model, or ``None``
+    :param dict rows: number of rows that would be inserted, per table
+    :param int lookups: number of instances loaded from the database
+    :param dict generators: generators of the fields of a generated
+        collection (see :mod:`charlatan.generators`), by field name
+    """
+
+    __slots__ = ("key", "action", "model", "rows", "lookups", "generators")
+
+    def __init__(self, key, action, model=None, rows=None, lookups=0,
+                 generators=None):
+        self.key = key
+        self.action = action
+        self.model = model
+        self.rows = rows or {}
+        self.lookups = lookups
+        self.generators = generators or {}
+
+    def __repr__(self):
+        return "<PlanStep %s %s>" % (self.action, self.key)
+
+    @property
+    def model_name(self):
+        if self.model is None:
+            return None
+        return "%s:%s" % (self.model.__module__, self.model.__name__)
+
+    def to_dict(self):
+        return {"key": self.key,
+                "action": self.action,
+                "model": self.model_name,
+                "rows": dict(self.rows),
+                "lookups": self.lookups,
+                "generators": dict((k, repr(v)) for k, v
+                                   in _compat.iteritems(self.generators))}
+
+
+class InstallPlan(object):
+
+    """The fixtures that installing some fixtures would install.
+
+    Returned by :meth:`charlatan.FixturesManager.explain`. Steps are in
+    install order: ancestors come before the fixtures depending on them.
+
+    .. versionadded:: 0.4.8
+    """
+
+    def __init__(self, fixture_keys, steps):
+        self.fixture_keys = list(fixture_keys)
+        self.steps = steps
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __str__(self):
+        return self.format_table()
+
+    @property
+    def rows_per_table(self):
+        """Return the number of rows that would be inserted, per table."""
+        returned = {}
+        for step in self.steps:
+            for table, count in _compat.iteritems(step.rows):
+                returned[table] = returned.get(table, 0) + count
+        return returned
+
+    @property
+    def database_lookups(self):
+        """Return the number of instances loaded from the database."""
+        return sum(step.lookups for step in self.steps)
+
+    def to_dict(self):
+        return {"fixture_keys": self.fixture_keys,
+                "steps": [step.to_dict() for step in self.steps],
+                "rows_per_table": self.rows_per_table,
+                "database_lookups": self.database_lookups}
+
+    def to_json(self, **kwargs):
+        """Return the plan as a JSON string.
+
+        Keyword arguments are passed to :func:`json.dumps`.
+        """
+        kwargs.setdefault("sort_keys", True)
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def format_table(self):
+        """Return the plan as a table, followed by the rows per table."""
+        lines = ["%-8s %6s %7s  %-30s %s"
+                 % ("action", "rows", "lookups", "key", "model")]
+        for step in self.steps:
+            lines.append("%-8s %6d %7d  %-30s %s" % (
+                step.action, sum(step.rows.values()), step.lookups,
+                step.key, step.model_name or "-"))
+
+        lines.append("")
+        lines.append("%d fixtures, %d database lookups"
+                     % (len(self.steps), self.database_lookups))
+        for table, count in sorted(_compat.iteritems(self.rows_per_table)):
+            lines.append("%-30s %6d rows" % (table, count))
+        return "\n".join(lines)
@@ -0,0 +1,166 @@
+"""Report the time spent creating and deleting fixtures."""
+from __future__ import print_function
+import json
+import time
+
+from charlatan import _compat
+
+# time.perf_counter is not available with Python 2.
+_clock = getattr(time, "perf_counter", time.time)
+
+
+class _Stats(object):
+
+    __slots__ = ("calls", "self_time", "total_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.self_time = 0.0
+        self.total_time = 0.0
+
+    def to_dict(self):
+        return {"calls": self.calls,
+                "self": self.self_time,
+                "total": self.total_time}
+
+
+def _find_frame(stack, fixture_key):
+    """Return the index of the last frame of a fixture in stack."""
+    for index in range(len(stack) - 1, -1, -1):
+        if stack[index][0] == fixture_key:
+            return index
+    raise ValueError("No action started for '%s'." % fixture_key)
+
+
+class FixtureProfiler(object):
+
+    """Aggregate the time spent in fixtures, by fixture key and by model.
+
+    :param func clock: function returning the current time, in seconds
+
+    Register the profiler as a listener of a
+    :class:`charlatan.FixturesManager` to measure :meth:`install_fixture`,
+    :meth:`get_fixture` and :meth:`uninstall_fixture` (and the methods using
+    them)::
+
+        profiler = FixtureProfiler()
+        manager.listeners.append(profiler)
+
+    For each fixture, the inclusive time (``total``) includes the time spent
+    creating its ancestors, while the ``self`` time does not. Time is
+    counted for the model of the fixture's definition, or for the class of
+    the instance for fixtures without a model (e.g. ``dict``).
+
+    .. versionadded:: 0.4.8
+    """
+
+    def __init__(self, clock=_clock):
+        self.clock = clock
+        self.fixtures = {}
+        self.models = {}
+        # Frames of the fixtures being measured:
+        # [fixture key, start time, time spent in children].
+        self._stack = []
+
+    def fixture_started(self, fixture_key, action):
+        """Start measuring a fixture (called by the manager)."""
+        self._stack.append([fixture_key, self.clock(), 0.0])
+
+    def fixture_finished(self, fixture_key, action, instance, model=None):
+        """Stop measuring a fixture (called by the manager)."""
+        # Actions of fixtures installed concurrently (e.g. by
+        # charlatan.aio.AsyncFixturesManager) may finish in any order.
+        index = _find_frame(self._stack, fixture_key)
+        key, start, children_time = self._stack.pop(index)
+        elapsed = self.clock() - start
+        if index:
+            self._stack[index - 1][2] += elapsed
+
+        # When a fixture is installed, it is measured twice (install and
+        # get): the inclusive time is only counted once.
+        nested = any(frame[0] == key for frame in self._stack)
+        self._add(self.fixtures, key, elapsed - children_time,
+                  0.0 if nested else elapsed, nested)
+
+        if model is not None:
+            name = model.__name__
+        elif instance is not None:
+            name = instance.__class__.__name__
+        else:
+            return
+        self._add(self.models, name, elapsed - children_time,
+                  0.0 if nested else elapsed, nested)
+
+    def _add(self, stats, key, self_time, total_time, nested):
+        if key not in stats:
+            stats[key] = _Stats()
+        entry = stats[key]
+        if not nested:
+            entry.calls += 1
+        entry.self_time += self_time
+        entry.total_time += total_time
+
+    def update(self, data):
+        """Add measures returned by :meth:`to_dict` (e.g. by another process).
+
+        .. versionadded:: 0.4.8
+        """
+        for stats, name in ((self.fixtures, "fixtures"),
+                            (self.models, "models")):
+            for key, measures in _compat.iteritems(data.get(name, {})):
+                if key not in stats:
+                    stats[key] = _Stats()
+                entry = stats[key]
+                entry.calls += measures["calls"]
+                entry.self_time += measures["self"]
+                entry.total_time += measures["total"]
+
+    def reset(self):
+        """Forget all the measures."""
+        self.fixtures = {}
+        self.models = {}
+
+    def top(self, n=10, by="total", models=False):
+        """Return the slowest fixtures (or models).
+
+        :param int n: number of entries
+        :param str by: ``total`` or ``self``
+        :param bool models: if True, return models instead of fixture keys
+        :rtype: list of ``(key, {"calls": int, "self": float,
+            "total": float})``, slowest first
+        """
+        stats = self.models if models else self.fixtures
+        returned = [(key, entry.to_dict())
+                    for key, entry in _compat.iteritems(stats)]
+        returned.sort(key=lambda e: (-e[1][by], e[0]))
+        return returned[:n]
+
+    def format_report(self, n=10, by="total"):
+        """Return a report of the slowest fixtures and models, as a str."""
+        lines = []
+        for title, models in (("fixtures", False), ("models", True)):
+            entries = self.top(n, by=by, models=models)
+            if not entries:
+                continue
+            lines.append("slowest %d charlatan %s (by %s time):"
+                         % (len(entries), title, by))
+            lines.append("%10s %10s %7s  %s"
+                         % ("total", "self", "calls", "key"))
+            for key, entry in entries:
+                lines.append("%9.3fs %9.3fs %7d  %s" % (
+                    entry["total"], entry["self"], entry["calls"], key))
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """Return all the measures, e.g. to be serialized."""
+        return {
+            "fixtures": dict((k, v.to_dict())
+                             for k, v in _compat.iteritems(self.fixtures)),
+            "models": dict((k, v.to_dict())
+                           for k, v in _compat.iteritems(self.models)),
+        }
+
+    def write_json(self, filename):
+        """Write all the measures to a JSON file."""
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
@@ -0,0 +1,102 @@
+_MISSING = object()
+
+
+class FixtureProxy(object):
+
+    """Stand-in for a fixture instance that is built on first access.
+
+    :param func factory: function returning the instance
+
+    The instance is built the first time an attribute or an item of the proxy
+    is accessed, or when the proxy is used as a relationship or an override
+    of another fixture.
+
+    ``isinstance`` checks are forwarded to the instance (and thus build it),
+    ``type()`` returns :class:`FixtureProxy`.
+
+    .. versionadded:: 0.4.8
+    """
+
+    __slots__ = ("_factory", "_instance")
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", _MISSING)
+
+    def _get_instance(self):
+        """Return the instance, building it if necessary."""
+        instance = object.__getattribute__(self, "_instance")
+        if instance is _MISSING:
+            instance = object.__getattribute__(self, "_factory")()
+            object.__setattr__(self, "_instance", instance)
+            object.__setattr__(self, "_factory", None)
+        return instance
+
+    @property
+    def _is_built(self):
+        return object.__getattribute__(self, "_instance") is not _MISSING
+
+    @property
+    def __class__(self):
+        return self._get_instance().__class__
+
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_instance(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._get_instance(), name)
+
+    def __getitem__(self, key):
+        return self._get_instance()[key]
+
+    def __setitem__(self, key, value):
+        self._get_instance()[key] = value
+
+    def __delitem__(self, key):
+        del self._get_instance()[key]
+
+    def __iter__(self):
+        return iter(self._get_instance())
+
+    def __len__(self):
+        return len(self._get_instance())
+
+    def __contains__(self, item):
+        return item in self._get_instance()
+
+    def __eq__(self, other):
+        return self._get_instance() == resolve(other)
+
+    def __ne__(self, other):
+        return self._get_instance() != resolve(other)
+
+    def __hash__(self):
+        return hash(self._get_instance())
+
+    def __bool__(self):
+        return bool(self._get_instance())
+
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        return str(self._get_instance())
+
+    def __repr__(self):
+        if not self._is_built:
+            return "<FixtureProxy (not built)>"
+        return repr(self._get_instance())
+
+
+def resolve(value):
+    """Return the instance behind a :class:`FixtureProxy`.
+
+    Any other value is returned as is.
+
+    .. versionadded:: 0.4.8
+    """
+    if type(value) is FixtureProxy:
+        return value._get_instance()
+    return value
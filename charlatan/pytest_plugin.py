@@ -0,0 +1,282 @@
+"""pytest plugin exposing charlatan fixtures as pytest fixtures.
+
+The plugin is registered automatically when charlatan is installed.
+"""
+from __future__ import absolute_import
+import contextlib
+import os
+
+import pytest
+
+from charlatan import FixturesManager
+from charlatan import artifact
+from charlatan.fixture import get_class
+from charlatan.fixtures_manager import make_list
+from charlatan.profiling import FixtureProfiler
+
+# Fixtures managers (and the keyword arguments they were created with), by
+# loaded files, models package and session, shared by all the tests of a
+# process.
+_managers = {}
+
+
+def pytest_addoption(parser):
+    parser.addini("charlatan_fixtures",
+                  "fixtures files (or globs) loaded by the charlatan_manager "
+                  "fixture",
+                  type="linelist", default=[])
+    parser.addini("charlatan_models_package",
+                  "default models package of the charlatan fixtures",
+                  default="")
+    parser.addini("charlatan_database_template",
+                  "SQLite database where the fixtures are installed once, "
+                  "and cloned for each worker",
+                  default="")
+    parser.addini("charlatan_metadata",
+                  "SQLAlchemy metadata or declarative base of the models, "
+                  "e.g. yourlib.models:Base",
+                  default="")
+    parser.addini("charlatan_template_fixtures",
+                  "fixtures installed in the template database (defaults "
+                  "to all)",
+                  type="linelist", default=[])
+
+    group = parser.getgroup("charlatan")
+    group.addoption("--charlatan-profile", type=int, default=0, metavar="N",
+                    help="show the N slowest charlatan fixtures and models "
+                         "at the end of the run")
+    group.addoption("--charlatan-profile-json", default=None,
+                    metavar="PATH",
+                    help="write the time spent in each charlatan fixture "
+                         "and model to a JSON file")
+
+
+def pytest_configure(config):
+    if not (config.getoption("charlatan_profile")
+            or config.getoption("charlatan_profile_json")):
+        return
+
+    profiler = FixtureProfiler()
+    config._charlatan_profiler = profiler
+    FixturesManager.default_listeners.append(profiler)
+
+
+def pytest_unconfigure(config):
+    profiler = getattr(config, "_charlatan_profiler", None)
+    if profiler is None:
+        return
+
+    FixturesManager.default_listeners.remove(profiler)
+    filename = config.getoption("charlatan_profile_json")
+    # pytest-xdist workers send their measures to the controller (see
+    # pytest_testnodedown), which writes them all.
+    if filename and not hasattr(config, "workeroutput"):
+        profiler.write_json(filename)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    profiler = getattr(config, "_charlatan_profiler", None)
+    if profiler is not None and hasattr(config, "workeroutput"):
+        config.workeroutput["charlatan_profile"] = profiler.to_dict()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """Aggregate the measures of a pytest-xdist worker."""
+    profiler = getattr(node.config, "_charlatan_profiler", None)
+    data = getattr(node, "workeroutput", {}).get("charlatan_profile")
+    if profiler is not None and data:
+        profiler.update(data)
+
+
+def pytest_terminal_summary(terminalreporter):
+    config = terminalreporter.config
+    profiler = getattr(config, "_charlatan_profiler", None)
+    count = config.getoption("charlatan_profile")
+    if profiler is None or not count:
+        return
+
+    terminalreporter.write_sep("=", "charlatan fixtures profile")
+    report = profiler.format_report(count)
+    terminalreporter.write_line(report or "no charlatan fixture was used")
+
+
+def get_fixtures_manager(filenames, models_package="", db_session=None,
+                         **kwargs):
+    """Return a loaded fixtures manager, shared by the whole process.
+
+    :param filenames: files (or globs) holding the fixtures definitions
+    :type filenames: str or list of strs
+    :param str models_package:
+    :param Session db_session:
+
+    Other keyword arguments are passed to
+    :class:`charlatan.FixturesManager`. The files are only parsed once per
+    process (e.g. once per pytest-xdist worker).
+
+    There is one manager per files, models package and session: the session
+    of a manager is never changed. Calling it again with other keyword
+    arguments raises a ``ValueError``.
+
+    .. versionadded:: 0.4.8
+    """
+    key = (tuple(make_list(filenames)), models_package, db_session)
+    if key not in _managers:
+        manager = FixturesManager(db_session=db_session, **kwargs)
+        manager.load(list(key[0]), models_package=models_package)
+        _managers[key] = (manager, kwargs)
+
+    manager, manager_kwargs = _managers[key]
+    if kwargs != manager_kwargs:
+        raise ValueError(
+            "The fixtures manager of %s was created with other arguments: "
+            "%r" % (", ".join(key[0]), manager_kwargs))
+    return manager
+
+
+@contextlib.contextmanager
+def installed_fixtures(manager, fixture_keys):
+    """Install fixtures and uninstall them when exiting the context.
+
+    :param FixturesManager manager:
+    :param fixture_keys: fixtures to be installed
+    :type fixture_keys: str or list of strs
+
+    Only the fixtures that were installed in the context (the fixtures and
+    their ancestors that were not installed yet) are uninstalled.
+
+    .. versionadded:: 0.4.8
+    """
+    already_installed = set(manager.installed_keys)
+    instances = manager.install_fixtures(fixture_keys)
+    try:
+        if isinstance(fixture_keys, (list, tuple)):
+            yield instances
+        else:
+            yield instances[0]
+    finally:
+        installed = [k for k in manager.installed_keys
+                     if k not in already_installed]
+        manager.uninstall_fixtures(list(reversed(installed)))
+
+
+def charlatan_fixture(fixture_keys, scope="function", name=None):
+    """Return a pytest fixture installing charlatan fixtures.
+
+    :param fixture_keys: fixtures to be installed
+    :type fixture_keys: str or list of strs
+    :param str scope: ``function``, ``class``, ``module`` or ``session``
+    :param str name: name of the pytest fixture, defaults to the name of the
+        variable it is assigned to.
+
+    The fixtures are installed with the ``charlatan_manager`` fixture once
+    per scope, and uninstalled at the end of the scope::
+
+        toaster = charlatan_fixture("toaster", scope="module")
+
+        def test_toaster(toaster):
+            assert toaster.color == "red"
+
+    .. versionadded:: 0.4.8
+    """
+    def fixture(charlatan_manager):
+        with installed_fixtures(charlatan_manager, fixture_keys) as instance:
+            yield instance
+
+    if name:
+        return pytest.fixture(scope=scope, name=name)(fixture)
+    return pytest.fixture(scope=scope)(fixture)
+
+
+@pytest.fixture(scope="session")
+def charlatan_worker_id():
+    """Return the pytest-xdist worker id, or ``master``."""
+    return os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+def _get_configured_manager(config, db_session=None):
+    """Return the manager loaded with the files set in the ini options."""
+    filenames = config.getini("charlatan_fixtures")
+    if not filenames:
+        raise pytest.UsageError(
+            "The charlatan_fixtures ini option is required to use "
+            "charlatan_manager.")
+
+    return get_fixtures_manager(
+        filenames,
+        models_package=config.getini("charlatan_models_package"),
+        db_session=db_session)
+
+
+@pytest.fixture(scope="session")
+def charlatan_database(request, charlatan_worker_id):
+    """Return the path of the worker's clone of the template database.
+
+    Returns ``None`` unless the ``charlatan_database_template`` ini option
+    is set. The fixtures are installed once in the template (which is
+    rebuilt when the fixtures files or the models change), then each worker
+    gets its own clone.
+    """
+    template = request.config.getini("charlatan_database_template")
+    if not template:
+        return None
+
+    metadata = request.config.getini("charlatan_metadata")
+    if ":" not in metadata:
+        raise pytest.UsageError(
+            "The charlatan_metadata ini option (e.g. yourlib.models:Base) "
+            "is required to use charlatan_database_template.")
+
+    manager = _get_configured_manager(request.config)
+    fixture_keys = request.config.getini("charlatan_template_fixtures")
+    return artifact.prepare_worker_database(
+        manager, get_class(*metadata.split(":", 1)),
+        str(request.config.rootdir.join(template)), charlatan_worker_id,
+        fixture_keys=fixture_keys or None)
+
+
+@pytest.fixture(scope="session")
+def charlatan_db_session(charlatan_database):
+    """Return the SQLAlchemy session used to install the fixtures.
+
+    The session is bound to the worker's clone of the template database if
+    the ``charlatan_database_template`` ini option is set, otherwise it is
+    ``None``. Override this fixture to install fixtures in another database
+    (e.g. one database per ``charlatan_worker_id``).
+    """
+    if charlatan_database is None:
+        yield None
+        return
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine("sqlite:///%s" % charlatan_database)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def charlatan_manager(request, charlatan_db_session, charlatan_database):
+    """Return the fixtures manager, loaded with the configured files.
+
+    The files are set with the ``charlatan_fixtures`` ini option. All the
+    fixtures still installed at the end of the session are uninstalled.
+
+    With a template database, the fixtures of the template are already
+    installed (and cached lazily) in the worker's clone, which is discarded
+    instead of uninstalling the fixtures.
+    """
+    manager = _get_configured_manager(request.config,
+                                      db_session=charlatan_db_session)
+    if charlatan_database is not None:
+        artifact.attach_database(manager, charlatan_database)
+
+    yield manager
+    if charlatan_database is not None:
+        manager.clean_cache()
+    else:
+        manager.uninstall_all_fixtures()
@@ -0,0 +1,143 @@
+"""Limit the number of SQL statements issued by fixtures."""
+import functools
+
+from charlatan import _compat
+
+#: Key of the statements and commits issued outside of any fixture in
+#: :attr:`QueryBudget.breakdown` (e.g. the ``SELECT`` prefetching fixtures
+#: defined with an ``id``, or the batched ``DELETE`` of a cascade uninstall).
+TOP_LEVEL = "<top level>"
+
+
+class QueryBudgetExceeded(AssertionError):
+
+    """Raised when fixtures issued more statements or commits than allowed.
+
+    .. versionadded:: 0.4.8
+    """
+
+    def __init__(self, message, breakdown):
+        super(QueryBudgetExceeded, self).__init__(message)
+        self.breakdown = breakdown
+
+
+class QueryBudget(object):
+
+    """Count the statements and commits issued by fixtures.
+
+    :param FixturesManager fixtures_manager:
+    :param int max_statements: maximum number of SQL statements, or ``None``
+    :param int max_commits: maximum number of commits, or ``None``
+
+    Use it as a context manager or as a decorator, usually through
+    :meth:`charlatan.FixturesManager.query_budget`::
+
+        with manager.query_budget(max_statements=10, max_commits=1):
+            manager.install_fixtures(["toaster", "toaster_green"])
+
+    All the statements and commits issued on the session's bind while the
+    budget is active are counted. Those issued while installing, getting or
+    uninstalling a fixture are attributed to the innermost fixture (e.g. a
+    relationship loaded while building a fixture is attributed to this
+    fixture, not to the relationship's fixture), the others to
+    :data:`TOP_LEVEL`.
+
+    :class:`QueryBudgetExceeded` is raised when exiting the context if the
+    budget was exceeded, with the count of statements and commits per
+    fixture.
+
+    .. versionadded:: 0.4.8
+    """
+
+    def __init__(self, fixtures_manager, max_statements=None,
+                 max_commits=None):
+        self.fixtures_manager = fixtures_manager
+        self.max_statements = max_statements
+        self.max_commits = max_commits
+        self.statements = 0
+        self.commits = 0
+        # Fixture key (or TOP_LEVEL): [statements, commits]
+        self.breakdown = {}
+        self._stack = []
+        self._engine = None
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        from sqlalchemy import event
+
+        session = self.fixtures_manager.session
+        if session is None:
+            raise ValueError("A query budget requires a db_session.")
+
+        self.statements = 0
+        self.commits = 0
+        self.breakdown = {}
+        self._stack = []
+        self._engine = session.get_bind()
+        event.listen(self._engine, "before_cursor_execute",
+                     self._on_statement)
+        event.listen(self._engine, "commit", self._on_commit)
+        self.fixtures_manager.listeners.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        from sqlalchemy import event
+
+        self.fixtures_manager.listeners.remove(self)
+        event.remove(self._engine, "before_cursor_execute",
+                     self._on_statement)
+        event.remove(self._engine, "commit", self._on_commit)
+        self._engine = None
+
+        if exc_type is None:
+            self.check()
+
+    def fixture_started(self, fixture_key, action):
+        self._stack.append(fixture_key)
+
+    def fixture_finished(self, fixture_key, action, instance, model):
+        # Actions of fixtures installed concurrently may finish in any
+        # order.
+        index = len(self._stack) - 1 - self._stack[::-1].index(fixture_key)
+        del self._stack[index]
+
+    def _count(self, index):
+        key = self._stack[-1] if self._stack else TOP_LEVEL
+        counts = self.breakdown.setdefault(key, [0, 0])
+        counts[index] += 1
+
+    def _on_statement(self, conn, cursor, statement, parameters, context,
+                      executemany):
+        self._count(0)
+        self.statements += 1
+
+    def _on_commit(self, conn):
+        self._count(1)
+        self.commits += 1
+
+    def check(self):
+        """Raise :class:`QueryBudgetExceeded` if the budget was exceeded."""
+        exceeded = []
+        if (self.max_statements is not None
+                and self.statements > self.max_statements):
+            exceeded.append("%d statements (max %d)"
+                            % (self.statements, self.max_statements))
+        if self.max_commits is not None and self.commits > self.max_commits:
+            exceeded.append("%d commits (max %d)"
+                            % (self.commits, self.max_commits))
+        if not exceeded:
+            return
+
+        lines = ["Fixtures query budget exceeded: %s." % ", ".join(exceeded)]
+        for key, (statements, commits) in sorted(
+                _compat.iteritems(self.breakdown),
+                key=lambda e: (-e[1][0], -e[1][1], e[0])):
+            lines.append("  %s: %d statements, %d commits"
+                         % (key, statements, commits))
+        raise QueryBudgetExceeded("\n".join(lines), dict(self.breakdown))
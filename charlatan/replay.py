@@ -0,0 +1,256 @@
+"""Replay the INSERT statements of a previous install.
+
+Building the instances of many fixtures, and letting the ORM save them one by
+one, is slow. :func:`install_fixtures` records the INSERT statements (and
+their parameters) emitted while installing fixtures, along with the primary
+key of each fixture. The next runs replay the statements with the DB-API's
+``executemany`` and only cache a
+:class:`charlatan.database.PrimaryKeyStub` per fixture: instances are loaded
+from the database when they are used::
+
+    manager = FixturesManager(db_session=session)
+    manager.load("tests/fixtures/*.yaml")
+    Base.metadata.create_all(engine)
+    replay.install_fixtures(manager, Base, ["toaster", "toasters"],
+                            ".charlatan_replay")
+
+A log is only replayed if the fixtures files, the schema and the installed
+fixtures are the same: its name is a digest of them. The tables must not hold
+the recorded primary keys: :class:`ReplayError` is raised if the replayed
+rows don't get them.
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import absolute_import
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from charlatan import artifact
+from charlatan import database
+from charlatan.fixture import get_class
+from charlatan.fixtures_manager import make_list
+
+LOG_VERSION = 1
+
+
+class ReplayError(Exception):
+
+    """Raised when the replayed fixtures don't get their recorded primary
+    keys."""
+
+
+def get_log_digest(fixtures_manager, metadata, fixture_keys):
+    """Return the digest of the fixtures files, the schema and the keys.
+
+    :param FixturesManager fixtures_manager:
+    :param metadata: SQLAlchemy ``MetaData`` (or declarative base)
+    :param list fixture_keys:
+    """
+    metadata = getattr(metadata, "metadata", metadata)
+    digest = hashlib.sha1()
+    for part in (artifact.get_definitions_digest(fixtures_manager),
+                 artifact.get_schema_digest(metadata),
+                 json.dumps(sorted(fixture_keys))):
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_log_filename(directory, digest):
+    """Return the filename of a log."""
+    return os.path.join(directory, "%s.replay" % digest)
+
+
+class StatementRecorder(object):
+
+    """Record the INSERT statements executed by an engine.
+
+    :param engine: SQLAlchemy ``Engine``
+
+    Used as a context manager. Consecutive executions of the same statement
+    are grouped: :attr:`statements` is a list of ``(statement, list of
+    parameters)``.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        from sqlalchemy import event
+
+        event.listen(self.engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        from sqlalchemy import event
+
+        event.remove(self.engine, "before_cursor_execute", self.record)
+
+    def record(self, connection, cursor, statement, parameters, context,
+               executemany):
+        if statement.lstrip()[:6].upper() != "INSERT":
+            return
+
+        parameters = list(parameters) if executemany else [parameters]
+        if self.statements and self.statements[-1][0] == statement:
+            self.statements[-1][1].extend(parameters)
+        else:
+            self.statements.append((statement, parameters))
+
+
+def record(fixtures_manager, metadata, filename, fixture_keys):
+    """Install fixtures and write the log of their INSERT statements.
+
+    :param FixturesManager fixtures_manager: manager with the fixtures
+        loaded
+    :param metadata: SQLAlchemy ``MetaData`` (or declarative base)
+    :param str filename: path of the log
+    :param list fixture_keys: fixtures to be installed
+    :rtype: dict, the log
+
+    Only the statements executed by the engine of the manager's
+    ``db_session`` are recorded. The log is written to a temporary file,
+    then moved in place.
+    """
+    fixture_keys = make_list(fixture_keys)
+    engine = fixtures_manager.session.get_bind()
+    with StatementRecorder(engine) as recorder:
+        fixtures_manager.install_fixtures(fixture_keys)
+
+    log = {
+        "version": LOG_VERSION,
+        "digest": get_log_digest(fixtures_manager, metadata, fixture_keys),
+        "dialect": engine.dialect.name,
+        "statements": recorder.statements,
+        "fixtures": artifact.get_primary_keys(fixtures_manager,
+                                              entries=True),
+    }
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix=".replay")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(log, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_filename, filename)
+    except Exception:
+        os.remove(tmp_filename)
+        raise
+    return log
+
+
+def read_log(filename):
+    """Return a log, or ``None`` if it is missing or unreadable."""
+    try:
+        with open(filename, "rb") as f:
+            log = pickle.load(f)
+    except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+
+    if not isinstance(log, dict) or log.get("version") != LOG_VERSION:
+        return None
+    return log
+
+
+def replay(fixtures_manager, log):
+    """Execute the statements of a log and cache the fixtures' primary keys.
+
+    :param FixturesManager fixtures_manager: manager whose ``db_session`` is
+        bound to a database with the same schema
+    :param dict log: as returned by :func:`record`
+
+    The statements are executed on the session's DB-API connection, then
+    committed. The tables should be empty (e.g. just created): statements
+    without an explicit primary key rely on the database assigning the same
+    ones as when they were recorded. :class:`ReplayError` is raised (and
+    nothing is committed) if the recorded primary keys were already in the
+    tables, or are not after executing the statements.
+    """
+    session = fixtures_manager.session
+    primary_keys = _get_primary_keys_by_model(log["fixtures"])
+    fixtures_manager.get_hook("before_install")()
+    try:
+        _check_primary_keys(session, primary_keys, replayed=False)
+        cursor = session.connection().connection.cursor()
+        try:
+            for statement, parameters in log["statements"]:
+                if len(parameters) == 1:
+                    cursor.execute(statement, parameters[0])
+                else:
+                    cursor.executemany(statement, parameters)
+        finally:
+            cursor.close()
+        _check_primary_keys(session, primary_keys, replayed=True)
+        session.commit()
+
+    except Exception as exc:
+        session.rollback()
+        fixtures_manager.get_hook("after_install")(exc)
+        raise
+
+    artifact.attach_primary_keys(fixtures_manager, log["fixtures"])
+    fixtures_manager.get_hook("after_install")(None)
+
+
+def _get_primary_keys_by_model(fixtures):
+    """Return the recorded primary keys by model.
+
+    :param list fixtures: as returned by
+        :func:`charlatan.artifact.get_primary_keys`
+    """
+    returned = {}
+    for _, model_path, primary_key in fixtures:
+        returned.setdefault(model_path, set()).add(primary_key)
+    return returned
+
+
+def _check_primary_keys(session, primary_keys, replayed):
+    """Raise :class:`ReplayError` if the recorded primary keys are in the
+    tables before the statements are replayed, or missing after."""
+    for model_path, expected in sorted(primary_keys.items()):
+        model = get_class(*model_path.split(":"))
+        existing = database.get_existing_primary_keys(session, model,
+                                                      expected)
+        if replayed and existing != expected:
+            raise ReplayError(
+                "Replayed %s rows did not get their recorded primary keys "
+                "(missing: %s). Replay logs in empty tables."
+                % (model_path, sorted(expected - existing)[:10]))
+        if not replayed and existing:
+            raise ReplayError(
+                "Recorded primary keys of %s are already in the database "
+                "(%s). Replay logs in empty tables."
+                % (model_path, sorted(existing)[:10]))
+
+
+def install_fixtures(fixtures_manager, metadata, fixture_keys, directory):
+    """Install fixtures, replaying the log of a previous install if any.
+
+    :param FixturesManager fixtures_manager: manager with the fixtures
+        loaded, whose ``db_session`` is bound to empty tables
+    :param metadata: SQLAlchemy ``MetaData`` (or declarative base)
+    :param list fixture_keys: fixtures to be installed
+    :param str directory: where logs are kept
+    :rtype: bool, True if a log was replayed
+
+    Without an up-to-date log, the fixtures are installed (and cached as
+    usual) while their statements are recorded.
+    """
+    fixture_keys = make_list(fixture_keys)
+    digest = get_log_digest(fixtures_manager, metadata, fixture_keys)
+    filename = get_log_filename(directory, digest)
+    dialect = fixtures_manager.session.get_bind().dialect.name
+
+    log = read_log(filename)
+    if (log is not None
+            and log["digest"] == digest
+            and log["dialect"] == dialect):
+        replay(fixtures_manager, log)
+        return True
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    record(fixtures_manager, metadata, filename, fixture_keys)
+    return False
@@ -0,0 +1,281 @@
+"""Serve parsed fixtures files to other processes over a Unix socket.
+
+Short-lived processes (tests, scripts) using the same fixtures all parse
+the same YAML files. The definition server is a long-running process keeping
+the parsed files in memory; managers created with ``definition_server`` get
+them from the server (unpickling is much faster than parsing YAML), and
+parse the files themselves when the server is not running (or fails to parse
+them)::
+
+    $ charlatan serve --socket /tmp/charlatan.sock
+
+    manager = FixturesManager(definition_server="/tmp/charlatan.sock")
+    manager.load("tests/fixtures/*.yaml")
+
+Managers only get the parsed files from the server. Other processes can
+also ask it to build fixtures without a model (e.g. dicts), and to return
+install plans (see :meth:`charlatan.FixturesManager.explain`), with a
+:class:`DefinitionClient`.
+
+Messages are pickled, and prefixed by their length (4 bytes, big-endian).
+Only run the server in a trusted environment: the socket is restricted to
+its owner, and whoever can write to it can run code in the clients.
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import absolute_import
+import os
+import pickle
+import socket
+import struct
+import threading
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+from charlatan import _compat
+from charlatan.file_format import load_file
+
+_HEADER = struct.Struct(">I")
+
+
+class ServerUnavailable(IOError):
+
+    """Raised when the definition server cannot be reached."""
+
+
+class ServerError(Exception):
+
+    """Raised when the definition server failed to handle a request."""
+
+
+def send_message(sock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise EOFError("Connection closed.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(sock):
+    size, = _HEADER.unpack(_receive_exactly(sock, _HEADER.size))
+    return pickle.loads(_receive_exactly(sock, size))
+
+
+class DefinitionServer(socketserver.ThreadingMixIn,
+                       socketserver.UnixStreamServer):
+
+    """Serve parsed fixtures files, see the module documentation.
+
+    :param str socket_path: path of the Unix socket
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path,
+                                               _RequestHandler)
+        os.chmod(socket_path, 0o600)
+        self._lock = threading.Lock()
+        # (filename, use_unicode): (mtime, size, content)
+        self._files = {}
+        # (filenames, models_package): (digest of the files, manager)
+        self._managers = {}
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+    def handle_message(self, message):
+        """Return the response to a message: ``(command, arguments...)``."""
+        command, args = message[0], message[1:]
+        handler = getattr(self, "do_" + command, None)
+        if handler is None:
+            raise ValueError("Unknown command: '%s'" % command)
+        return handler(*args)
+
+    def do_ping(self):
+        return "pong"
+
+    def do_load_file(self, filename, use_unicode=False):
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        with self._lock:
+            key = (filename, use_unicode)
+            cached = self._files.get(key)
+            if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+                return cached[2]
+
+            content = load_file(filename, use_unicode)
+            self._files[key] = (stat.st_mtime, stat.st_size, content)
+            return content
+
+    def _get_manager(self, filenames, models_package):
+        from charlatan import FixturesManager
+        from charlatan import definition_store
+
+        key = (tuple(filenames), models_package)
+        with self._lock:
+            if key in self._managers:
+                digest, manager = self._managers[key]
+                if digest == definition_store.get_digest(manager,
+                                                         manager._loaded):
+                    manager.clean_cache()
+                    return manager
+
+            manager = FixturesManager()
+            manager.load(list(filenames), models_package=models_package)
+            digest = definition_store.get_digest(manager, manager._loaded)
+            self._managers[key] = (digest, manager)
+            return manager
+
+    def do_explain(self, filenames, models_package, fixture_keys):
+        manager = self._get_manager(filenames, models_package)
+        with self._lock:
+            return manager.explain(fixture_keys).to_dict()
+
+    def do_get_fixture(self, filenames, models_package, fixture_key):
+        manager = self._get_manager(filenames, models_package)
+        with self._lock:
+            plan = manager.explain(fixture_key)
+            for step in plan:
+                if step.model is not None:
+                    raise ValueError(
+                        "'%s' depends on '%s', which has a model. Only "
+                        "fixtures without a model can be built by the "
+                        "server." % (fixture_key, step.key))
+            try:
+                return manager.get_fixture(fixture_key)
+            finally:
+                manager.clean_cache()
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            try:
+                message = receive_message(self.request)
+            except EOFError:
+                return
+
+            try:
+                response = ("ok", self.server.handle_message(message))
+            except Exception as e:
+                response = ("error", "%s: %s" % (e.__class__.__name__, e))
+
+            try:
+                send_message(self.request, response)
+            except (pickle.PicklingError, TypeError,
+                    AttributeError) as e:
+                send_message(self.request, (
+                    "error", "Cannot send the response: %s" % e))
+
+
+def serve(socket_path):
+    """Run a definition server until interrupted."""
+    server = DefinitionServer(socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class DefinitionClient(object):
+
+    """Client of a :class:`DefinitionServer`.
+
+    :param str socket_path: path of the server's Unix socket
+    :param float timeout: in seconds
+
+    :class:`ServerUnavailable` is raised when the server is not running,
+    :class:`ServerError` when it fails to handle a request.
+    """
+
+    def __init__(self, socket_path, timeout=5.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._socket = None
+
+    def _connect(self):
+        if self._socket is None:
+            if not hasattr(socket, "AF_UNIX"):
+                raise ServerUnavailable("Unix sockets are not supported.")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except socket.error as e:
+                sock.close()
+                raise ServerUnavailable(str(e))
+            self._socket = sock
+        return self._socket
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def request(self, command, *args):
+        """Send a request to the server, return its response."""
+        sock = self._connect()
+        try:
+            send_message(sock, (command, ) + args)
+            status, value = receive_message(sock)
+        except (socket.error, EOFError) as e:
+            self.close()
+            raise ServerUnavailable(str(e))
+
+        if status == "error":
+            raise ServerError(value)
+        return value
+
+    def ping(self):
+        """Return True if the server is running."""
+        try:
+            return self.request("ping") == "pong"
+        except ServerUnavailable:
+            return False
+
+    def load_file(self, filename, use_unicode=False):
+        """Return the parsed content of a fixtures file."""
+        return self.request("load_file", os.path.abspath(filename),
+                            use_unicode)
+
+    def get_fixture(self, filenames, fixture_key, models_package=""):
+        """Return a fixture without a model, built by the server.
+
+        :param list filenames: fixtures files (or globs)
+        :param str fixture_key:
+        :param str models_package:
+        """
+        return self.request("get_fixture", _absolute(filenames),
+                            models_package, fixture_key)
+
+    def explain(self, filenames, fixture_keys, models_package=""):
+        """Return an install plan, as returned by
+        :meth:`charlatan.plan.InstallPlan.to_dict`.
+        """
+        return self.request("explain", _absolute(filenames),
+                            models_package, fixture_keys)
+
+
+def _absolute(filenames):
+    if isinstance(filenames, _compat.string_types):
+        filenames = [filenames]
+    return [os.path.abspath(f) for f in filenames]
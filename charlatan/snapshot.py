@@ -0,0 +1,274 @@
+"""Restore the rows of installed fixtures modified by a test.
+
+Most tests only read the fixtures, or modify a few rows. Instead of
+uninstalling and installing all the fixtures between tests, a snapshot keeps
+the rows of the installed fixtures (and a checksum of each row), and only
+restores the rows that changed::
+
+    class TestToaster(FixturesManagerMixin, TestCase):
+
+        @classmethod
+        def setUpClass(cls):
+            cls.fixtures_manager.install_fixtures(["toaster", "toasters"])
+            cls.snapshot = cls.fixtures_manager.snapshot()
+
+        def tearDown(self):
+            self.snapshot.restore()
+
+Only the rows of the installed SQLAlchemy fixtures are tracked: rows
+inserted by the test itself are not deleted.
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import absolute_import
+import hashlib
+
+from charlatan import _compat
+from charlatan.database import PrimaryKeyStub, get_primary_key
+from charlatan.utils import is_sqlalchemy_model, iter_instances
+
+
+def get_checksum(values):
+    """Return the checksum of a row's values."""
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+
+
+def select_rows(session, column, primary_keys, batch_size=500):
+    """Return the rows of a table by primary key, as tuples.
+
+    :param Session session:
+    :param column: the table's primary key column
+    :param list primary_keys:
+    :param int batch_size: maximum number of primary keys per query
+    """
+    table = column.table
+    index = list(table.columns).index(column)
+    primary_keys = list(primary_keys)
+    rows = {}
+    for i in range(0, len(primary_keys), batch_size):
+        batch = primary_keys[i:i + batch_size]
+        for row in session.execute(table.select().where(column.in_(batch))):
+            rows[row[index]] = tuple(row)
+    return rows
+
+
+class _TableRows(object):
+
+    """Rows of a table saved by a snapshot."""
+
+    __slots__ = ("session", "column", "fixture_keys", "instances", "values",
+                 "checksums")
+
+    def __init__(self, session, column):
+        self.session = session
+        self.column = column
+        # Primary key: fixture keys and instances having this row
+        self.fixture_keys = {}
+        self.instances = {}
+        # Primary key: values, checksum
+        self.values = {}
+        self.checksums = {}
+
+    @property
+    def table(self):
+        return self.column.table
+
+    def add(self, fixture_key, primary_key, instance=None):
+        keys = self.fixture_keys.setdefault(primary_key, [])
+        if fixture_key not in keys:
+            keys.append(fixture_key)
+        if instance is not None:
+            self.instances.setdefault(primary_key, []).append(instance)
+
+    def save(self):
+        self.values = select_rows(self.session, self.column,
+                                  list(self.fixture_keys))
+        self.checksums = dict((k, get_checksum(v))
+                              for k, v in _compat.iteritems(self.values))
+
+    def get_changes(self):
+        """Return ``(changed, deleted)`` lists of primary keys."""
+        current = select_rows(self.session, self.column, list(self.values))
+        changed, deleted = [], []
+        for primary_key, checksum in _compat.iteritems(self.checksums):
+            if primary_key not in current:
+                deleted.append(primary_key)
+            elif get_checksum(current[primary_key]) != checksum:
+                changed.append(primary_key)
+        return changed, deleted
+
+    def as_dict(self, primary_key):
+        names = [c.key for c in self.table.columns]
+        return dict(zip(names, self.values[primary_key]))
+
+
+class FixturesSnapshot(object):
+
+    """Snapshot of the rows of a manager's installed fixtures.
+
+    :param FixturesManager fixtures_manager:
+
+    The rows are read when the snapshot is created, see
+    :meth:`charlatan.FixturesManager.snapshot`. Fixtures with a composite
+    primary key, or mapped to several tables, are not tracked.
+    """
+
+    def __init__(self, fixtures_manager):
+        from sqlalchemy import inspect
+
+        self.fixtures_manager = fixtures_manager
+        self.cache = dict(fixtures_manager.cache)
+        self.installed_keys = list(fixtures_manager.installed_keys)
+        self._tables = []
+
+        for fixture_key in self.installed_keys:
+            for instance in iter_instances(self.cache.get(fixture_key)):
+                if type(instance) is PrimaryKeyStub:
+                    model, primary_key = instance.model, instance.primary_key
+                    instance = None
+                elif is_sqlalchemy_model(instance):
+                    model = type(instance)
+                    primary_key = get_primary_key(instance)
+                else:
+                    continue
+
+                mapper = inspect(model)
+                session = fixtures_manager.session_for(model)
+                if (session is None or primary_key is None
+                        or len(mapper.tables) > 1
+                        or len(mapper.primary_key) > 1):
+                    continue
+
+                self._get_table_rows(session, mapper.primary_key[0]).add(
+                    fixture_key, primary_key, instance)
+
+        for table_rows in self._tables:
+            table_rows.save()
+
+    def _get_table_rows(self, session, column):
+        for table_rows in self._tables:
+            if table_rows.session is session and table_rows.column is column:
+                return table_rows
+        self._tables.append(_TableRows(session, column))
+        return self._tables[-1]
+
+    def count(self):
+        """Return the number of rows in the snapshot."""
+        return sum(len(t.values) for t in self._tables)
+
+    def get_changes(self):
+        """Return the rows that changed since the snapshot.
+
+        :rtype: list of ``(table name, primary key, status)``, status being
+            ``"changed"`` or ``"deleted"``
+        """
+        returned = []
+        for table_rows in self._tables:
+            changed, deleted = table_rows.get_changes()
+            returned.extend((table_rows.table.name, k, "changed")
+                            for k in changed)
+            returned.extend((table_rows.table.name, k, "deleted")
+                            for k in deleted)
+        return returned
+
+    def get_changed_keys(self):
+        """Return the keys of the fixtures whose rows changed, in install
+        order."""
+        keys = set()
+        for table_rows in self._tables:
+            changed, deleted = table_rows.get_changes()
+            for primary_key in changed + deleted:
+                keys.update(table_rows.fixture_keys[primary_key])
+        return [k for k in self.installed_keys if k in keys]
+
+    def restore(self):
+        """Restore the manager's fixtures as they were in the snapshot.
+
+        :rtype: int, number of restored rows
+
+        Fixtures installed since the snapshot are uninstalled. Deleted rows
+        are inserted again (referenced tables first) and changed rows are
+        updated, with a single commit per session. Other rows, instances and
+        cache entries are left untouched. Restored instances are expired, or
+        reloaded from the database when they are not in the session anymore.
+        """
+        from sqlalchemy.schema import sort_tables
+
+        manager = self.fixtures_manager
+        installed_since = [k for k in manager.installed_keys
+                           if k not in self.cache]
+        manager.uninstall_fixtures(list(reversed(installed_since)))
+
+        order = sort_tables([t.table for t in self._tables])
+        tables = sorted(self._tables, key=lambda t: order.index(t.table))
+        changes = [(t, ) + t.get_changes() for t in tables]
+
+        sessions = []
+        count = 0
+        try:
+            for table_rows, changed, deleted in changes:
+                session = table_rows.session
+                if (changed or deleted) and session not in sessions:
+                    sessions.append(session)
+                if deleted:
+                    session.execute(table_rows.table.insert(), [
+                        table_rows.as_dict(k) for k in deleted])
+                for primary_key in changed:
+                    session.execute(
+                        table_rows.table.update()
+                        .where(table_rows.column == primary_key)
+                        .values(**table_rows.as_dict(primary_key)))
+                count += len(changed) + len(deleted)
+
+            for session in sessions:
+                session.commit()
+
+        except Exception:
+            for session in sessions:
+                session.rollback()
+            raise
+
+        cache = dict(self.cache)
+        for table_rows, changed, deleted in changes:
+            for primary_key in changed + deleted:
+                self._refresh(cache, table_rows, primary_key)
+
+        self.cache = cache
+        manager.cache = dict(cache)
+        manager.installed_keys = list(self.installed_keys)
+        return count
+
+    def _refresh(self, cache, table_rows, primary_key):
+        """Expire (or reload) the instances of a restored row."""
+        session = table_rows.session
+        instances = []
+        for instance in table_rows.instances.get(primary_key, ()):
+            if instance in session:
+                session.expire(instance)
+                instances.append(instance)
+                continue
+
+            # Deleted or detached: replaced by the row loaded again.
+            model = type(instance)
+            for fixture_key in table_rows.fixture_keys[primary_key]:
+                value = cache[fixture_key]
+                if value is instance:
+                    cache[fixture_key] = PrimaryKeyStub(model, primary_key)
+                elif value is not None:
+                    loaded = session.query(model).get(primary_key)
+                    cache[fixture_key] = _replace(value, instance, loaded)
+                    instances.append(loaded)
+
+        table_rows.instances[primary_key] = instances
+
+
+def _replace(value, old, new):
+    """Return a collection's instances, with ``old`` replaced by ``new``."""
+    if value is old:
+        return new
+    if isinstance(value, dict):
+        return value.__class__(
+            (k, _replace(v, old, new)) for k, v in _compat.iteritems(value))
+    if isinstance(value, (list, tuple)):
+        return value.__class__(_replace(v, old, new) for v in value)
+    return value
@@ -7,6 +7,14 @@ class FixturesManagerMixin(object):
 
     """Class from which test cases should inherit to use fixtures.
 
+    Set ``fixtures_teardown`` to ``"truncate"`` to tear fixtures down with
+    :meth:`charlatan.FixturesManager.truncate_fixtures` in
+    :meth:`uninstall_all_fixtures` (the manager's ``teardown`` is used
+    otherwise).
+
+    .. versionadded:: 0.4.8
+        ``fixtures_teardown`` attribute was added.
+
     .. versionchanged:: 0.3.12
         ``FixturesManagerMixin`` does not install class attributes
         ``fixtures`` anymore.
@@ -19,6 +27,8 @@ class FixturesManagerMixin(object):
 
     """
 
+    fixtures_teardown = None
+
     def init_fixtures(self):
         """Initialize the fixtures.
 
@@ -65,6 +75,10 @@ class FixturesManagerMixin(object):
 
     @copy_docstring_from(FixturesManager)
     def uninstall_all_fixtures(self):
+        teardown = self.fixtures_teardown or self.fixtures_manager.teardown
+        if teardown == "truncate":
+            return self.fixtures_manager.truncate_fixtures()
+
         # copy and reverse the list in order to remove objects with
         # relationships first
         installed_fixtures = list(self.fixtures_manager.installed_keys)
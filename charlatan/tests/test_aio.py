@@ -0,0 +1,179 @@
+from __future__ import absolute_import
+import asyncio
+import os
+import shutil
+import tempfile
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("sqlalchemy.ext.asyncio")
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from charlatan.aio import AsyncFixturesManager  # noqa: E402
+from charlatan.aio import AsyncInstantiateAndSave  # noqa: E402
+from charlatan.tests.fixtures.models import Base, Color, Toaster  # noqa: E402
+
+
+class Recorder(object):
+
+    """Record the notifications of the manager."""
+
+    def __init__(self):
+        self.events = []
+
+    def fixture_started(self, fixture_key, action):
+        self.events.append(("started", fixture_key, action))
+
+    def fixture_finished(self, fixture_key, action, instance, model):
+        self.events.append(("finished", fixture_key, action))
+
+
+class SlowSave(AsyncInstantiateAndSave):
+
+    """Record how many fixtures are saved at the same time."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.saved = []
+
+    async def save_async(self, instance, fixtures, session_factory):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        instance = await super(SlowSave, self).save_async(
+            instance, fixtures, session_factory)
+        self.saved.append(instance)
+        return instance
+
+
+@pytest.fixture
+def run():
+    directory = tempfile.mkdtemp()
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///" + os.path.join(directory, "test.db"))
+    loop = asyncio.new_event_loop()
+
+    async def create_all():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    loop.run_until_complete(create_all())
+
+    def run(function):
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        return loop.run_until_complete(function(session_factory))
+
+    yield run
+
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+    shutil.rmtree(directory)
+
+
+def get_manager(session_factory, **kwargs):
+    manager = AsyncFixturesManager(session_factory=session_factory, **kwargs)
+    manager.load("./charlatan/tests/data/relationships.yaml")
+    return manager
+
+
+async def count(session_factory, model):
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+
+def test_install_fixtures(run):
+    """Verify that fixtures and their ancestors are installed once."""
+    async def test(session_factory):
+        manager = get_manager(session_factory)
+        model, model_1 = await manager.install_fixtures(["model", "model_1"])
+        assert model.id and model_1.id
+        assert model.color.name == model_1.color.name == "red"
+        assert manager.installed_keys[0] == "color"
+        assert await count(session_factory, Color) == 1
+        assert await count(session_factory, Toaster) == 2
+
+        toasters = await manager.install_fixture("model_list")
+        assert [t.name for t in toasters] == ["one", "two"]
+        assert all(t.id for t in toasters)
+        assert await count(session_factory, Toaster) == 4
+
+    run(test)
+
+
+def test_install_concurrently(run):
+    """Verify that independent fixtures are saved at the same time."""
+    async def test(session_factory):
+        builder = SlowSave()
+        manager = get_manager(session_factory, get_builder=builder)
+        await manager.install_fixtures(["model", "model_1", "model_list"])
+        # color first, then the four toasters at once
+        assert builder.saved[0].__class__ is Color
+        assert builder.max_running == 4
+
+    run(test)
+
+
+def test_overrides_and_uninstall(run):
+    """Verify overrides, and that fixtures are uninstalled."""
+    async def test(session_factory):
+        manager = get_manager(session_factory)
+        toaster = await manager.install_fixture("model",
+                                                overrides={"name": "other"})
+        assert toaster.name == "other"
+        assert "model" not in manager.cache
+
+        await manager.install_fixture("model")
+        await manager.uninstall_all_fixtures()
+        assert manager.installed_keys == []
+        assert await count(session_factory, Color) == 0
+        assert await count(session_factory, Toaster) == 1
+
+    run(test)
+
+
+def test_collection_entries_from_database(run):
+    """Verify that collection entries with an id are loaded asynchronously."""
+    async def test(session_factory):
+        async with session_factory() as session:
+            session.add_all([Toaster(id=1, name="one"),
+                             Toaster(id=2, name="two")])
+            await session.commit()
+
+        manager = AsyncFixturesManager(session_factory=session_factory)
+        manager.load("./charlatan/tests/data/database_ids.yaml")
+        toasters = await manager.install_fixture("toasters")
+        assert [t.name for t in toasters] == ["one", "two"]
+        assert not manager._prefetched
+        assert await count(session_factory, Toaster) == 2
+
+    run(test)
+
+
+def test_listeners(run):
+    """Verify that listeners are notified like with the sync manager."""
+    async def test(session_factory):
+        recorder = Recorder()
+        manager = get_manager(session_factory, listeners=[recorder])
+        await manager.install_fixture("model")
+        await manager.uninstall_fixture("model")
+        assert recorder.events == [
+            ("started", "model", "install"),
+            ("started", "color", "get"),
+            ("finished", "color", "get"),
+            ("started", "model", "get"),
+            # The relationship, from the cache.
+            ("started", "color", "get"),
+            ("finished", "color", "get"),
+            ("finished", "model", "get"),
+            ("finished", "model", "install"),
+            ("started", "model", "uninstall"),
+            ("finished", "model", "uninstall"),
+        ]
+
+    run(test)
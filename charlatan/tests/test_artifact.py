@@ -0,0 +1,113 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from charlatan import artifact
+from charlatan import cli
+from charlatan import testing
+from charlatan import FixturesManager
+from charlatan.tests.fixtures.models import Base, Toaster
+
+FIXTURES = "./charlatan/tests/data/relationships.yaml"
+
+
+class TestDatabaseArtifact(testing.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "fixtures.db")
+        self.manager = FixturesManager()
+        self.manager.load(FIXTURES)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def get_session(self, filename):
+        engine = create_engine("sqlite:///%s" % filename)
+        session = sessionmaker(bind=engine)()
+        self.addCleanup(engine.dispose)
+        self.addCleanup(session.close)
+        return session
+
+    def test_attach_database(self):
+        """Verify that fixtures are loaded from the database by key."""
+        manifest = artifact.build_database(self.manager, Base, self.filename,
+                                           fixture_keys=["model"])
+        assert [f[0] for f in manifest["fixtures"]] == ["color", "model"]
+
+        copy = os.path.join(self.tmpdir, "copy.db")
+        artifact.copy_database(self.filename, copy)
+        session = self.get_session(copy)
+        manager = FixturesManager(db_session=session)
+        manager.load(FIXTURES)
+
+        assert artifact.attach_database(manager, copy, metadata=Base)
+        assert manager.installed_keys == ["color", "model"]
+
+        toaster = manager.install_fixture("model")
+        assert toaster.name == "toaster1"
+        assert toaster.color.name == "red"
+        assert session.query(Toaster).count() == 1
+
+    def test_attach_collection(self):
+        """Verify that the entries of collections are attached too."""
+        artifact.build_database(self.manager, Base, self.filename,
+                                fixture_keys=["model", "model_list"])
+        session = self.get_session(self.filename)
+        manager = FixturesManager(db_session=session)
+        manager.load(FIXTURES)
+        assert artifact.attach_database(manager, self.filename,
+                                        metadata=Base)
+
+        toasters = manager.install_fixture("model_list")
+        assert [t.name for t in toasters] == ["one", "two"]
+        assert session.query(Toaster).count() == 3
+
+    def test_changed_definitions(self):
+        """Verify that a database is out of date when the files change."""
+        artifact.build_database(self.manager, Base, self.filename,
+                                fixture_keys=["color"])
+        assert artifact.is_up_to_date(self.manager, self.filename,
+                                      fixture_keys=["color"])
+        assert not artifact.is_up_to_date(self.manager, self.filename,
+                                          fixture_keys=["model"])
+
+        manager = FixturesManager()
+        manager.load("./charlatan/tests/data/simple.yaml")
+        assert not artifact.is_up_to_date(manager, self.filename)
+        assert not artifact.attach_database(manager, self.filename)
+        assert not manager.cache
+
+    def test_build_db_command(self):
+        """Verify that the build-db command writes a database."""
+        cli.main(["build-db", FIXTURES, "-k", "model",
+                  "--metadata", "charlatan.tests.fixtures.models:Base",
+                  "--output", self.filename])
+        assert os.path.exists(self.filename)
+        assert artifact.read_manifest(self.filename)["keys"] == ["model"]
+
+    def test_prepare_worker_database(self):
+        """Verify that each worker gets a clone of the template."""
+        filename = artifact.prepare_worker_database(
+            self.manager, Base, self.filename, "gw0", fixture_keys=["model"])
+        assert filename == os.path.join(self.tmpdir, "fixtures.gw0.db")
+        manifest = artifact.read_manifest(self.filename)
+
+        # The template is up to date, so it's only cloned.
+        other = artifact.prepare_worker_database(
+            self.manager, Base, self.filename, "gw1", fixture_keys=["model"])
+        assert artifact.read_manifest(other) == manifest
+
+        session = self.get_session(filename)
+        session.add(Toaster(name="extra"))
+        session.commit()
+        assert session.query(Toaster).count() == 2
+        session.close()
+
+        # Cloning again resets the worker's database.
+        artifact.clone_database(self.filename, filename)
+        assert self.get_session(filename).query(Toaster).count() == 1
@@ -54,6 +54,27 @@ class TestDepGraph(testing.TestCase):
         l = d.ancestors_of('d')
         self.assertCountEqual(l, ['a', 'b', 'c'])
 
+    def test_descendants_of(self):
+        """Test the descendants_of function in DepGraph."""
+        d = DepGraph()
+        #
+        #   a    b
+        #    \  /
+        #     c
+        #    / \
+        #   d   e
+        #   |
+        #   f
+        d.add_edge('a', 'c')
+        d.add_edge('b', 'c')
+        d.add_edge('c', 'd')
+        d.add_edge('c', 'e')
+        d.add_edge('d', 'f')
+        l = d.descendants_of('c')
+        self.assertCountEqual(l, ['d', 'e', 'f'])
+        assert l.index('d') < l.index('f')
+        assert d.descendants_of('f') == []
+
     def test_has_edge_between(self):
         """Test the has_edge_between function."""
         d = DepGraph()
@@ -0,0 +1,44 @@
+import copy
+
+import pytest
+
+from charlatan import Fixture, FixturesManager
+from charlatan.fixture import EMPTY_DICT
+
+
+def test_fixture_has_no_dict():
+    """Verify that fixtures use slots."""
+    fixture = Fixture("toaster", fixture_manager=None)
+    assert not hasattr(fixture, "__dict__")
+
+
+def test_empty_fields_are_shared_and_read_only():
+    """Verify that empty fields are a shared read-only dict."""
+    first = Fixture("first", fixture_manager=None)
+    second = Fixture("second", fixture_manager=None, post_creation={})
+    assert first.fields is second.post_creation is EMPTY_DICT
+
+    with pytest.raises(TypeError):
+        first.fields["color"] = "red"
+
+
+def test_copying_empty_fields_returns_a_dict():
+    """Verify that a copy of the shared empty fields can be modified."""
+    params = copy.deepcopy(EMPTY_DICT)
+    params["color"] = "red"
+    assert params == {"color": "red"}
+    assert not EMPTY_DICT
+
+
+def test_inheritance_is_resolved_once():
+    """Verify that a fixture only inherits from its parent once."""
+    manager = FixturesManager()
+    manager.load("docs/examples/fixtures_inheritance.yaml")
+    fixture = manager.collection.get("third")
+    fixture.inherit_from_parent()
+    assert fixture._has_inherited_from_parent
+    assert fixture.fields == {"foo": "bar", "toaster": "toasted"}
+
+    fields = fixture.fields
+    fixture.inherit_from_parent()
+    assert fixture.fields is fields
@@ -1,6 +1,13 @@
+import datetime
+
+import mock
 import pytest
+import pytz
 
+from charlatan import generators
 from charlatan import FixturesManager
+from charlatan.fixture import FixtureDefinition
+from charlatan.fixture_collection import GeneratedFixtureCollection
 
 
 def get_collection(collection):
@@ -28,3 +35,143 @@ def test_cant_get_missing_fixture(collection):
     """Verify that we can't get a missing fixture."""
     with pytest.raises(KeyError):
         collection.get("missing")
+
+
+def test_iter_instances(collection):
+    """Verify that we can iterate over the instances."""
+    instances = dict(collection.iter_instances())
+    assert sorted(instances) == ["blue", "green"]
+    assert instances["green"].color == "green"
+
+
+def test_iter_instances_does_not_keep_lazy_fixtures():
+    """Verify that lazily loaded fixtures are not kept when iterating."""
+    manager = FixturesManager(lazy_definitions=True)
+    manager.load("docs/examples/collection.yaml")
+    collection = manager.collection.get("anonymous_toasters")
+
+    colors = [t.color for _, t in collection.iter_instances()]
+    assert colors == ["yellow", "black"]
+    assert all(isinstance(f, FixtureDefinition) for f in collection.fixtures)
+
+
+def test_generated_collection(monkeypatch):
+    """Verify that the entries of a generated collection are created."""
+    monkeypatch.setattr(GeneratedFixtureCollection, "batch_size", 2)
+    manager = FixturesManager()
+    manager.load("./charlatan/tests/data/generated.yaml")
+    collection = manager.collection.get("dicts")
+
+    assert len(collection.fixtures) == 3
+    assert manager.get_fixture("dicts") == [
+        {"kind": "dict", "side": "left", "index": 0},
+        {"kind": "dict", "side": "right", "index": 1},
+        {"kind": "dict", "side": "left", "index": 2},
+    ]
+    assert manager.get_fixture("dicts.1")["side"] == "right"
+    assert [f.key for _, f in collection] == ["dicts.0", "dicts.1", "dicts.2"]
+    with pytest.raises(IndexError):
+        collection.get(3)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_random_values(monkeypatch, use_numpy):
+    """Verify that random values are reproducible with a seed."""
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(generators, "numpy", None)
+
+    def get_rows(**kwargs):
+        manager = FixturesManager(**kwargs)
+        manager.load("./charlatan/tests/data/generated.yaml")
+        rows = [dict(row) for row in manager.get_fixture("random")]
+        for row in rows:
+            del row["created_at"]
+        return manager, rows
+
+    manager, rows = get_rows(random_seed=1)
+    assert len(rows) == 1500
+    assert set(r["number"] for r in rows) == set(range(1, 7))
+    assert set(r["name"] for r in rows) == set(["alice", "bob", "carol"])
+    assert all(0 <= r["ratio"] <= 1 for r in rows)
+
+    assert get_rows(random_seed=1)[1] == rows
+    assert get_rows(random_seed=2)[1] != rows
+    # Entries have the same values as when the collection is generated.
+    manager.clean_cache()
+    entry = manager.get_fixture("random.1234")
+    assert entry.pop("created_at") <= datetime.datetime.now(pytz.utc)
+    assert entry == rows[1234]
+
+
+def test_random_values_python_backend(monkeypatch):
+    """Verify that seeded values are the same without NumPy."""
+    monkeypatch.setattr(generators, "numpy", None)
+    values = generators.RandomInt(1, 6).values(0, 5, {}, seed="1:n")
+    assert values == [5, 2, 6, 3, 5]
+    # Across blocks of rows.
+    generator = generators.RandomChoice(["a", "b", "c"])
+    values = generator.values(998, 1003, {}, seed="s")
+    assert values == ["b", "a", "c", "a", "b"]
+
+
+def test_random_values_numpy_backend():
+    """Verify that seeded values are the same with NumPy."""
+    pytest.importorskip("numpy")
+    values = generators.RandomInt(1, 6).values(0, 5, {}, seed="1:n")
+    assert values == [4, 4, 3, 3, 5]
+    generator = generators.RandomChoice(["a", "b", "c"])
+    values = generator.values(998, 1003, {}, seed="s")
+    assert values == ["c", "b", "b", "c", "a"]
+
+
+def test_random_values_single_entries():
+    """Verify that the entries of a block are generated once."""
+    generator = generators.RandomInt(1, 6)
+    expected = generator.values(0, 10, {}, seed="s")
+    generator = generators.RandomInt(1, 6)
+
+    with mock.patch.object(generators.RandomInt, "generate",
+                           autospec=True,
+                           side_effect=generators.RandomInt.generate) as m:
+        values = [generator.values(n, n + 1, {}, seed="s")[0]
+                  for n in range(10)]
+
+    assert values == expected
+    assert m.call_count == 1
+
+
+def test_random_values_shared_definitions():
+    """Verify that random values are seeded by the manager getting them."""
+    def get_entries(**kwargs):
+        manager = FixturesManager(**kwargs)
+        manager.load("./charlatan/tests/data/generated.yaml")
+        entries = [dict(manager.get_fixture("random.7"))]
+        manager.clean_cache()
+        entries.append(dict(manager.get_fixture("random")[7]))
+        for entry in entries:
+            del entry["created_at"]
+        return entries
+
+    expected = get_entries(random_seed=2)
+    assert expected[0] == expected[1]
+    # The shared definitions are loaded by a manager without a seed.
+    assert get_entries(random_seed=2, share_definitions=True) == expected
+
+
+@pytest.mark.parametrize("lazy_definitions", [False, True])
+def test_generated_collection_in_file_collection(lazy_definitions):
+    """Verify that collections are generated when loading several files."""
+    manager = FixturesManager(lazy_definitions=lazy_definitions)
+    manager.load(["./charlatan/tests/data/generated.yaml",
+                  "./charlatan/tests/data/simple.yaml"])
+    collection = manager.collection.get("generated").get("dicts")
+
+    assert isinstance(collection, GeneratedFixtureCollection)
+    assert manager.get_fixture("generated.dicts") == [
+        {"kind": "dict", "side": "left", "index": 0},
+        {"kind": "dict", "side": "right", "index": 1},
+        {"kind": "dict", "side": "left", "index": 2},
+    ]
+    assert manager.get_fixture("generated.dicts.1")["side"] == "right"
@@ -1,13 +1,18 @@
 from __future__ import absolute_import
 from datetime import datetime
+import os
+import shutil
+import tempfile
 
 import pytest
 import pytz
 from freezegun import freeze_time
 
 from charlatan import testing
+from charlatan import definition_store
 from charlatan import depgraph
-from charlatan import FixturesManager
+from charlatan import Fixture, FixturesManager
+from charlatan.fixture import FixtureDefinition
 
 
 def test_overrides_and_in_cache():
@@ -135,3 +140,94 @@ class TestFixturesManager(testing.TestCase):
         """Verify that we can set a hook."""
         manager = FixturesManager()
         manager.set_hook("before_save", lambda p: p)
+
+
+class TestLazyDefinitions(testing.TestCase):
+
+    def setUp(self):
+        self.manager = FixturesManager(lazy_definitions=True)
+        self.manager.load('./docs/examples/collection.yaml')
+
+    def test_definitions_are_not_created_on_load(self):
+        """Verify that fixtures are not created when loading."""
+        for _, fixture in self.manager.collection.iterator(
+                self.manager.collection.fixtures):
+            assert isinstance(fixture, FixtureDefinition)
+
+    def test_dependencies_are_extracted_on_load(self):
+        """Verify that the dependency graph is built from definitions."""
+        assert self.manager.depgraph.has_edge_between('toasters',
+                                                      'collection')
+        assert self.manager.depgraph.has_edge_between('anonymous_toasters',
+                                                      'users')
+
+    def test_get_fixture(self):
+        """Verify that fixtures are created when accessed."""
+        toaster = self.manager.get_fixture('anonymous_toasters.0')
+        assert toaster.color == 'yellow'
+        assert toaster.slots == 5
+
+        collection = self.manager.collection.get('anonymous_toasters')
+        assert isinstance(collection.fixtures[0], Fixture)
+        assert isinstance(collection.fixtures[1], FixtureDefinition)
+        assert isinstance(self.manager.collection.fixtures['users'],
+                          FixtureDefinition)
+
+
+class TestSharedDefinitions(testing.TestCase):
+
+    filename = './charlatan/tests/data/relationships_without_models.yaml'
+
+    def setUp(self):
+        definition_store.clear()
+
+    def tearDown(self):
+        definition_store.clear()
+
+    def test_definitions_are_shared(self):
+        """Verify that managers loading the same files share fixtures."""
+        first = FixturesManager(share_definitions=True)
+        first.load(self.filename)
+        second = FixturesManager(share_definitions=True)
+        second.load(self.filename)
+
+        assert first.collection is second.collection
+        assert first.depgraph is second.depgraph
+        assert definition_store.count() == 1
+
+    def test_cache_is_not_shared(self):
+        """Verify that each manager keeps its own installed fixtures."""
+        first = FixturesManager(share_definitions=True)
+        first.load(self.filename)
+        second = FixturesManager(share_definitions=True)
+        second.load(self.filename)
+
+        instance = first.install_fixture('dict_with_nest')
+        assert first.installed_keys == ['simple_dict', 'dict_with_nest']
+        assert instance['simple_dict'] is first.cache['simple_dict']
+        assert second.installed_keys == []
+        assert not second.cache
+
+        other = second.install_fixture('dict_with_nest')
+        assert other['simple_dict'] is second.cache['simple_dict']
+        assert other['simple_dict'] is not instance['simple_dict']
+
+    def test_changed_files_are_reloaded(self):
+        """Verify that definitions are looked up by content."""
+        tmpdir = tempfile.mkdtemp()
+        filename = os.path.join(tmpdir, 'fixtures.yaml')
+        try:
+            with open(filename, 'w') as f:
+                f.write('toaster:\n  fields:\n    color: red\n')
+            first = FixturesManager(share_definitions=True)
+            first.load(filename)
+
+            with open(filename, 'w') as f:
+                f.write('toaster:\n  fields:\n    color: blue\n')
+            second = FixturesManager(share_definitions=True)
+            second.load(filename)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        assert first.collection is not second.collection
+        assert second.get_fixture('toaster') == {'color': 'blue'}
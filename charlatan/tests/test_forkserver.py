@@ -0,0 +1,60 @@
+from __future__ import absolute_import
+import os
+import sys
+
+import pytest
+
+from charlatan import FixturesManager
+from charlatan import forkserver
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"),
+                                reason="requires os.fork")
+
+
+def get_manager():
+    manager = FixturesManager(lazy_definitions=True)
+    manager.load('./docs/examples/collection.yaml')
+    return manager
+
+
+def test_warm_up():
+    """Verify that all the fixtures are created."""
+    manager = get_manager()
+    assert forkserver.warm_up(manager) > len(manager.keys())
+    for _, fixture in manager.collection.iterator(
+            manager.collection.fixtures):
+        assert fixture.__class__.__name__ != 'FixtureDefinition'
+
+
+def test_fork_workers():
+    """Verify that workers get the fixtures from the parent."""
+    manager = get_manager()
+    manager.install_fixture('toasters.green')
+
+    def target(manager, index):
+        if manager.installed_keys:
+            return 3
+        toaster = manager.get_fixture('toasters.blue')
+        return 0 if toaster.color == 'blue' else 4 + index
+
+    assert forkserver.fork_workers(manager, target, 2) == [0, 0]
+    # The parent's cache is left untouched.
+    assert manager.installed_keys == ['toasters.green']
+
+
+def test_failing_worker():
+    """Verify that a worker raising an exception exits with 1."""
+    def target(manager, index):
+        raise ValueError(index)
+
+    assert forkserver.fork_workers(get_manager(), target, 1) == [1]
+
+
+@pytest.mark.parametrize("code, expected", [
+    (None, 0), (0, 0), (2, 2), ("failed", 1)])
+def test_exiting_worker(code, expected):
+    """Verify that sys.exit sets the exit code of a worker."""
+    def target(manager, index):
+        sys.exit(code)
+
+    assert forkserver.fork_workers(get_manager(), target, 1) == [expected]
@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 import operator as op
 
+import pytest
+
 from charlatan import testing
 from charlatan import FixturesManager
 
@@ -29,3 +31,24 @@ class TestListOfFixtures(testing.TestCase):
         fixtures = self.fm.install_fixture('fixture_list',
                                            overrides={"field1": 12})
         assert list(map(op.itemgetter('field1'), fixtures)) == [12, 12]
+
+    def test_iter_fixture(self):
+        """Verify that we can iterate over the instances of a list."""
+        fixtures = list(self.fm.iter_fixture('fixture_list'))
+        assert fixtures == [(0, {'field1': 'stuff'}),
+                            (1, {'field1': 'more_stuff'})]
+        assert self.fm.installed_keys == ['fixture_list.0', 'fixture_list.1']
+        assert self.fm.get_fixture('fixture_list.1') is fixtures[1][1]
+
+    def test_iter_fixture_without_cache(self):
+        """Verify that iterating does not have to keep the instances."""
+        fixtures = self.fm.iter_fixture('fixture_list', cache=False)
+        assert next(fixtures) == (0, {'field1': 'stuff'})
+        assert len(list(fixtures)) == 1
+        assert not self.fm.cache
+        assert not self.fm.installed_keys
+
+    def test_iter_fixture_requires_collection(self):
+        """Verify that we can only iterate over collections."""
+        with pytest.raises(ValueError):
+            list(self.fm.iter_fixture('related_fixture'))
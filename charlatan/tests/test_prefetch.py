@@ -0,0 +1,107 @@
+import mock
+import pytest
+from sqlalchemy import event
+
+from charlatan import definition_store
+from charlatan import testing
+from charlatan import FixturesManager
+from charlatan.tests.fixtures.models import Session, Base, engine
+from charlatan.tests.fixtures.models import Toaster, Color
+
+
+class TestPrefetch(testing.TestCase):
+
+    def setUp(self):
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add_all([Toaster(id=1, name="one"),
+                              Toaster(id=2, name="two"),
+                              Color(id=1, name="red")])
+        self.session.commit()
+
+        self.manager = FixturesManager(db_session=self.session)
+        self.manager.load("./charlatan/tests/data/database_ids.yaml")
+
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self.count)
+
+    def tearDown(self):
+        event.remove(engine, "before_cursor_execute", self.count)
+        self.session.close()
+        Base.metadata.drop_all(engine)
+
+    def count(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_install_fixtures_prefetches(self):
+        """Verify that there's one query per model."""
+        toaster, other_toaster, red = self.manager.install_fixtures(
+            ["toaster", "other_toaster", "red"])
+
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual((toaster.name, other_toaster.name, red.name),
+                         ("one", "two", "red"))
+
+    def test_prefetch_ancestors(self):
+        """Verify that ancestors defined with an id are prefetched."""
+        assert self.manager.prefetch_fixtures("toaster_with_color") == 1
+        del self.statements[:]
+
+        self.manager.get_fixture("red")
+        self.assertEqual(self.statements, [])
+
+    def test_prefetch_collection_entries(self):
+        """Verify that collection entries with an id are prefetched."""
+        toasters, = self.manager.install_fixtures(["toasters"])
+
+        self.assertEqual(len(self.statements), 1)
+        self.assertEqual([t.name for t in toasters], ["one", "two"])
+        self.assertEqual(self.session.query(Toaster).count(), 2)
+
+    def test_entries_without_model(self):
+        """Verify that entries with an id but no model are not prefetched."""
+        ids, = self.manager.install_fixtures(["ids"])
+
+        self.assertEqual(ids, [{"id": 1}, {"id": 2}])
+        self.assertEqual(self.statements, [])
+
+    def test_entries_with_an_id_field(self):
+        """Verify that entries with an id but no fields are created."""
+        toasters, = self.manager.install_fixtures(["created_toasters"])
+
+        self.assertEqual([(t.id, t.name) for t in toasters],
+                         [(10, "created"), (11, "created")])
+        self.assertEqual(self.session.query(Toaster).count(), 4)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {}, {"lazy_definitions": True}, {"share_definitions": True}])
+@pytest.mark.parametrize("filenames, expected", [
+    ("./charlatan/tests/data/database_ids.yaml", True),
+    (["./charlatan/tests/data/database_ids.yaml",
+      "./charlatan/tests/data/simple.yaml"], True),
+    ("./charlatan/tests/data/routing.yaml", False),
+    ("./charlatan/tests/data/generated.yaml", False),
+])
+def test_has_database_ids(kwargs, filenames, expected):
+    """Verify that fixtures defined with an id are found when loading."""
+    manager = FixturesManager(**kwargs)
+    manager.load(filenames)
+    definition_store.clear()
+    assert manager._has_database_ids is expected
+
+
+def test_no_prefetch_without_database_ids():
+    """Verify that fixtures are not walked when none has an id."""
+    Base.metadata.create_all(engine)
+    session = Session()
+    manager = FixturesManager(db_session=session)
+    manager.load("./charlatan/tests/data/routing.yaml")
+
+    try:
+        with mock.patch.object(FixturesManager, "_add_database_ids") as add:
+            manager.install_fixtures(["toaster", "colors"])
+        assert not add.called
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
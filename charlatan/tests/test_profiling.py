@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+import json
+import os
+import tempfile
+
+from charlatan import testing
+from charlatan import FixturesManager
+from charlatan.profiling import FixtureProfiler
+from charlatan.tests.fixtures.models import Session, Base, engine
+
+
+class FakeClock(object):
+
+    """Clock advancing by one second each time it is read."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class TestFixtureProfiler(testing.TestCase):
+
+    def setUp(self):
+        self.profiler = FixtureProfiler(clock=FakeClock())
+        self.manager = FixturesManager(listeners=[self.profiler])
+        self.manager.load(
+            './charlatan/tests/data/relationships_without_models.yaml')
+
+    def test_self_and_total_time(self):
+        """Verify that the ancestors are in the total time only."""
+        self.manager.install_fixture('dict_with_nest')
+
+        fixtures = dict(self.profiler.top(models=False))
+        # install(dict_with_nest) [
+        #     get(dict_with_nest) [get(simple_dict), get(simple_dict)]]
+        # simple_dict is got a second time (from the cache) to set up the
+        # relationship.
+        assert fixtures['simple_dict'] == {'calls': 2, 'self': 2.0,
+                                           'total': 2.0}
+        assert fixtures['dict_with_nest'] == {'calls': 1, 'self': 5.0,
+                                              'total': 7.0}
+        assert dict(self.profiler.top(models=True)) == {
+            'dict': {'calls': 3, 'self': 7.0, 'total': 9.0}}
+
+    def test_uninstall(self):
+        """Verify that uninstalling a fixture is measured."""
+        self.manager.install_fixture('simple_dict')
+        self.manager.uninstall_fixture('simple_dict')
+        assert self.profiler.fixtures['simple_dict'].calls == 2
+        assert self.profiler.fixtures['simple_dict'].self_time == 4.0
+
+    def test_report(self):
+        """Verify that the report lists the slowest fixtures first."""
+        self.manager.install_fixture('dict_with_nest')
+        report = self.profiler.format_report(n=1)
+        assert 'slowest 1 charlatan fixtures' in report
+        assert 'dict_with_nest' in report
+        assert 'simple_dict' not in report
+
+    def test_write_json(self):
+        """Verify that the measures can be written as JSON."""
+        self.manager.install_fixture('simple_dict')
+        fd, filename = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self.profiler.write_json(filename)
+            with open(filename) as f:
+                data = json.load(f)
+        finally:
+            os.remove(filename)
+        assert data['fixtures']['simple_dict']['calls'] == 1
+        assert data['models']['dict']['calls'] == 1
+
+    def test_update(self):
+        """Verify that the measures of another profiler can be added."""
+        self.manager.install_fixture('simple_dict')
+        other = FixtureProfiler()
+        other.update(self.profiler.to_dict())
+        other.update(self.profiler.to_dict())
+        assert other.fixtures['simple_dict'].calls == 2
+        assert other.fixtures['simple_dict'].total_time == (
+            2 * self.profiler.fixtures['simple_dict'].total_time)
+        assert other.models['dict'].calls == 2
+
+    def test_overlapping_actions(self):
+        """Verify that actions may finish in any order (e.g. with asyncio)."""
+        self.profiler.fixture_started('first', 'get')  # 1
+        self.profiler.fixture_started('second', 'get')  # 2
+        self.profiler.fixture_finished('first', 'get', None)  # 3
+        self.profiler.fixture_finished('second', 'get', None)  # 4
+        assert self.profiler.fixtures['first'].total_time == 2.0
+        assert self.profiler.fixtures['second'].total_time == 2.0
+
+
+class TestModelProfiler(testing.TestCase):
+
+    def setUp(self):
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.profiler = FixtureProfiler(clock=FakeClock())
+        self.manager = FixturesManager(db_session=self.session,
+                                       listeners=[self.profiler])
+        self.manager.load('./charlatan/tests/data/relationships.yaml')
+
+    def tearDown(self):
+        self.session.close()
+        Base.metadata.drop_all(engine)
+
+    def test_uninstall_model(self):
+        """Verify that uninstalling is measured for the fixture's model."""
+        self.manager.install_fixture('color')
+        self.manager.uninstall_fixture('color')
+        assert self.profiler.models['Color'].calls == 2
+        assert self.profiler.models['Color'].self_time == 4.0
+
+    def test_collection_model(self):
+        """Verify that collections are measured for their entries' model."""
+        self.manager.install_fixture('model_list')
+        self.manager.uninstall_fixture('model_list')
+        assert 'list' not in self.profiler.models
+        assert self.profiler.models['Toaster'].calls == 2
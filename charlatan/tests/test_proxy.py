@@ -0,0 +1,68 @@
+from __future__ import absolute_import
+
+from charlatan import testing
+from charlatan import FixturesManager
+from charlatan.proxy import FixtureProxy, resolve
+from charlatan.tests.fixtures.models import Session, Base, engine
+from charlatan.tests.fixtures.models import Toaster, Color
+
+
+class TestLazyInstances(testing.TestCase):
+
+    def setUp(self):
+        self.manager = FixturesManager(lazy_instances=True)
+        self.manager.load(
+            './charlatan/tests/data/relationships_without_models.yaml')
+
+    def test_get_fixture_returns_proxy(self):
+        """Verify that the instance is built on first access."""
+        fixture = self.manager.get_fixture('dict_with_nest')
+        assert type(fixture) is FixtureProxy
+        assert not self.manager.cache
+
+        assert fixture['field1'] == 'asdlkf'
+        assert set(self.manager.cache) == set(['simple_dict',
+                                               'dict_with_nest'])
+        assert self.manager.installed_keys == ['simple_dict',
+                                               'dict_with_nest']
+
+    def test_unused_fixtures_are_not_installed(self):
+        """Verify that unused fixtures cost nothing."""
+        fixtures = self.manager.install_fixtures(['simple_dict',
+                                                  'dict_with_nest'])
+        assert len(fixtures) == 2
+        assert fixtures[0]['field2'] == 2
+        assert self.manager.installed_keys == ['simple_dict']
+
+    def test_proxy_as_override(self):
+        """Verify that a proxy provided as an override is built."""
+        simple_dict = self.manager.get_fixture('simple_dict')
+        fixture = resolve(self.manager.get_fixture(
+            'dict_with_nest', overrides={'simple_dict': simple_dict}))
+        assert type(fixture['simple_dict']) is dict
+        assert fixture['simple_dict'] == {'field1': 'lolin', 'field2': 2}
+
+
+class TestLazyInstancesWithSqlalchemy(testing.TestCase):
+
+    def setUp(self):
+        self.session = Session()
+        self.manager = FixturesManager(db_session=self.session,
+                                       lazy_instances=True)
+        self.manager.load("./charlatan/tests/data/relationships.yaml")
+
+        Base.metadata.create_all(engine)
+
+    def tearDown(self):
+        Base.metadata.drop_all(engine)
+        self.session.close()
+
+    def test_install_on_first_access(self):
+        """Verify that the fixture is saved on first access."""
+        toaster = self.manager.install_fixture("model")
+        self.assertEqual(self.session.query(Toaster).count(), 0)
+
+        assert isinstance(toaster, Toaster)
+        assert isinstance(toaster.color, Color)
+        self.assertEqual(self.session.query(Toaster).count(), 1)
+        self.assertEqual(self.session.query(Color).count(), 1)
@@ -0,0 +1,167 @@
+import json
+import os
+
+import pytest
+
+from charlatan.pytest_plugin import get_fixtures_manager
+
+pytest_plugins = "pytester"
+
+FIXTURES = os.path.abspath(
+    "./charlatan/tests/data/relationships_without_models.yaml")
+MODEL_FIXTURES = os.path.abspath("./charlatan/tests/data/relationships.yaml")
+
+
+def test_charlatan_fixture(testdir):
+    """Verify that charlatan fixtures are installed once per scope."""
+    testdir.makeini("""
+        [pytest]
+        charlatan_fixtures = %s
+    """ % FIXTURES)
+    testdir.makepyfile("""
+        import pytest
+        from charlatan.pytest_plugin import charlatan_fixture
+
+        pytest_plugins = "charlatan.pytest_plugin"
+
+        simple_dict = charlatan_fixture("simple_dict", scope="module")
+        dict_with_nest = charlatan_fixture("dict_with_nest")
+
+        def test_first(charlatan_manager, simple_dict, dict_with_nest):
+            assert dict_with_nest["simple_dict"] is simple_dict
+            assert charlatan_manager.installed_keys == ["simple_dict",
+                                                        "dict_with_nest"]
+
+        def test_second(charlatan_manager, simple_dict):
+            assert simple_dict["field1"] == "lolin"
+            assert charlatan_manager.installed_keys == ["simple_dict"]
+
+        def test_worker_id(charlatan_worker_id):
+            assert charlatan_worker_id == "master"
+    """)
+    result = testdir.runpytest("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=3)
+
+
+def test_charlatan_manager_requires_files(testdir):
+    """Verify that a helpful error is raised without fixtures files."""
+    testdir.makepyfile("""
+        pytest_plugins = "charlatan.pytest_plugin"
+
+        def test_manager(charlatan_manager):
+            pass
+    """)
+    result = testdir.runpytest("-p", "no:cacheprovider")
+    assert result.ret != 0
+    result.stdout.fnmatch_lines(["*charlatan_fixtures ini option*"])
+
+
+def test_charlatan_profile(testdir):
+    """Verify that the slowest fixtures are shown in the terminal summary."""
+    testdir.makeini("""
+        [pytest]
+        charlatan_fixtures = %s
+    """ % FIXTURES)
+    testdir.makepyfile("""
+        from charlatan.pytest_plugin import charlatan_fixture
+
+        dict_with_nest = charlatan_fixture("dict_with_nest")
+
+        def test_first(dict_with_nest):
+            pass
+    """)
+    result = testdir.runpytest("-p", "no:cacheprovider",
+                               "-p", "charlatan.pytest_plugin",
+                               "--charlatan-profile=5",
+                               "--charlatan-profile-json=profile.json")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*charlatan fixtures profile*",
+                                 "*slowest 2 charlatan fixtures*"])
+    assert testdir.tmpdir.join("profile.json").check()
+
+
+def test_charlatan_profile_xdist(testdir):
+    """Verify that the measures of pytest-xdist workers are aggregated."""
+    testdir.makepyfile(conftest="""
+        import json
+
+        import pytest
+
+        from charlatan import pytest_plugin
+
+
+        class Node(object):
+            def __init__(self, config):
+                self.config = config
+                self.workeroutput = {}
+
+
+        @pytest.hookimpl(trylast=True)
+        def pytest_sessionfinish(session):
+            # Send the measures of a fake worker to the controller.
+            node = Node(session.config)
+            node.config.workeroutput = node.workeroutput
+            pytest_plugin.pytest_sessionfinish(session)
+            del node.config.workeroutput
+            pytest_plugin.pytest_testnodedown(node, None)
+    """)
+    testdir.makepyfile("""
+        def test_first(charlatan_manager):
+            charlatan_manager.install_fixture("simple_dict")
+    """)
+    testdir.makeini("""
+        [pytest]
+        charlatan_fixtures = %s
+    """ % FIXTURES)
+    result = testdir.runpytest("-p", "no:cacheprovider",
+                               "-p", "charlatan.pytest_plugin",
+                               "--charlatan-profile=5",
+                               "--charlatan-profile-json=profile.json")
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*charlatan fixtures profile*",
+                                 "*2  dict"])
+    with testdir.tmpdir.join("profile.json").open() as f:
+        data = json.load(f)
+    assert data["models"]["dict"]["calls"] == 2
+
+
+def test_charlatan_database_template(testdir):
+    """Verify that fixtures are attached from a clone of the template."""
+    testdir.makeini("""
+        [pytest]
+        charlatan_fixtures = %s
+        charlatan_database_template = fixtures.db
+        charlatan_metadata = charlatan.tests.fixtures.models:Base
+        charlatan_template_fixtures = model
+    """ % MODEL_FIXTURES)
+    testdir.makepyfile("""
+        from charlatan.tests.fixtures.models import Toaster
+
+        pytest_plugins = "charlatan.pytest_plugin"
+
+        def test_attached(charlatan_manager, charlatan_db_session):
+            assert charlatan_manager.installed_keys == ["color", "model"]
+            toaster = charlatan_manager.install_fixture("model")
+            assert toaster.name == "toaster1"
+            assert charlatan_db_session.query(Toaster).count() == 1
+    """)
+    result = testdir.runpytest("-p", "no:cacheprovider")
+    result.assert_outcomes(passed=1)
+    assert testdir.tmpdir.join("fixtures.db").check()
+    assert testdir.tmpdir.join("fixtures.master.db").check()
+
+
+def test_get_fixtures_manager():
+    """Verify that managers are shared, without changing their session."""
+    session, other_session = object(), object()
+    manager = get_fixtures_manager(FIXTURES, db_session=session)
+    assert get_fixtures_manager([FIXTURES], db_session=session) is manager
+
+    other = get_fixtures_manager(FIXTURES, db_session=other_session)
+    assert other is not manager
+    assert manager.session is session
+    assert other.session is other_session
+
+    with pytest.raises(ValueError):
+        get_fixtures_manager(FIXTURES, db_session=session,
+                             lazy_instances=True)
@@ -0,0 +1,100 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from charlatan import replay
+from charlatan import testing
+from charlatan import FixturesManager
+from charlatan.database import PrimaryKeyStub
+from charlatan.tests.fixtures.models import Base, Color, Toaster
+
+FIXTURES = "./charlatan/tests/data/relationships.yaml"
+KEYS = ["model", "model_1", "model_list"]
+
+
+class TestReplay(testing.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, "replay")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def get_manager(self, name):
+        engine = create_engine(
+            "sqlite:///%s" % os.path.join(self.tmpdir, name))
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        self.addCleanup(engine.dispose)
+        self.addCleanup(session.close)
+        manager = FixturesManager(db_session=session)
+        manager.load(FIXTURES)
+        return manager
+
+    def test_record_and_replay(self):
+        """Verify that the recorded statements are replayed."""
+        manager = self.get_manager("first.db")
+        assert not replay.install_fixtures(manager, Base, KEYS,
+                                           self.directory)
+        assert len(os.listdir(self.directory)) == 1
+
+        other = self.get_manager("second.db")
+        assert replay.install_fixtures(other, Base, KEYS, self.directory)
+        assert other.session.query(Color).count() == 1
+        assert other.session.query(Toaster).count() == 4
+        assert type(other.cache["model_list.1"]) is PrimaryKeyStub
+        assert other.installed_keys == [
+            "color", "model", "model_1", "model_list.0", "model_list.1"]
+
+        toaster = other.get_fixture("model_1")
+        assert toaster.id == manager.get_fixture("model_1").id
+        assert toaster.color.name == "red"
+        toasters = other.get_fixture("model_list")
+        assert [t.name for t in toasters] == ["one", "two"]
+        assert all(t in other.session for t in toasters)
+        assert other.session.query(Toaster).count() == 4
+
+    def test_replay_in_non_empty_table(self):
+        """Verify that fixtures are not replayed with other primary keys."""
+        manager = self.get_manager("first.db")
+        replay.install_fixtures(manager, Base, KEYS, self.directory)
+
+        other = self.get_manager("second.db")
+        other.session.add(Toaster(name="existing"))
+        other.session.commit()
+        with pytest.raises(replay.ReplayError):
+            replay.install_fixtures(other, Base, KEYS, self.directory)
+
+        # Nothing was replayed.
+        assert other.session.query(Toaster).count() == 1
+        assert other.session.query(Color).count() == 0
+        assert other.installed_keys == []
+
+    def test_replay_with_other_primary_keys(self):
+        """Verify that replayed rows must get the recorded primary keys."""
+        manager = self.get_manager("first.db")
+        replay.install_fixtures(manager, Base, KEYS, self.directory)
+
+        other = self.get_manager("second.db")
+        # The replayed color would get the next primary key.
+        other.session.add(Color(id=50, name="other"))
+        other.session.commit()
+        with pytest.raises(replay.ReplayError):
+            replay.install_fixtures(other, Base, KEYS, self.directory)
+
+        assert other.session.query(Color).count() == 1
+
+    def test_changed_keys(self):
+        """Verify that a log is only replayed for the same fixtures."""
+        manager = self.get_manager("first.db")
+        replay.install_fixtures(manager, Base, ["color"], self.directory)
+        other = self.get_manager("second.db")
+        assert not replay.install_fixtures(other, Base, ["model"],
+                                           self.directory)
+        assert len(os.listdir(self.directory)) == 2
@@ -0,0 +1,91 @@
+from __future__ import absolute_import
+from datetime import datetime
+import os
+import shutil
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from charlatan import FixturesManager
+from charlatan import server
+from charlatan.file_format import Now
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="requires Unix sockets")
+
+SIMPLE = os.path.abspath("./charlatan/tests/data/simple.yaml")
+RELATIONSHIPS = os.path.abspath(
+    "./charlatan/tests/data/relationships_without_models.yaml")
+
+
+@pytest.fixture
+def socket_path():
+    tmpdir = tempfile.mkdtemp()
+    yield os.path.join(tmpdir, "charlatan.sock")
+    shutil.rmtree(tmpdir)
+
+
+@pytest.fixture
+def definition_server(socket_path):
+    definition_server = server.DefinitionServer(socket_path)
+    thread = threading.Thread(target=definition_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield definition_server
+    definition_server.shutdown()
+    definition_server.server_close()
+
+
+def test_load_from_server(definition_server, socket_path):
+    """Verify that managers get the parsed files from the server."""
+    manager = FixturesManager(definition_server=socket_path)
+    manager.load(SIMPLE)
+    manager.load(RELATIONSHIPS)
+    assert manager.definition_client is not None
+    assert set(definition_server._files) == set([(SIMPLE, False),
+                                                 (RELATIONSHIPS, False)])
+
+    assert isinstance(manager.collection.get("fixture").fields["now"], Now)
+    assert isinstance(manager.get_fixture("fixture")["now"], datetime)
+    assert manager.get_fixture("dict_with_nest")["simple_dict"] == {
+        "field1": "lolin", "field2": 2}
+
+
+def test_fallback_to_local_loading(socket_path):
+    """Verify that files are parsed locally without a server."""
+    manager = FixturesManager(definition_server=socket_path)
+    manager.load(RELATIONSHIPS)
+    assert manager.definition_client is None
+    assert manager.get_fixture("simple_dict")["field2"] == 2
+
+
+def test_fallback_on_server_error(definition_server, socket_path,
+                                  monkeypatch):
+    """Verify that files the server fails to parse are parsed locally."""
+    def do_load_file(filename, use_unicode=False):
+        raise IOError("Permission denied")
+
+    monkeypatch.setattr(definition_server, "do_load_file", do_load_file)
+    manager = FixturesManager(definition_server=socket_path)
+    manager.load(RELATIONSHIPS)
+    assert manager.definition_client is not None
+    assert manager.get_fixture("simple_dict")["field2"] == 2
+
+
+def test_get_fixture_and_explain(definition_server, socket_path):
+    """Verify that the server builds fixtures without a model."""
+    client = server.DefinitionClient(socket_path)
+    assert client.ping()
+
+    fixture = client.get_fixture(RELATIONSHIPS, "dict_with_nest")
+    assert fixture["simple_dict"]["field2"] == 2
+
+    plan = client.explain(RELATIONSHIPS, ["dict_with_nest"])
+    assert [s["key"] for s in plan["steps"]] == ["simple_dict",
+                                                 "dict_with_nest"]
+
+    with pytest.raises(server.ServerError):
+        client.get_fixture(RELATIONSHIPS, "missing")
+    client.close()
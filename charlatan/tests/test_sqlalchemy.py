@@ -1,5 +1,18 @@
+import json
+import threading
+
+import mock
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from charlatan import testcase
 from charlatan import testing
 from charlatan import FixturesManager
+from charlatan.database import PrimaryKeyAllocator, PrimaryKeyStub
+from charlatan.fixture_collection import GeneratedFixtureCollection
+from charlatan.query_budget import QueryBudgetExceeded, TOP_LEVEL
 from charlatan.tests.fixtures.models import Session, Base, engine
 from charlatan.tests.fixtures.models import Toaster, Color
 
@@ -62,3 +75,448 @@ class TestSqlalchemyFixtures(testing.TestCase):
         self.manager.uninstall_fixture("color")
 
         self.assertEqual(self.session.query(Color).count(), 0)
+
+    def test_install_collection_by_chunks(self):
+        """Verify that a collection can be installed by chunks."""
+        count = self.manager.install_collection("model_list", chunk_size=1)
+
+        self.assertEqual(count, 2)
+        self.assertEqual(self.session.query(Toaster).count(), 2)
+        self.assertEqual(self.manager.installed_keys,
+                         ["color", "model_list.0", "model_list.1"])
+        # Only the primary keys are kept around
+        assert isinstance(self.manager.cache["model_list.0"], PrimaryKeyStub)
+        assert not [i for i in self.session if isinstance(i, Toaster)]
+
+        toaster = self.manager.get_fixture("model_list.1")
+        self.assertEqual(toaster.name, "two")
+        self.assertEqual(toaster.color.name, "red")
+
+    def test_uninstall_collection_installed_by_chunks(self):
+        """Verify that fixtures installed by chunks can be uninstalled."""
+        self.manager.install_collection("model_list", chunk_size=10)
+        self.manager.uninstall_all_fixtures()
+
+        self.assertEqual(self.session.query(Toaster).count(), 0)
+        self.assertEqual(self.session.query(Color).count(), 0)
+
+    def test_install_generated_collection(self):
+        """Verify that the entries of a generated collection are saved."""
+        manager = FixturesManager(db_session=self.session)
+        manager.load("./charlatan/tests/data/generated.yaml")
+        toasters = manager.install_fixture("toasters")
+
+        self.assertEqual([t.id for t in toasters], [10, 12, 14, 16, 18])
+        self.assertEqual(toasters[4].name, "toaster4-18")
+        self.assertEqual(self.session.query(Color).count(), 1)
+        assert all(t.color is toasters[0].color for t in toasters)
+
+    def test_install_generated_collection_by_chunks(self):
+        """Verify that a generated collection can be installed by chunks."""
+        manager = FixturesManager(db_session=self.session)
+        manager.load("./charlatan/tests/data/generated.yaml")
+        count = manager.install_collection("toasters", chunk_size=2)
+        self.assertEqual(count, 5)
+        self.assertEqual(self.session.query(Toaster).count(), 5)
+        self.assertEqual(manager.get_fixture("toasters.1").id, 12)
+
+    def test_install_generated_entry_with_an_id(self):
+        """Verify that a generated id is a field, not a database lookup."""
+        manager = FixturesManager(db_session=self.session)
+        manager.load("./charlatan/tests/data/generated.yaml")
+
+        color = manager.install_fixture("colors.1")
+        self.assertEqual(color.id, 2)
+        self.assertEqual(self.session.query(Color).count(), 1)
+
+    def test_explain_generated_collection(self):
+        """Verify that explain does not generate the rows of a collection."""
+        manager = FixturesManager(db_session=self.session)
+        manager.load("./charlatan/tests/data/generated.yaml")
+
+        with mock.patch("charlatan.generators.generate_rows") as generate:
+            plan = manager.explain(["toasters"])
+
+        assert not generate.called
+
+        step = plan.steps[-1]
+        assert step.model is Toaster
+        assert step.rows == {"toasters": 5}
+        assert sorted(step.generators) == ["id", "name"]
+        assert step.to_dict()["generators"]["id"] == "<Sequence 10, 2>"
+
+    def test_bulk_install_fixtures(self):
+        """Verify that fixtures can be installed with preallocated keys."""
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            if statement.startswith("INSERT"):
+                statements.append(statement)
+
+        allocator = PrimaryKeyAllocator(keys={Color: 10, "toasters": [5, 7]})
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            model, model_1 = self.manager.bulk_install_fixtures(
+                ["model", "model_1"], allocator=allocator)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        self.assertEqual((model.id, model_1.id, model.color.id), (5, 7, 10))
+        self.assertEqual(self.session.query(Toaster).count(), 2)
+        # One INSERT per table
+        self.assertEqual(len(statements), 2)
+
+    def test_failed_bulk_install_is_forgotten(self):
+        """Verify that a failed bulk install leaves nothing in the cache."""
+        self.session.add(Color(id=10, name="blue"))
+        self.session.commit()
+
+        allocator = PrimaryKeyAllocator(keys={Color: 10})
+        with pytest.raises(Exception):
+            self.manager.bulk_install_fixtures(["model"], allocator=allocator)
+
+        self.assertEqual(self.manager.cache, {})
+        self.assertEqual(self.manager.installed_keys, [])
+        # The session was rolled back and can be used again.
+        self.assertEqual(self.session.query(Toaster).count(), 0)
+        self.manager.install_fixture("model")
+        self.assertEqual(self.session.query(Color).count(), 2)
+
+    def test_allocator_defaults_to_maximum_primary_key(self):
+        """Verify that the allocator starts after existing rows."""
+        self.session.add(Color(id=4, name="blue"))
+        self.session.commit()
+
+        color = PrimaryKeyAllocator().allocate(self.session, Color())
+        self.assertEqual(color, 5)
+
+    def test_query_budget(self):
+        """Verify that a query budget counts statements per fixture."""
+        with self.manager.query_budget(max_commits=2) as budget:
+            self.manager.install_fixture("model")
+
+        assert budget.commits == 2
+        assert set(budget.breakdown) == set(["color", "model"])
+        assert budget.breakdown["color"][1] == 1
+
+    def test_query_budget_exceeded(self):
+        """Verify that exceeding the budget fails with a breakdown."""
+        @self.manager.query_budget(max_commits=1)
+        def install():
+            self.manager.install_fixture("model")
+
+        with pytest.raises(QueryBudgetExceeded) as excinfo:
+            install()
+
+        message = str(excinfo.value)
+        assert "2 commits (max 1)" in message
+        assert "color:" in message
+        assert "model:" in message
+        assert not self.manager.listeners
+
+    def test_query_budget_top_level(self):
+        """Verify that statements issued outside of fixtures are counted."""
+        self.session.add(Toaster(id=1))
+        self.session.commit()
+
+        with self.manager.query_budget() as budget:
+            self.manager.install_fixtures(["from_database"])
+
+        # The SELECT prefetching the fixtures defined with an id.
+        assert budget.breakdown[TOP_LEVEL] == [1, 0]
+        assert budget.statements == 1
+
+    def test_query_budget_cascade_uninstall(self):
+        """Verify that a cascade uninstall is counted."""
+        self.manager.install_fixtures(["model", "model_list"])
+
+        with self.manager.query_budget() as budget:
+            self.manager.uninstall_fixture("color", cascade=True)
+
+        # One DELETE per table, and a single commit.
+        assert budget.statements == 2
+        assert budget.commits == 1
+        assert [sum(c) for c in zip(*budget.breakdown.values())] == [2, 1]
+
+    def test_cascade_uninstall(self):
+        """Verify that dependents are deleted with one DELETE per table."""
+        self.manager.install_fixtures(
+            ["model", "model_with_explicit_fk", "model_list"])
+        statements = []
+        commits = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        event.listen(self.session, "after_commit", commits.append)
+        try:
+            self.manager.uninstall_fixture("color", cascade=True)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        # model_list inherits its relationship to color.
+        assert self.manager.installed_keys == []
+        assert [s.split()[:3] for s in statements] == [
+            ["DELETE", "FROM", "toasters"], ["DELETE", "FROM", "colors"]]
+        assert len(commits) == 1
+        assert self.session.query(Toaster).count() == 0
+        assert self.session.query(Color).count() == 0
+
+    def test_cascade_uninstall_failure(self):
+        """Verify that fixtures are still installed when the uninstall
+        fails."""
+        self.manager.install_fixtures(["model", "model_list"])
+        installed_keys = list(self.manager.installed_keys)
+        model = self.manager.get_fixture("model")
+
+        with mock.patch.object(self.session, "commit",
+                               side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                self.manager.uninstall_fixture("color", cascade=True)
+
+        assert self.manager.installed_keys == installed_keys
+        assert self.manager.get_fixture("model") is model
+        assert self.session.query(Toaster).count() == 3
+
+        self.manager.uninstall_fixture("color", cascade=True)
+        assert self.manager.installed_keys == []
+        assert self.session.query(Toaster).count() == 0
+
+    def test_cascade_uninstall_dependents_only(self):
+        """Verify that only dependents are uninstalled."""
+        self.manager.install_fixtures(["model", "model_list"])
+        assert self.manager.get_installed_dependents("model") == ["model"]
+
+        self.manager.uninstall_fixtures(["model_list"], cascade=True)
+        assert self.manager.installed_keys == ["color", "model"]
+        assert self.session.query(Toaster).count() == 1
+
+    def test_installed_dependents_of_generated_collection(self):
+        """Verify that finding dependents does not generate any row."""
+        manager = FixturesManager(db_session=self.session)
+        manager.load("./charlatan/tests/data/generated.yaml")
+        manager.install_fixtures(["toasters", "dicts"])
+
+        with mock.patch("charlatan.generators.generate_rows") as generate:
+            dependents = manager.get_installed_dependents("dicts")
+
+        assert dependents == ["dicts"]
+        assert not generate.called
+
+    def test_cascade_uninstall_notifies_listeners(self):
+        """Verify that each uninstalled fixture is notified."""
+        listener = mock.Mock()
+        self.manager.install_fixtures(["model", "model_list"])
+        self.manager.listeners.append(listener)
+
+        self.manager.uninstall_fixture("color", cascade=True)
+
+        assert listener.fixture_started.call_args_list == [
+            mock.call(key, "uninstall")
+            for key in ("model_list", "model", "color")]
+        assert listener.fixture_finished.call_count == 3
+
+    def test_truncate_fixtures_from_database(self):
+        """Verify that the rows of fixtures defined with an id are kept."""
+        self.session.add(Toaster(id=1))
+        self.session.commit()
+        self.manager.install_fixtures(["from_database", "color"])
+
+        self.manager.truncate_fixtures()
+
+        assert not self.manager.cache
+        assert self.session.query(Toaster).count() == 1
+        assert self.session.query(Color).count() == 0
+
+    def test_truncate_fixtures(self):
+        """Verify that tables are emptied with one statement per table."""
+        self.manager.install_fixtures(["model", "model_list"])
+        self.manager.install_collection("model_list")
+        statements = []
+        commits = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        event.listen(self.session, "after_commit", commits.append)
+        try:
+            self.manager.truncate_fixtures()
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert statements == ["PRAGMA defer_foreign_keys = ON",
+                              "DELETE FROM toasters", "DELETE FROM colors"]
+        assert len(commits) == 1
+        assert self.manager.installed_keys == []
+        assert self.manager.cache == {}
+        assert self.session.query(Toaster).count() == 0
+        assert self.session.query(Color).count() == 0
+
+    def test_truncate_teardown(self):
+        """Verify that the teardown can be selected per test class."""
+        class TruncatingTestCase(testcase.FixturesManagerMixin):
+            fixtures_teardown = "truncate"
+
+        test_case = TruncatingTestCase()
+        test_case.fixtures_manager = self.manager
+        test_case.install_fixtures(["model", "model_1"])
+        test_case.uninstall_all_fixtures()
+
+        assert self.manager.installed_keys == []
+        assert self.session.query(Toaster).count() == 0
+
+        manager = FixturesManager(db_session=self.session,
+                                  teardown="truncate")
+        manager.load("./charlatan/tests/data/relationships.yaml")
+        manager.install_fixture("model")
+        manager.uninstall_all_fixtures()
+        assert self.session.query(Color).count() == 0
+
+        with pytest.raises(ValueError):
+            FixturesManager(teardown="drop")
+
+    def test_snapshot_restore(self):
+        """Verify that only the modified rows are restored."""
+        model, toasters = self.manager.install_fixtures(
+            ["model", "model_list"])
+        snapshot = self.manager.snapshot()
+        assert snapshot.count() == 4
+        assert snapshot.restore() == 0
+
+        model.name = "changed"
+        self.session.delete(toasters[0])
+        self.session.commit()
+        self.manager.install_fixture("model_1")
+
+        assert snapshot.get_changed_keys() == ["model", "model_list"]
+        assert sorted(snapshot.get_changes()) == [
+            ("toasters", model.id, "changed"),
+            ("toasters", toasters[0].id, "deleted")]
+
+        assert snapshot.restore() == 2
+        assert snapshot.get_changes() == []
+        assert model.name == "toaster1"
+        assert self.manager.installed_keys == ["color", "model",
+                                               "model_list"]
+        restored = self.manager.get_fixture("model_list")
+        assert [t.name for t in restored] == ["one", "two"]
+        assert restored[1] is toasters[1]
+        assert self.session.query(Toaster).count() == 3
+
+    def test_explain(self):
+        """Verify that explain describes the install without doing it."""
+        self.manager.install_fixture("color")
+        plan = self.manager.explain(["model", "model_list", "from_database"])
+
+        assert [(s.key, s.action) for s in plan] == [
+            ("color", "cached"),
+            ("model", "create"),
+            ("model_list", "create"),
+            ("from_database", "database"),
+        ]
+        assert plan.steps[2].model is Toaster
+        assert plan.steps[2].rows == {"toasters": 2}
+        assert plan.rows_per_table == {"toasters": 3}
+        assert plan.database_lookups == 1
+        assert json.loads(plan.to_json())["rows_per_table"] == {
+            "toasters": 3}
+        assert "model_list" in plan.format_table()
+        assert self.session.query(Toaster).count() == 0
+
+
+class TestSessionRouting(testing.TestCase):
+
+    def setUp(self):
+        self.engines = [
+            create_engine("sqlite://", poolclass=StaticPool,
+                          connect_args={"check_same_thread": False})
+            for _ in range(2)]
+        for e in self.engines:
+            Base.metadata.create_all(e)
+        self.toaster_session, self.color_session = [
+            sessionmaker(bind=e)() for e in self.engines]
+
+        self.manager = FixturesManager(
+            db_session=self.toaster_session,
+            sessions={Color: self.color_session})
+        self.manager.load("./charlatan/tests/data/routing.yaml")
+
+    def tearDown(self):
+        for session in (self.toaster_session, self.color_session):
+            session.close()
+        for e in self.engines:
+            e.dispose()
+
+    def test_session_for(self):
+        """Verify that sessions are found by class, then by module."""
+        manager = FixturesManager(db_session="default", sessions={
+            Base: "base",
+            Color: "color",
+            "charlatan.tests": "tests",
+            "charlatan.tests.test_sqlalchemy": "module",
+        })
+        assert manager.session_for(Color) == "color"
+        assert manager.session_for(Toaster) == "base"
+        assert manager.session_for(TestSessionRouting) == "module"
+        assert manager.session_for(FixturesManager) == "default"
+        assert manager.session_for(None, "other") == "other"
+
+    def test_install_fixture(self):
+        """Verify that fixtures are saved in the session of their model."""
+        toaster = self.manager.install_fixture("toaster")
+        color = self.manager.get_fixture("color")
+
+        assert toaster.color_id == str(color.id)
+        assert self.toaster_session.query(Toaster).count() == 1
+        assert self.toaster_session.query(Color).count() == 0
+        assert self.color_session.query(Color).count() == 1
+
+        self.manager.uninstall_all_fixtures()
+        assert self.color_session.query(Color).count() == 0
+
+    def test_install_fixtures_by_session(self):
+        """Verify that each session is flushed by a thread, level by
+        level, and committed once."""
+        threads = {}
+        commits = []
+        built = []
+
+        def before_flush(session, *args):
+            threads.setdefault(session, set()).add(
+                threading.current_thread())
+
+        self.manager.set_hook(
+            "before_save",
+            lambda instance: built.append(threading.current_thread()))
+        for session in (self.toaster_session, self.color_session):
+            event.listen(session, "before_flush", before_flush)
+            event.listen(session, "after_commit", commits.append)
+
+        toaster, other_toaster, _ = self.manager.install_fixtures_by_session(
+            ["toaster", "other_toaster", "other_color"])
+
+        assert toaster.color_id == str(self.manager.get_fixture("color").id)
+        assert other_toaster.id
+        assert self.toaster_session.query(Toaster).count() == 2
+        assert self.color_session.query(Color).count() == 2
+        assert len(commits) == 2
+        # Fixtures are built by the calling thread only.
+        assert set(built) == set([threading.current_thread()])
+        color_threads = threads[self.color_session]
+        assert threading.current_thread() not in color_threads
+        assert not color_threads & threads[self.toaster_session]
+
+    def test_install_generated_collection_by_session(self):
+        """Verify that rows are not generated to find the session of a
+        generated collection."""
+        with mock.patch.object(GeneratedFixtureCollection, "generate_rows",
+                               autospec=True,
+                               side_effect=GeneratedFixtureCollection
+                               .generate_rows) as generate_rows:
+            self.manager.install_fixtures_by_session(["colors"])
+
+        assert generate_rows.call_count == 1
+        assert self.color_session.query(Color).count() == 3
+        assert self.toaster_session.query(Color).count() == 0
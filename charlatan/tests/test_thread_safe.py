@@ -0,0 +1,79 @@
+from __future__ import absolute_import
+import threading
+import time
+
+from charlatan.builder import InstantiateAndSave
+from charlatan.thread_safe import ThreadSafeFixturesManager
+
+
+class SlowBuilder(InstantiateAndSave):
+
+    """Count the instantiated fixtures, slowly."""
+
+    def __init__(self):
+        self.count = 0
+
+    def instantiate(self, klass, params):
+        self.count += 1
+        time.sleep(0.01)
+        return super(SlowBuilder, self).instantiate(klass, params)
+
+
+def get_manager(**kwargs):
+    manager = ThreadSafeFixturesManager(**kwargs)
+    manager.load('./docs/examples/collection.yaml')
+    return manager
+
+
+def run_threads(target, count=8):
+    results = [None] * count
+
+    def run(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(i, )) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_shared_cache():
+    """Verify that each fixture is built once with a shared cache."""
+    builder = SlowBuilder()
+    manager = get_manager(shared_cache=True, get_builder=builder)
+    users = run_threads(lambda: manager.install_fixture('users.1'))
+
+    assert all(user is users[0] for user in users)
+    # The user and the two anonymous toasters
+    assert builder.count == 3
+    assert manager.installed_keys == ['anonymous_toasters', 'users.1']
+
+
+def test_cache_per_thread():
+    """Verify that each thread has its own cache and session."""
+    sessions = iter(range(8))
+    manager = get_manager(session_factory=lambda: next(sessions))
+
+    def target():
+        toaster = manager.install_fixture('toasters.green')
+        return toaster, list(manager.installed_keys), manager.session
+
+    results = run_threads(target)
+    toasters, installed_keys, thread_sessions = zip(*results)
+
+    assert len(set(map(id, toasters))) == 8
+    assert all(keys == ['toasters.green'] for keys in installed_keys)
+    assert sorted(thread_sessions) == list(range(8))
+    assert manager.installed_keys == []
+
+
+def test_definitions_are_resolved():
+    """Verify that fixtures are not modified once loaded."""
+    manager = get_manager(lazy_definitions=True)
+    fixture = manager.collection.get('anonymous_toasters')
+    assert fixture._has_inherited_from_parent
+    fields = fixture.fields
+    manager.get_fixture('anonymous_toasters')
+    assert fixture.fields is fields
@@ -0,0 +1,152 @@
+"""Share a fixtures manager between threads.
+
+A :class:`charlatan.FixturesManager` is not thread-safe: its cache and
+installed fixtures are plain attributes. :class:`ThreadSafeFixturesManager`
+resolves all the definitions when loading them (so that they are only read
+afterwards), and keeps a cache, installed fixtures and a session per thread::
+
+    manager = ThreadSafeFixturesManager(session_factory=Session)
+    manager.load("tests/fixtures/*.yaml")
+
+    def seed(index):
+        manager.install_fixtures(["toaster", "toast"])
+        manager.session.close()
+
+    threads = [threading.Thread(target=seed, args=(i, )) for i in range(8)]
+
+.. versionadded:: 0.4.8
+"""
+from __future__ import absolute_import
+import threading
+
+from charlatan import forkserver
+from charlatan.fixtures_manager import FixturesManager
+
+
+class _State(object):
+
+    """Cache and installed fixtures of a manager."""
+
+    __slots__ = ("cache", "installed_keys", "prefetched")
+
+    def __init__(self):
+        self.cache = {}
+        self.installed_keys = []
+        self.prefetched = {}
+
+
+class ThreadSafeFixturesManager(FixturesManager):
+
+    """Fixtures manager that can be used from several threads.
+
+    :param Session db_session: session used by the threads, unless
+        ``session_factory`` is set (e.g. a ``scoped_session``)
+    :param func session_factory: called to create the session of each thread
+    :param bool shared_cache: if True, all the threads share the same cache
+        and installed fixtures: each fixture is built once, by the first
+        thread needing it, while the others wait for it. The instances (and
+        thus their session) are used by all the threads.
+
+    Other keyword arguments are passed to :class:`charlatan.FixturesManager`.
+
+    With the default per-thread cache, :meth:`clean_cache` and the
+    ``uninstall`` methods only affect the calling thread's fixtures.
+
+    Listeners and hooks are called from all the threads.
+    """
+
+    def __init__(self, db_session=None, session_factory=None,
+                 shared_cache=False, **kwargs):
+        self.session_factory = session_factory
+        self.shared_cache = shared_cache
+        self._db_session = db_session
+        self._local = threading.local()
+        self._shared_state = _State()
+        self._definitions_lock = threading.RLock()
+        # Fixture key: lock held while building it (with shared_cache)
+        self._build_locks = {}
+        self._build_locks_lock = threading.Lock()
+        super(ThreadSafeFixturesManager, self).__init__(
+            db_session=db_session, **kwargs)
+
+    @property
+    def _state(self):
+        if self.shared_cache:
+            return self._shared_state
+        try:
+            return self._local.state
+        except AttributeError:
+            self._local.state = _State()
+            return self._local.state
+
+    @property
+    def session(self):
+        """Session of the calling thread."""
+        try:
+            return self._local.session
+        except AttributeError:
+            if self.session_factory is not None:
+                self._local.session = self.session_factory()
+            else:
+                self._local.session = self._db_session
+            return self._local.session
+
+    @session.setter
+    def session(self, value):
+        self._local.session = value
+
+    @property
+    def cache(self):
+        return self._state.cache
+
+    @cache.setter
+    def cache(self, value):
+        self._state.cache = value
+
+    @property
+    def installed_keys(self):
+        return self._state.installed_keys
+
+    @installed_keys.setter
+    def installed_keys(self, value):
+        self._state.installed_keys = value
+
+    @property
+    def _prefetched(self):
+        return self._state.prefetched
+
+    @_prefetched.setter
+    def _prefetched(self, value):
+        self._state.prefetched = value
+
+    def load(self, filenames, models_package=""):
+        """Load and resolve fixtures, see :meth:`FixturesManager.load`.
+
+        All the fixtures are created, and their inheritance and ancestors
+        are resolved (see :func:`charlatan.forkserver.warm_up`).
+        """
+        with self._definitions_lock:
+            super(ThreadSafeFixturesManager, self).load(
+                filenames, models_package=models_package)
+            forkserver.warm_up(self)
+
+    def _get_build_lock(self, fixture_key):
+        with self._build_locks_lock:
+            lock = self._build_locks.get(fixture_key)
+            if lock is None:
+                # Reentrant: building a collection gets its entries.
+                lock = self._build_locks[fixture_key] = threading.RLock()
+            return lock
+
+    def _build_fixture(self, fixture_key, overrides=None, builder=None):
+        """Return a fixture instance, building it once with shared_cache.
+
+        Ancestors are built (and locked) after their descendants, always in
+        the same order: threads cannot deadlock.
+        """
+        build = super(ThreadSafeFixturesManager, self)._build_fixture
+        if overrides or not self.shared_cache:
+            return build(fixture_key, overrides=overrides, builder=builder)
+
+        with self._get_build_lock(fixture_key):
+            return build(fixture_key, builder=builder)
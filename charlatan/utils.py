@@ -4,7 +4,11 @@ import functools
 import itertools
 import operator
 import re
-import collections
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # Python 2
+    from collections import Mapping, Sequence
 
 from charlatan import _compat
 
@@ -181,12 +185,29 @@ def is_sqlalchemy_model(instance):
         return True
 
 
+def iter_instances(instance):
+    """Yield the instances of a fixture, or of a collection's entries.
+
+    .. versionadded:: 0.4.8
+    """
+    if isinstance(instance, dict):
+        for value in _compat.itervalues(instance):
+            for i in iter_instances(value):
+                yield i
+    elif isinstance(instance, (list, tuple)):
+        for value in instance:
+            for i in iter_instances(value):
+                yield i
+    elif instance is not None:
+        yield instance
+
+
 def richgetter(obj, path):
     """Return a attrgetter + item getter."""
     for name in path.split("."):
-        if isinstance(obj, collections.Mapping):
+        if isinstance(obj, Mapping):
             obj = obj[name]
-        elif isinstance(obj, collections.Sequence):
+        elif isinstance(obj, Sequence):
             obj = obj[int(name)]  # force int type for list indexes
         else:
             obj = getattr(obj, name)
@@ -201,7 +222,7 @@ def deep_update(source, overrides):
     """
     # http://stackoverflow.com/questions/3232943/update-value-of-a-nested-dictionary-of-varying-depth  # noqa
     for key, value in _compat.iteritems(overrides):
-        if isinstance(value, collections.Mapping) and value:
+        if isinstance(value, Mapping) and value:
             returned = deep_update(source.get(key, {}), value)
             source[key] = returned
         else:
@@ -40,6 +40,10 @@ setup(
     description="Efficiently manage and install data fixtures",
     long_description=read_long_description(),
     install_requires=["PyYAML>=3.10", "pytz"],
+    entry_points={
+        "console_scripts": ["charlatan = charlatan.cli:main"],
+        "pytest11": ["charlatan = charlatan.pytest_plugin"],
+    },
     zip_safe=False,
     classifiers=[
         "Development Status :: 4 - Beta",